@@ -1,11 +1,14 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, Response, stream_with_context
 import os
 import csv
 import io
+import itertools
 from datetime import datetime, timedelta
 from database import Database
+from async_database import AsyncDatabase
 from facebook_api import FacebookAPI
 from google_ads_api import GoogleAdsAPI
+from google_ads_client_pool import GoogleAdsClientPool
 from evolution_api import EvolutionAPI
 from auth_manager import AuthManager
 from google_oauth import GoogleAdsOAuth
@@ -20,12 +23,15 @@ app.secret_key = 'your-secret-key-here'  # Mude para uma chave secreta segura
 
 # Inicializa classes
 db = Database()
+async_db = AsyncDatabase(db)
 fb_api = FacebookAPI()
-google_ads_api = GoogleAdsAPI()
 evolution_api = EvolutionAPI()
-auth_manager = AuthManager()
+auth_manager = AuthManager(db)
+# Clientes Google Ads por usuário (OAuth); sem usuário conectado, usa as credenciais do .env
+google_ads_client_pool = GoogleAdsClientPool(auth_manager)
+google_ads_api = GoogleAdsAPI(client_pool=google_ads_client_pool)
 google_oauth = GoogleAdsOAuth(auth_manager)
-client_discovery = ClientDiscovery()
+client_discovery = ClientDiscovery(db, auth_manager)
 
 @app.route('/')
 def index():
@@ -105,32 +111,41 @@ def generate_facebook_report(client, start_date, end_date):
             flash("Cliente não possui conta Facebook configurada", 'error')
             return redirect(url_for('client_page', client_id=client['id'], platform='facebook'))
         
-        # Busca dados via API
-        campaigns_data = fb_api.get_campaigns_report(account_id, start_date, end_date)
-        
-        if not campaigns_data:
+        # Dias já sincronizados e estáveis vêm do banco; só o restante vai à API
+        sync_range = db.plan_sync_range('facebook', account_id, start_date, end_date)
+        fetch_start = sync_range[0] if sync_range else None
+        stored_end = previous_day(fetch_start) if fetch_start else end_date
+        stored_rows = []
+        if stored_end >= start_date:
+            stored_rows = iter_stored_facebook_rows(account_id, start_date, stored_end)
+        
+        if not sync_range:
+            print(f"Período {start_date} a {end_date} já sincronizado - CSV gerado a partir do banco")
+            return generate_csv_response(stored_rows, client['name'], start_date, end_date)
+        
+        # Busca dados via API, com o mesmo filtro de impressões das sincronizações:
+        # os dias lidos do banco e os buscados agora saem no CSV com as mesmas linhas
+        campaigns_data = fb_api.get_campaigns_report(
+            account_id, *sync_range, skip_zero_impressions=db.sync_skip_zero_impressions)
+        
+        if not campaigns_data and fetch_start == start_date:
+            db.advance_sync_watermark('facebook', account_id, *sync_range)
             flash("Nenhum dado encontrado para o período selecionado", 'warning')
             return redirect(url_for('client_page', client_id=client['id'], platform='facebook'))
         
-        # Verifica campanhas existentes no período
-        existing_campaigns = db.get_existing_campaigns_for_period(account_id, start_date, end_date)
-        
         print(f"\n=== RELATÓRIO DE DUPLICATAS ===")
         print(f"Cliente: {client['name']} (Account ID: {account_id})")
-        print(f"Período: {start_date} a {end_date}")
+        print(f"Período: {start_date} a {end_date} (API: {sync_range[0]} a {sync_range[1]})")
         print(f"Campanhas encontradas na API: {len(campaigns_data)}")
-        print(f"Campanhas já no banco: {len(existing_campaigns)}")
-        
-        # Filtra apenas campanhas novas
-        new_campaigns = db.filter_new_campaigns(campaigns_data, account_id)
-        print(f"Campanhas novas para salvar: {len(new_campaigns)}")
         
-        # Salva apenas dados novos no banco
+        # Salva novos e regrava só os registros com métricas alteradas
         save_stats = None
-        if new_campaigns:
-            save_stats = db.save_campaign_data(new_campaigns)
+        if campaigns_data:
+            save_stats = db.save_campaign_data(campaigns_data)
             print(f"\nResultado do salvamento:")
             print(f"  - Novos salvos: {save_stats['novos_salvos']}")
+            print(f"  - Atualizados: {save_stats['atualizados']}")
+            print(f"  - Inalterados: {save_stats['inalterados']}")
             print(f"  - Duplicados ignorados: {save_stats['duplicados_ignorados']}")
             print(f"  - Erros: {save_stats['erros']}")
             
@@ -139,6 +154,9 @@ def generate_facebook_report(client, start_date, end_date):
         else:
             print("Nenhuma campanha nova para salvar.")
         
+        if not save_stats or save_stats['erros'] == 0:
+            db.advance_sync_watermark('facebook', account_id, *sync_range)
+        
         # Atualiza último relatório no banco
         db.update_last_facebook_report(client['id'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         
@@ -146,13 +164,17 @@ def generate_facebook_report(client, start_date, end_date):
         if save_stats:
             if save_stats['novos_salvos'] > 0:
                 flash(f"Relatório gerado! {save_stats['novos_salvos']} novos registros salvos no banco.", 'success')
-            if save_stats['duplicados_ignorados'] > 0:
-                flash(f"{save_stats['duplicados_ignorados']} registros já existiam e foram ignorados.", 'info')
+            if save_stats['atualizados'] > 0:
+                flash(f"{save_stats['atualizados']} registros tiveram métricas alteradas e foram atualizados.", 'info')
+            if save_stats['inalterados'] + save_stats['duplicados_ignorados'] > 0:
+                flash(f"{save_stats['inalterados'] + save_stats['duplicados_ignorados']} registros já existiam sem alterações.", 'info')
             if save_stats['erros'] > 0:
                 flash(f"{save_stats['erros']} erros ocorreram durante o salvamento.", 'warning')
         
-        # Gera CSV para download (com todos os dados da API, independente do que foi salvo)
-        return generate_csv_response(campaigns_data, client['name'], start_date, end_date)
+        # Gera CSV para download (dias estáveis do banco + dados da API,
+        # independente do que foi salvo)
+        return generate_csv_response(itertools.chain(stored_rows, campaigns_data),
+                                     client['name'], start_date, end_date)
         
     except Exception as e:
         flash(f"Erro ao gerar relatório Facebook: {str(e)}", 'error')
@@ -166,32 +188,41 @@ def generate_google_ads_report(client, start_date, end_date):
             flash("Cliente não possui conta Google Ads configurada", 'error')
             return redirect(url_for('client_page', client_id=client['id'], platform='google'))
         
-        # Busca dados via API
-        campaigns_data = google_ads_api.get_campaigns_report(customer_id, start_date, end_date)
-        
-        if not campaigns_data:
+        # Dias já sincronizados e estáveis vêm do banco; só o restante vai à API
+        sync_range = db.plan_sync_range('google', customer_id, start_date, end_date)
+        fetch_start = sync_range[0] if sync_range else None
+        stored_end = previous_day(fetch_start) if fetch_start else end_date
+        stored_rows = []
+        if stored_end >= start_date:
+            stored_rows = db.iter_existing_google_ads_for_period(customer_id, start_date, stored_end)
+        
+        if not sync_range:
+            print(f"Período {start_date} a {end_date} já sincronizado - CSV gerado a partir do banco")
+            return generate_google_ads_csv_response(stored_rows, client['name'], start_date, end_date)
+        
+        # Busca dados via API (com as credenciais do usuário conectado, se houver), com o
+        # mesmo filtro de impressões das sincronizações que gravaram os dias lidos do banco
+        campaigns_data = google_ads_api.for_user(session.get('user_id')).get_campaigns_report(
+            customer_id, *sync_range, skip_zero_impressions=db.sync_skip_zero_impressions)
+        
+        if not campaigns_data and fetch_start == start_date:
+            db.advance_sync_watermark('google', customer_id, *sync_range)
             flash("Nenhum dado encontrado para o período selecionado", 'warning')
             return redirect(url_for('client_page', client_id=client['id'], platform='google'))
         
-        # Verifica campanhas existentes no período
-        existing_campaigns = db.get_existing_google_ads_for_period(customer_id, start_date, end_date)
-        
         print(f"\n=== RELATÓRIO GOOGLE ADS ====")
         print(f"Cliente: {client['name']} (Customer ID: {customer_id})")
-        print(f"Período: {start_date} a {end_date}")
+        print(f"Período: {start_date} a {end_date} (API: {sync_range[0]} a {sync_range[1]})")
         print(f"Campanhas encontradas na API: {len(campaigns_data)}")
-        print(f"Campanhas já no banco: {len(existing_campaigns)}")
-        
-        # Filtra apenas campanhas novas
-        new_campaigns = db.filter_new_google_ads_campaigns(campaigns_data, customer_id)
-        print(f"Campanhas novas para salvar: {len(new_campaigns)}")
         
-        # Salva apenas dados novos no banco
+        # Salva novos e regrava só os registros com métricas alteradas
         save_stats = None
-        if new_campaigns:
-            save_stats = db.save_google_ads_data(new_campaigns)
+        if campaigns_data:
+            save_stats = db.save_google_ads_data(campaigns_data)
             print(f"\nResultado do salvamento:")
             print(f"  - Novos salvos: {save_stats['novos_salvos']}")
+            print(f"  - Atualizados: {save_stats['atualizados']}")
+            print(f"  - Inalterados: {save_stats['inalterados']}")
             print(f"  - Duplicados ignorados: {save_stats['duplicados_ignorados']}")
             print(f"  - Erros: {save_stats['erros']}")
             
@@ -200,6 +231,9 @@ def generate_google_ads_report(client, start_date, end_date):
         else:
             print("Nenhuma campanha nova para salvar.")
         
+        if not save_stats or save_stats['erros'] == 0:
+            db.advance_sync_watermark('google', customer_id, *sync_range)
+        
         # Atualiza último relatório no banco
         db.update_last_google_report(client['id'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         
@@ -207,84 +241,114 @@ def generate_google_ads_report(client, start_date, end_date):
         if save_stats:
             if save_stats['novos_salvos'] > 0:
                 flash(f"Relatório Google Ads gerado! {save_stats['novos_salvos']} novos registros salvos no banco.", 'success')
-            if save_stats['duplicados_ignorados'] > 0:
-                flash(f"{save_stats['duplicados_ignorados']} registros já existiam e foram ignorados.", 'info')
+            if save_stats['atualizados'] > 0:
+                flash(f"{save_stats['atualizados']} registros tiveram métricas alteradas e foram atualizados.", 'info')
+            if save_stats['inalterados'] + save_stats['duplicados_ignorados'] > 0:
+                flash(f"{save_stats['inalterados'] + save_stats['duplicados_ignorados']} registros já existiam sem alterações.", 'info')
             if save_stats['erros'] > 0:
                 flash(f"{save_stats['erros']} erros ocorreram durante o salvamento.", 'warning')
         
-        # Gera CSV para download (com todos os dados da API, independente do que foi salvo)
-        return generate_google_ads_csv_response(campaigns_data, client['name'], start_date, end_date)
+        # Gera CSV para download (dias estáveis do banco + dados da API,
+        # independente do que foi salvo)
+        return generate_google_ads_csv_response(itertools.chain(stored_rows, campaigns_data),
+                                                client['name'], start_date, end_date)
         
     except Exception as e:
         flash(f"Erro ao gerar relatório Google Ads: {str(e)}", 'error')
         return redirect(url_for('client_page', client_id=client['id'], platform='google'))
 
-def generate_csv_response(data, client_name, start_date, end_date):
-    """Gera resposta CSV para download"""
+# Colunas do CSV do Facebook (baseadas no CSV original)
+FACEBOOK_CSV_FIELDS = [
+    'account_id', 'campaign_id', 'campaign_name', 'date_start',
+    'reach', 'impressions', 'spend', 'inline_link_clicks',
+    'link_click', 'landing_page_view', 'offsite_conversion_fb_pixel_add_to_cart',
+    'offsite_conversion_fb_pixel_initiate_checkout', 'offsite_conversion_fb_pixel_lead',
+    'onsite_conversion_messaging_conversation_started_7d', 'offsite_conversion_fb_pixel_purchase',
+    'offsite_conversion_fb_pixel_custom', 'offsite_conversion_fb_pixel_complete_registration',
+    'onsite_conversion_lead_grouped', 'id'
+]
+
+# Colunas do CSV do Google Ads
+GOOGLE_ADS_CSV_FIELDS = [
+    'id_google', 'nome_campanha', 'dia', 'clicks', 'conversions',
+    'conversions_value', 'ctr', 'average_cpc', 'impressions', 'cost'
+]
+
+def previous_day(date_str):
+    """Dia anterior a uma data YYYY-MM-DD"""
+    return (datetime.strptime(date_str, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+
+def iter_stored_facebook_rows(account_id, start_date, end_date):
+    """Linhas gravadas de relatorio_fb_campaigns no formato do CSV (id = campaign_id, como na API)"""
+    for row in db.iter_existing_campaigns_for_period(account_id, start_date, end_date):
+        yield {**row, 'id': row.get('campaign_id')}
+
+def iter_csv_chunks(rows, fieldnames, flush_size=64 * 1024):
+    """
+    Gera o CSV em pedaços de texto a partir de uma lista ou stream de linhas
+    
+    Só mantém em memória o buffer atual (até flush_size caracteres), então
+    pode ser alimentado direto por um gerador do banco ou da API.
+    Campos ausentes saem vazios e campos extras são ignorados.
+    
+    Se a leitura falhar no meio (os cabeçalhos HTTP já foram enviados), o
+    erro é registrado no log e o CSV termina com uma linha de erro, para o
+    arquivo não parecer completo.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, restval='', extrasaction='ignore')
+    header_written = False
+    
     try:
-        output = io.StringIO()
-        
-        if data:
-            # Define colunas baseadas no CSV original
-            fieldnames = [
-                'account_id', 'campaign_id', 'campaign_name', 'date_start',
-                'reach', 'impressions', 'spend', 'inline_link_clicks',
-                'link_click', 'landing_page_view', 'offsite_conversion_fb_pixel_add_to_cart',
-                'offsite_conversion_fb_pixel_initiate_checkout', 'offsite_conversion_fb_pixel_lead',
-                'onsite_conversion_messaging_conversation_started_7d', 'offsite_conversion_fb_pixel_purchase',
-                'offsite_conversion_fb_pixel_custom', 'offsite_conversion_fb_pixel_complete_registration',
-                'onsite_conversion_lead_grouped', 'id'
-            ]
-            
-            writer = csv.DictWriter(output, fieldnames=fieldnames)
-            writer.writeheader()
+        for row in rows:
+            if not header_written:
+                writer.writeheader()
+                header_written = True
+            writer.writerow(row)
             
-            for row in data:
-                writer.writerow(row)
-        
-        # Prepara resposta
-        from flask import make_response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        
+            if buffer.tell() >= flush_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+    except Exception as e:
+        print(f"Erro ao gerar CSV em streaming, arquivo incompleto: {e}")
+        writer.writerow({fieldnames[0]: f"ERRO: relatório incompleto ({e})"})
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def csv_stream_response(rows, fieldnames, filename):
+    """
+    Monta resposta HTTP de download com o CSV transmitido em streaming
+    
+    A primeira linha (e com ela a primeira página do banco) é lida antes de
+    montar a resposta: um erro nessa leitura chega a quem chamou, que ainda
+    pode avisar o usuário em vez de enviar um CSV vazio.
+    """
+    rows = iter(rows)
+    first_row = next(rows, None)
+    if first_row is not None:
+        rows = itertools.chain([first_row], rows)
+    response = Response(stream_with_context(iter_csv_chunks(rows, fieldnames)), mimetype='text/csv')
+    response.headers['Content-Type'] = 'text/csv'
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def generate_csv_response(data, client_name, start_date, end_date):
+    """Gera resposta CSV para download (aceita lista ou stream de linhas)"""
+    try:
         filename = f"relatorio_facebook_{client_name}_{start_date}_{end_date}.csv"
-        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+        return csv_stream_response(data or [], FACEBOOK_CSV_FIELDS, filename)
         
     except Exception as e:
         flash(f"Erro ao gerar arquivo CSV: {str(e)}", 'error')
         return redirect(url_for('index'))
 
 def generate_google_ads_csv_response(data, client_name, start_date, end_date):
-    """Gera resposta CSV para download - Google Ads"""
+    """Gera resposta CSV para download - Google Ads (aceita lista ou stream de linhas)"""
     try:
-        output = io.StringIO()
-        
-        if data:
-            # Define colunas baseadas no CSV do Google Ads
-            fieldnames = [
-                'id_google', 'nome_campanha', 'dia', 'clicks', 'conversions',
-                'conversions_value', 'ctr', 'average_cpc', 'impressions', 'cost'
-            ]
-            
-            writer = csv.DictWriter(output, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for row in data:
-                # Filtra apenas os campos do CSV
-                csv_row = {field: row.get(field, '') for field in fieldnames}
-                writer.writerow(csv_row)
-        
-        # Prepara resposta
-        from flask import make_response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        
         filename = f"relatorio_google_ads_{client_name}_{start_date}_{end_date}.csv"
-        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+        return csv_stream_response(data or [], GOOGLE_ADS_CSV_FIELDS, filename)
         
     except Exception as e:
         flash(f"Erro ao gerar arquivo CSV Google Ads: {str(e)}", 'error')
@@ -376,15 +440,28 @@ def send_facebook_whatsapp(client, start_date, end_date, phone_number, conversio
             flash("Cliente não possui conta Facebook configurada", 'error')
             return redirect(url_for('client_page', client_id=client['id'], platform='facebook'))
         
-        # Busca dados via API para obter informações atualizadas
-        campaigns_data = fb_api.get_campaigns_report(account_id, start_date, end_date)
+        # Usa o rollup diário do banco quando ele cobre o período inteiro
+        campaigns_data = db.get_facebook_rollup_for_period(account_id, start_date, end_date)
+        if campaigns_data and db.rollup_covers_period('facebook', account_id, campaigns_data,
+                                                      start_date, end_date):
+            print(f"[WHATSAPP] Usando rollup diário do banco: {len(campaigns_data)} dias")
+        else:
+            # Busca só o total da conta (uma linha já agregada pela API) para montar a mensagem
+            summary = fb_api.get_account_summary(account_id, start_date, end_date)
+            campaigns_data = [summary] if summary else []
+            if summary:
+                print("[WHATSAPP] Usando resumo da conta via API")
         
         if not campaigns_data:
             flash("Nenhum dado encontrado para o período selecionado", 'warning')
             return redirect(url_for('client_page', client_id=client['id'], platform='facebook'))
         
+        # Linhas de rollup agregam várias campanhas; o resumo da conta não traz a contagem
+        campaigns_count = sum(int(row.get('rows') or 1) for row in campaigns_data) if 'rows' in campaigns_data[0] else None
+        count_text = f" ({campaigns_count} campanhas)" if campaigns_count else ""
+        
         print(f"[WHATSAPP] Formatando mensagem personalizada - Tipo: {conversion_type}")
-        print(f"[WHATSAPP] Dados de {len(campaigns_data)} campanhas encontradas")
+        print(f"[WHATSAPP] Dados{count_text} encontrados")
         
         # Formata mensagem personalizada com dados reais e tipo de conversão
         message = evolution_api.format_report_message(
@@ -407,7 +484,7 @@ def send_facebook_whatsapp(client, start_date, end_date, phone_number, conversio
                 db.update_last_facebook_send(client['id'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
             except:
                 pass  # Ignora se método não existir
-            flash(f"Relatório {conversion_type} enviado via WhatsApp com sucesso! ({len(campaigns_data)} campanhas)", 'success')
+            flash(f"Relatório {conversion_type} enviado via WhatsApp com sucesso!{count_text}", 'success')
         else:
             flash(f"Erro ao enviar via WhatsApp: {result['message']}", 'error')
         
@@ -435,55 +512,69 @@ def send_google_ads_whatsapp(client, start_date, end_date, phone_number, convers
         print(f"Cliente: {client['name']} (Customer ID: {customer_id})")
         print(f"Período: {start_date} a {end_date}")
         
-        # PASSO 1: PRIMEIRO CONSULTA A TABELA relatorio_google_ads
-        # Busca dados onde customer_id = id_google
-        campaigns_data = db.get_existing_google_ads_for_period(customer_id, start_date, end_date)
-        print(f"✅ Campanhas encontradas no banco (relatorio_google_ads): {len(campaigns_data)}")
+        # PASSO 1: PRIMEIRO CONSULTA O ROLLUP DIÁRIO (no máximo uma linha por dia)
+        # Sem rollup, recorre à tabela relatorio_google_ads onde customer_id = id_google
+        rollup_rows = db.get_google_ads_rollup_for_period(customer_id, start_date, end_date)
+        if rollup_rows:
+            latest_day = str(rollup_rows[-1]['dia'])
+        else:
+            latest_day = db.get_latest_google_ads_day(customer_id, start_date, end_date)
+        print(f"✅ Último dia com dados no banco: {latest_day or 'nenhum'} (rollup: {len(rollup_rows)} dias)")
+        
+        # Rollup só quando cobre o período inteiro; um rollup parcial daria totais menores
+        rollup_complete = bool(rollup_rows) and db.rollup_covers_period('google', customer_id, rollup_rows,
+                                                                        start_date, end_date)
+        
+        def load_bank_data():
+            # Rollup quando completo; senão lê as campanhas do banco em streaming
+            if rollup_complete:
+                return rollup_rows
+            return db.iter_existing_google_ads_for_period(customer_id, start_date, end_date)
         
         # PASSO 2: Verifica se temos dados suficientes no banco
         use_bank_data = True
-        if not campaigns_data:
+        campaigns_data = None
+        if not latest_day:
             print(f"⚠️ Nenhum dado encontrado no banco para o período")
             use_bank_data = False
         else:
             # Verifica se os dados são recentes o suficiente
-            from datetime import datetime, timedelta
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
             recent_threshold = (end_date_obj - timedelta(days=2)).strftime('%Y-%m-%d')
             
-            recent_data = [c for c in campaigns_data if c.get('dia', '') >= recent_threshold]
-            if len(recent_data) == 0 and len(campaigns_data) > 0:
+            if latest_day < recent_threshold:
                 print(f"⚠️ Dados do banco são antigos (mais de 2 dias). Buscando API...")
                 use_bank_data = False
             else:
-                print(f"✅ Usando dados do banco: {len(campaigns_data)} campanhas")
-                if recent_data:
-                    print(f"   - {len(recent_data)} campanhas recentes (últimos 2 dias)")
+                print(f"✅ Usando dados do banco (último dia: {latest_day})")
+                campaigns_data = load_bank_data()
         
         # PASSO 3: Busca na API apenas se necessário
         if not use_bank_data:
             print(f"🔄 Buscando dados via API Google Ads...")
             try:
-                api_campaigns_data = google_ads_api.get_campaigns_report(customer_id, start_date, end_date)
+                api_campaigns_data = google_ads_api.for_user(session.get('user_id')).get_campaigns_report(
+                    customer_id, start_date, end_date)
                 print(f"📊 API retornou: {len(api_campaigns_data)} campanhas")
                 
                 if api_campaigns_data:
                     campaigns_data = api_campaigns_data
                     
-                    # Salva dados novos no banco para próximas consultas
-                    new_campaigns = db.filter_new_google_ads_campaigns(campaigns_data, customer_id)
-                    if new_campaigns:
-                        save_stats = db.save_google_ads_data(new_campaigns)
-                        print(f"💾 Salvos no banco: {save_stats['novos_salvos']} novos registros")
+                    # Salva dados novos/alterados no banco para próximas consultas
+                    save_stats = db.save_google_ads_data(campaigns_data)
+                    if save_stats['novos_salvos'] or save_stats['atualizados']:
+                        print(f"💾 Salvos no banco: {save_stats['novos_salvos']} novos, "
+                              f"{save_stats['atualizados']} atualizados")
                         if save_stats['duplicados_ignorados'] > 0:
                             print(f"   - {save_stats['duplicados_ignorados']} duplicados ignorados")
-                        if save_stats['erros'] > 0:
-                            print(f"   - {save_stats['erros']} erros: {save_stats['detalhes_erros']}")
                     else:
                         print(f"💾 Todos os dados já existiam no banco")
-                elif campaigns_data:
+                    if save_stats['erros'] > 0:
+                        print(f"   - {save_stats['erros']} erros: {save_stats['detalhes_erros']}")
+                elif latest_day:
                     # API falhou mas temos dados antigos do banco
-                    print(f"⚠️ API falhou, usando dados do banco ({len(campaigns_data)} campanhas)")
+                    print(f"⚠️ API sem dados, usando dados do banco")
+                    campaigns_data = load_bank_data()
                 else:
                     # Nem API nem banco têm dados
                     flash("Nenhum dado encontrado para o período selecionado", 'warning')
@@ -491,23 +582,27 @@ def send_google_ads_whatsapp(client, start_date, end_date, phone_number, convers
                     
             except Exception as api_error:
                 print(f"❌ Erro na API: {api_error}")
-                if campaigns_data:
-                    print(f"🔄 Usando dados do banco como fallback ({len(campaigns_data)} campanhas)")
+                if latest_day:
+                    print(f"🔄 Usando dados do banco como fallback")
+                    campaigns_data = load_bank_data()
                 else:
                     flash(f"Erro na API e sem dados no banco: {str(api_error)}", 'error')
                     return redirect(url_for('client_page', client_id=client['id'], platform='google'))
         
+        # PASSO 4: Calcula as métricas consumindo os dados em streaming e formata a mensagem
+        metrics = evolution_api.message_formatter.calculate_google_ads_metrics(campaigns_data)
+        
         print(f"\n[WHATSAPP] Formatando mensagem Google Ads")
         print(f"[WHATSAPP] Fonte dos dados: {'Banco de dados' if use_bank_data else 'API + Banco'}")
-        print(f"[WHATSAPP] Campanhas processadas: {len(campaigns_data)}")
+        print(f"[WHATSAPP] Campanhas processadas: {metrics['rows']}")
         print(f"[WHATSAPP] Tipo de conversão: {conversion_type}")
         
-        # PASSO 4: Formata mensagem personalizada
         message = evolution_api.format_google_ads_message(
             client['name'], 
             start_date, 
             end_date, 
-            campaigns_data
+            None,
+            metrics=metrics
         )
         
         print(f"[WHATSAPP] Mensagem formatada: {len(message)} caracteres")
@@ -523,7 +618,7 @@ def send_google_ads_whatsapp(client, start_date, end_date, phone_number, convers
             except Exception as update_error:
                 print(f"⚠️ Erro ao atualizar último envio: {update_error}")
             
-            flash(f"✅ Relatório Google Ads enviado via WhatsApp! ({len(campaigns_data)} campanhas)", 'success')
+            flash(f"✅ Relatório Google Ads enviado via WhatsApp! ({metrics['rows']} campanhas)", 'success')
         else:
             flash(f"❌ Erro ao enviar via WhatsApp: {result['message']}", 'error')
         
@@ -618,10 +713,14 @@ def test_evolution_simple():
 @app.route('/health')
 def health_check():
     """Endpoint de saúde do sistema"""
-    return jsonify({
+    health = {
         'status': 'healthy',
         'timestamp': datetime.now().isoformat()
-    })
+    }
+    # Hits/misses e bytes do cache de relatórios deste processo
+    if fb_api.cache:
+        health['report_cache'] = fb_api.cache.get_stats()
+    return jsonify(health)
 
 @app.route('/mass_update', methods=['POST'])
 def mass_update():
@@ -642,16 +741,18 @@ def mass_update():
         print(f"Período: {period} dias ({start_date} a {end_date})")
         
         # Busca todos os clientes ativos
-        facebook_clients = db.get_active_facebook_clients()
-        google_clients = db.get_active_google_clients()
+        active_clients = db.get_active_clients()
+        facebook_clients = active_clients['facebook']
+        google_clients = active_clients['google']
         
         results = {
             'facebook': {'total': len(facebook_clients), 'success': 0, 'errors': 0, 'details': []},
             'google': {'total': len(google_clients), 'success': 0, 'errors': 0, 'details': []}
         }
         
-        # Processa clientes Facebook
-        for client in facebook_clients:
+        # Processa clientes Facebook (contas com menos uso da API primeiro,
+        # para que contas perto do limite tenham tempo de se recuperar)
+        for client in fb_api.throttler.order_accounts(facebook_clients, key=lambda c: c.get('act_fb')):
             try:
                 client_result = process_facebook_mass_update(client, start_date, end_date)
                 if client_result['success']:
@@ -667,10 +768,11 @@ def mass_update():
                     'message': str(e)
                 })
         
-        # Processa clientes Google
-        for client in google_clients:
+        # Processa clientes Google (consultas de todos os clientes em paralelo);
+        # cada cliente é gravado assim que sua busca termina
+        for client, prefetched in google_ads_api.iter_clients_reports(google_clients, start_date, end_date, db):
             try:
-                client_result = process_google_mass_update(client, start_date, end_date)
+                client_result = process_google_mass_update(client, start_date, end_date, prefetched)
                 if client_result['success']:
                     results['google']['success'] += 1
                 else:
@@ -728,10 +830,23 @@ def process_facebook_mass_update(client, start_date, end_date):
         
         print(f"📊 Processando Facebook: {client_name} ({account_id})")
         
-        # Busca dados via API
-        campaigns_data = fb_api.get_campaigns_report(account_id, start_date, end_date)
+        # Pula os dias já sincronizados e estáveis
+        sync_range = db.plan_sync_range('facebook', account_id, start_date, end_date)
+        if not sync_range:
+            return {
+                'client_name': client_name,
+                'success': True,
+                'message': 'Período já sincronizado',
+                'new_records': 0
+            }
         
-        if not campaigns_data:
+        # Lê a API em streaming (todas as páginas) e grava em blocos;
+        # salva novos e regrava só os registros com métricas alteradas
+        save_stats = db.save_campaign_data(fb_api.iter_campaigns_report(
+            account_id, *sync_range, skip_zero_impressions=db.sync_skip_zero_impressions))
+        
+        if not save_stats['total_enviados']:
+            db.advance_sync_watermark('facebook', account_id, *sync_range)
             return {
                 'client_name': client_name,
                 'success': True,
@@ -739,33 +854,31 @@ def process_facebook_mass_update(client, start_date, end_date):
                 'new_records': 0
             }
         
-        # Filtra apenas campanhas novas
-        new_campaigns = db.filter_new_campaigns(campaigns_data, account_id)
+        new_records = save_stats['novos_salvos']
+        updated_records = save_stats['atualizados']
         
-        # Salva apenas dados novos no banco
-        new_records = 0
-        if new_campaigns:
-            save_stats = db.save_campaign_data(new_campaigns)
-            new_records = save_stats['novos_salvos']
-            
-            if save_stats['erros'] > 0:
-                return {
-                    'client_name': client_name,
-                    'success': False,
-                    'message': f'Erro ao salvar: {save_stats["erros"]} erros',
-                    'new_records': new_records
-                }
+        if save_stats['erros'] > 0:
+            return {
+                'client_name': client_name,
+                'success': False,
+                'message': f'Erro ao salvar: {save_stats["erros"]} erros',
+                'new_records': new_records,
+                'updated_records': updated_records
+            }
+        
+        db.advance_sync_watermark('facebook', account_id, *sync_range)
         
         # Atualiza último relatório
         db.update_last_facebook_report(client['id'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         
-        print(f"✅ Facebook {client_name}: {new_records} novos registros")
+        print(f"✅ Facebook {client_name}: {new_records} novos registros, {updated_records} atualizados")
         
         return {
             'client_name': client_name,
             'success': True,
-            'message': f'{new_records} novos registros salvos',
-            'new_records': new_records
+            'message': f'{new_records} novos registros salvos, {updated_records} atualizados',
+            'new_records': new_records,
+            'updated_records': updated_records
         }
         
     except Exception as e:
@@ -831,9 +944,11 @@ def dashboard():
         user = request.current_user
         user_id = user['id']
         
-        # Carregar apenas clientes que o usuário tem acesso
-        facebook_clients = db.get_user_facebook_clients(user_id)
-        google_clients = db.get_user_google_clients(user_id)
+        # Carregar apenas clientes que o usuário tem acesso (consultas em paralelo)
+        facebook_clients, google_clients = async_db.run(
+            async_db.get_user_facebook_clients(user_id),
+            async_db.get_user_google_clients(user_id)
+        )
         
         return render_template('dashboard.html',
                              facebook_clients=facebook_clients,
@@ -952,6 +1067,7 @@ def api_google_revoke():
         
         # Revogar acesso
         success = google_oauth.revoke_access(user_id)
+        google_ads_client_pool.invalidate(user_id)
         
         if success:
             return jsonify({'success': True, 'message': 'Acesso ao Google Ads revogado com sucesso'})
@@ -1081,6 +1197,9 @@ def auth_google_callback():
         result = google_oauth.handle_callback(authorization_code, state)
         
         if result['success']:
+            # Novos tokens: o cliente em cache do usuário é recriado na próxima consulta
+            if session.get('user_id'):
+                google_ads_client_pool.invalidate(session['user_id'])
             flash(result['message'], 'success')
             print(f"[DEBUG] Redirecionando para dashboard com show_google_clients=true")
             # Redirecionar para dashboard com parâmetro para mostrar modal
@@ -1094,8 +1213,14 @@ def auth_google_callback():
         flash(f'Erro no callback: {str(e)}', 'error')
         return redirect(url_for('dashboard'))
 
-def process_google_mass_update(client, start_date, end_date):
-    """Processa atualização de um cliente Google"""
+def process_google_mass_update(client, start_date, end_date, prefetched=None):
+    """
+    Processa atualização de um cliente Google
+    
+    Args:
+        prefetched: Resultado de GoogleAdsAPI.iter_clients_reports para o cliente (opcional);
+                    se a busca paralela falhou, o cliente é lido de novo em streaming
+    """
     try:
         client_name = client.get('name', 'N/A')
         customer_id = client.get('id_google')
@@ -1109,10 +1234,33 @@ def process_google_mass_update(client, start_date, end_date):
         
         print(f"📊 Processando Google: {client_name} ({customer_id})")
         
-        # Busca dados via API
-        campaigns_data = google_ads_api.get_campaigns_report(customer_id, start_date, end_date)
+        # Pula os dias já sincronizados e estáveis
+        if prefetched is None:
+            sync_range = db.plan_sync_range('google', customer_id, start_date, end_date)
+        else:
+            sync_range = prefetched['sync_range']
+        if not sync_range:
+            return {
+                'client_name': client_name,
+                'success': True,
+                'message': 'Período já sincronizado',
+                'new_records': 0
+            }
         
-        if not campaigns_data:
+        if prefetched is None or prefetched['error']:
+            if prefetched:
+                print(f"⚠️  Busca paralela falhou para {customer_id} ({prefetched['error']}), lendo em streaming")
+            # Lê a API em streaming (search_stream) e grava em blocos
+            campaigns_data = google_ads_api.iter_campaigns_report(
+                customer_id, *sync_range, skip_zero_impressions=db.sync_skip_zero_impressions)
+        else:
+            campaigns_data = prefetched['data']
+        
+        # Salva novos e regrava só os registros com métricas alteradas
+        save_stats = db.save_google_ads_data(campaigns_data)
+        
+        if not save_stats['total_enviados']:
+            db.advance_sync_watermark('google', customer_id, *sync_range)
             return {
                 'client_name': client_name,
                 'success': True,
@@ -1120,33 +1268,31 @@ def process_google_mass_update(client, start_date, end_date):
                 'new_records': 0
             }
         
-        # Filtra apenas campanhas novas
-        new_campaigns = db.filter_new_google_ads_campaigns(campaigns_data, customer_id)
+        new_records = save_stats['novos_salvos']
+        updated_records = save_stats['atualizados']
         
-        # Salva apenas dados novos no banco
-        new_records = 0
-        if new_campaigns:
-            save_stats = db.save_google_ads_data(new_campaigns)
-            new_records = save_stats['novos_salvos']
-            
-            if save_stats['erros'] > 0:
-                return {
-                    'client_name': client_name,
-                    'success': False,
-                    'message': f'Erro ao salvar: {save_stats["erros"]} erros',
-                    'new_records': new_records
-                }
+        if save_stats['erros'] > 0:
+            return {
+                'client_name': client_name,
+                'success': False,
+                'message': f'Erro ao salvar: {save_stats["erros"]} erros',
+                'new_records': new_records,
+                'updated_records': updated_records
+            }
+        
+        db.advance_sync_watermark('google', customer_id, *sync_range)
         
         # Atualiza último relatório
         db.update_last_google_report(client['id'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         
-        print(f"✅ Google {client_name}: {new_records} novos registros")
+        print(f"✅ Google {client_name}: {new_records} novos registros, {updated_records} atualizados")
         
         return {
             'client_name': client_name,
             'success': True,
-            'message': f'{new_records} novos registros salvos',
-            'new_records': new_records
+            'message': f'{new_records} novos registros salvos, {updated_records} atualizados',
+            'new_records': new_records,
+            'updated_records': updated_records
         }
         
     except Exception as e:
@@ -0,0 +1,70 @@
+"""
+Variante asyncio da classe Database
+
+Expõe os mesmos métodos de Database como corrotinas, executadas em um pool
+de threads que compartilha o cliente Supabase (e portanto o mesmo pool de
+conexões HTTP) da instância síncrona. Assim consultas independentes podem
+rodar em paralelo com asyncio.gather em vez de uma depois da outra.
+
+Exemplo:
+    adb = AsyncDatabase(db)
+    fb_clients, google_clients = adb.run(
+        adb.get_user_facebook_clients(user_id),
+        adb.get_user_google_clients(user_id),
+    )
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, List, Optional
+
+from database import Database
+
+class AsyncDatabase:
+    def __init__(self, db: Optional[Database] = None, max_workers: Optional[int] = None):
+        """
+        Args:
+            db: Instância de Database a ser compartilhada (cria uma nova se omitido)
+            max_workers: Consultas simultâneas (padrão: SUPABASE_ASYNC_WORKERS ou 8)
+        """
+        self.db = db or Database()
+        self.max_workers = max_workers or int(os.getenv('SUPABASE_ASYNC_WORKERS', 8))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='async-db')
+
+    def __getattr__(self, name: str) -> Any:
+        """
+        Devolve os métodos públicos de Database como corrotinas
+
+        Métodos iter_* (geradores) e atributos que não são métodos são
+        devolvidos como estão.
+        """
+        attr = getattr(self.db, name)
+        if name.startswith('_') or name.startswith('iter_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def coroutine(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+
+        return coroutine
+
+    async def gather(self, *calls: Awaitable) -> List[Any]:
+        """Executa as consultas em paralelo e devolve os resultados na mesma ordem"""
+        return list(await asyncio.gather(*calls))
+
+    def run(self, *calls: Awaitable) -> List[Any]:
+        """
+        Executa as consultas em paralelo a partir de código síncrono (ex.: rotas Flask)
+
+        Cria um event loop próprio, então não deve ser chamado de dentro de um
+        loop já em execução; nesse caso use await gather(...).
+        """
+        return asyncio.run(self.gather(*calls))
+
+    def close(self):
+        """Encerra o pool de threads"""
+        self._executor.shutdown(wait=False)
@@ -9,8 +9,8 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from database import Database
 
 class AuthManager:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or Database()
         self.secret_key = os.getenv('JWT_SECRET_KEY', 'your-jwt-secret-key-change-this')
         self.token_expiry_hours = 24
     
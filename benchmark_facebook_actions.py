@@ -0,0 +1,125 @@
+"""
+Micro-benchmark do processamento de linhas do Facebook
+
+Compara FacebookAPI._process_campaign_data (mapeamento tipo de ação -> coluna
+em uma passada) com a implementação anterior (cadeia de elif por ação),
+usando linhas sintéticas no formato da Graph API. Não acessa a API.
+
+Uso:
+    python benchmark_facebook_actions.py [linhas] [ações por linha]
+"""
+
+import random
+import sys
+import time
+
+from facebook_api import FacebookAPI, FB_ACTION_COLUMNS
+
+def legacy_process_campaign_data(raw_data):
+    """Implementação anterior (cadeia de elif), mantida só para comparação"""
+    campaign = {
+        'account_id': raw_data.get('account_id', ''),
+        'campaign_id': raw_data.get('campaign_id', ''),
+        'campaign_name': raw_data.get('campaign_name', ''),
+        'date_start': raw_data.get('date_start', ''),
+        'reach': int(raw_data.get('reach', 0)),
+        'impressions': int(raw_data.get('impressions', 0)),
+        'spend': float(raw_data.get('spend', 0)),
+        'inline_link_clicks': int(raw_data.get('inline_link_clicks', 0)),
+        'link_click': 0,
+        'landing_page_view': 0,
+        'offsite_conversion_fb_pixel_add_to_cart': 0,
+        'offsite_conversion_fb_pixel_initiate_checkout': 0,
+        'offsite_conversion_fb_pixel_lead': 0,
+        'onsite_conversion_messaging_conversation_started_7d': 0,
+        'offsite_conversion_fb_pixel_purchase': 0,
+        'offsite_conversion_fb_pixel_custom': 0,
+        'offsite_conversion_fb_pixel_complete_registration': 0,
+        'onsite_conversion_lead_grouped': 0,
+        'id': raw_data.get('campaign_id', '')
+    }
+
+    if 'actions' in raw_data:
+        for action in raw_data['actions']:
+            action_type = action.get('action_type', '')
+            value = int(float(action.get('value', 0)))
+
+            if action_type == 'link_click':
+                campaign['link_click'] = value
+            elif action_type == 'landing_page_view':
+                campaign['landing_page_view'] = value
+            elif action_type == 'offsite_conversion.fb_pixel_add_to_cart':
+                campaign['offsite_conversion_fb_pixel_add_to_cart'] = value
+            elif action_type == 'offsite_conversion.fb_pixel_initiate_checkout':
+                campaign['offsite_conversion_fb_pixel_initiate_checkout'] = value
+            elif action_type == 'offsite_conversion.fb_pixel_lead':
+                campaign['offsite_conversion_fb_pixel_lead'] = value
+            elif action_type == 'onsite_conversion.messaging_conversation_started_7d':
+                campaign['onsite_conversion_messaging_conversation_started_7d'] = value
+            elif action_type == 'offsite_conversion.fb_pixel_purchase':
+                campaign['offsite_conversion_fb_pixel_purchase'] = value
+            elif action_type == 'offsite_conversion.fb_pixel_custom':
+                campaign['offsite_conversion_fb_pixel_custom'] = value
+            elif action_type == 'offsite_conversion.fb_pixel_complete_registration':
+                campaign['offsite_conversion_fb_pixel_complete_registration'] = value
+            elif action_type == 'onsite_conversion.lead_grouped':
+                campaign['onsite_conversion_lead_grouped'] = value
+
+    return campaign
+
+def build_rows(count, actions_per_row):
+    """Gera linhas sintéticas com uma mistura de ações capturadas e ignoradas"""
+    random.seed(42)
+    action_types = list(FB_ACTION_COLUMNS) + [
+        'post_engagement', 'page_engagement', 'video_view', 'post_reaction',
+        'onsite_conversion.post_save', 'comment', 'omni_purchase', 'like',
+    ]
+    rows = []
+    for i in range(count):
+        rows.append({
+            'account_id': '123456789',
+            'campaign_id': str(1000 + i % 200),
+            'campaign_name': f'Campanha {i % 200}',
+            'date_start': '2024-01-01',
+            'reach': str(random.randint(0, 10000)),
+            'impressions': str(random.randint(0, 50000)),
+            'spend': f'{random.uniform(0, 500):.2f}',
+            'inline_link_clicks': str(random.randint(0, 1000)),
+            'actions': [
+                {'action_type': action_type, 'value': str(random.randint(0, 100))}
+                for action_type in random.sample(action_types, min(actions_per_row, len(action_types)))
+            ],
+        })
+    return rows
+
+def measure(process, rows, repeat=5):
+    """Melhor tempo de repeat execuções, em linhas por segundo"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            process(row)
+        best = min(best, time.perf_counter() - start)
+    return len(rows) / best
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    actions_per_row = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+
+    rows = build_rows(count, actions_per_row)
+    fb_api = FacebookAPI()
+
+    # As duas implementações precisam produzir as mesmas linhas
+    for row in rows[:1000]:
+        assert fb_api._process_campaign_data(row) == legacy_process_campaign_data(row)
+
+    legacy = measure(legacy_process_campaign_data, rows)
+    current = measure(fb_api._process_campaign_data, rows)
+
+    print(f"Linhas: {count} ({actions_per_row} ações por linha)")
+    print(f"elif (anterior):     {legacy:>12,.0f} linhas/s")
+    print(f"mapeamento (atual):  {current:>12,.0f} linhas/s")
+    print(f"Ganho: {current / legacy:.2f}x")
+
+if __name__ == "__main__":
+    main()
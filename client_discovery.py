@@ -8,13 +8,17 @@ from google_oauth import GoogleAdsOAuth
 from database import Database
 from auth_manager import AuthManager
 import requests
-from typing import List, Dict
+from typing import List, Dict, Optional
+from http_session import get_http_session
 
 class ClientDiscovery:
-    def __init__(self):
-        self.db = Database()
-        self.auth_manager = AuthManager()
-        self.google_oauth = GoogleAdsOAuth(self.auth_manager)
+    def __init__(self, db: Optional[Database] = None, auth_manager: Optional[AuthManager] = None,
+                 http_session: Optional[requests.Session] = None):
+        self.db = db or Database()
+        self.auth_manager = auth_manager or AuthManager(self.db)
+        # Sessão HTTP compartilhada (keep-alive e novas tentativas em 429/5xx)
+        self.http_session = http_session or get_http_session()
+        self.google_oauth = GoogleAdsOAuth(self.auth_manager, self.http_session)
     
     def discover_google_clients(self, user_id: str) -> Dict:
         """
@@ -35,7 +39,7 @@ class ClientDiscovery:
             }
             
             url = 'https://googleads.googleapis.com/v18/customers:listAccessibleCustomers'
-            response = requests.get(url, headers=headers)
+            response = self.http_session.get(url, headers=headers)
             
             if response.status_code != 200:
                 return {'success': False, 'message': f'Erro na API: {response.status_code}'}
@@ -124,6 +128,8 @@ class ClientDiscovery:
             
             if response.data:
                 print(f"Novo cliente Google criado: {customer_id}")
+                # Cadastro alterado: descarta o cache de clientes
+                self.db.invalidate_client_cache()
                 return response.data[0]
             
             return None
@@ -149,7 +155,7 @@ class ClientDiscovery:
             url = f'https://googleads.googleapis.com/v18/customers/{customer_id}/googleAds:search'
             data = {'query': query}
             
-            response = requests.post(url, headers=headers, json=data)
+            response = self.http_session.post(url, headers=headers, json=data)
             
             if response.status_code == 200:
                 result = response.json()
@@ -195,7 +201,7 @@ class ClientDiscovery:
             url = f'https://googleads.googleapis.com/v18/customers/{mcc_customer_id}/googleAds:search'
             data = {'query': query}
             
-            response = requests.post(url, headers=headers, json=data)
+            response = self.http_session.post(url, headers=headers, json=data)
             
             child_accounts = []
             
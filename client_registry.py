@@ -0,0 +1,124 @@
+"""
+Cache em memória do cadastro de clientes (relatorio_cadastro_clientes)
+
+Carrega todos os clientes de uma vez e indexa por id, id_facebook,
+id_google e nome, evitando uma consulta ao Supabase a cada lookup.
+O cache expira após CLIENT_REGISTRY_TTL segundos e deve ser invalidado
+explicitamente sempre que o cadastro for alterado.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from supabase_provider import get_supabase_client
+
+class ClientRegistry:
+    def __init__(self, supabase=None, ttl: Optional[float] = None):
+        """
+        Args:
+            supabase: Cliente Supabase usado para carregar o cadastro
+                      (padrão: cliente compartilhado do processo)
+            ttl: Tempo de vida do cache em segundos (padrão: CLIENT_REGISTRY_TTL ou 300)
+        """
+        self.supabase = supabase
+        self.ttl = ttl if ttl is not None else float(os.getenv('CLIENT_REGISTRY_TTL', 300))
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._by_id = {}
+        self._by_facebook_id = {}
+        self._by_google_id = {}
+        self._by_name = {}
+
+    @staticmethod
+    def _normalize_key(value) -> str:
+        """Sanitiza ids/nomes (remove espaços e quebras de linha)"""
+        return str(value).strip().replace('\n', '').replace('\r', '')
+
+    def invalidate(self):
+        """Descarta o cache; a próxima consulta recarrega o cadastro"""
+        with self._lock:
+            self._loaded_at = None
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and (time.monotonic() - self._loaded_at) < self.ttl
+
+    def _ensure_loaded(self):
+        """Carrega o cadastro completo se o cache estiver vazio ou expirado"""
+        if self._is_fresh():
+            return
+
+        with self._lock:
+            if self._is_fresh():
+                return
+
+            page_size = 1000
+            clients = []
+            offset = 0
+            while True:
+                response = (self.supabase or get_supabase_client()).table('relatorio_cadastro_clientes') \
+                    .select('*') \
+                    .order('id') \
+                    .range(offset, offset + page_size - 1) \
+                    .execute()
+                page = response.data or []
+                clients.extend(page)
+                if len(page) < page_size:
+                    break
+                offset += page_size
+
+            by_id, by_facebook_id, by_google_id, by_name = {}, {}, {}, {}
+            for client in clients:
+                by_id[self._normalize_key(client.get('id'))] = client
+                if client.get('id_facebook'):
+                    by_facebook_id.setdefault(self._normalize_key(client['id_facebook']), client)
+                if client.get('id_google'):
+                    by_google_id.setdefault(self._normalize_key(client['id_google']), client)
+                if client.get('name'):
+                    by_name.setdefault(self._normalize_key(client['name']), client)
+
+            self._by_id = by_id
+            self._by_facebook_id = by_facebook_id
+            self._by_google_id = by_google_id
+            self._by_name = by_name
+            self._loaded_at = time.monotonic()
+            print(f"[DEBUG] Cadastro de clientes carregado no cache: {len(clients)} clientes")
+
+    def _lookup(self, index_name: str, key) -> Optional[Dict]:
+        if key is None:
+            return None
+        self._ensure_loaded()
+        client = getattr(self, index_name).get(self._normalize_key(key))
+        # Devolve uma cópia para que alterações do chamador não contaminem o cache
+        return dict(client) if client else None
+
+    def get_by_id(self, client_id) -> Optional[Dict]:
+        return self._lookup('_by_id', client_id)
+
+    def get_by_facebook_id(self, facebook_id) -> Optional[Dict]:
+        return self._lookup('_by_facebook_id', facebook_id)
+
+    def get_by_google_id(self, google_id) -> Optional[Dict]:
+        return self._lookup('_by_google_id', google_id)
+
+    def get_by_name(self, name) -> Optional[Dict]:
+        return self._lookup('_by_name', name)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_client_registry(supabase=None) -> ClientRegistry:
+    """
+    Retorna o registro de clientes compartilhado pelo processo
+
+    Todas as instâncias de Database usam o mesmo registro, de modo que uma
+    invalidação feita por qualquer uma delas vale para todas.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry(supabase)
+    return _registry
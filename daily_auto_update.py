@@ -77,6 +77,10 @@ def main():
         logger.info(f"📊 Resultado: {result['message']}")
         logger.info(f"📈 Facebook: {result['results']['facebook']['success']}/{result['results']['facebook']['total']}")
         logger.info(f"📈 Google: {result['results']['google']['success']}/{result['results']['google']['total']}")
+        if fb_api.cache:
+            cache_stats = fb_api.cache.get_stats()
+            logger.info(f"🗄️  Cache de relatórios: {cache_stats['hits']} dias do cache, {cache_stats['misses']} da API "
+                        f"({cache_stats['bytes_read']} bytes lidos, {cache_stats['bytes_written']} gravados)")
         
         if result.get('total_errors', 0) > 0:
             logger.warning(f"⚠️  {result['total_errors']} erros ocorreram durante a atualização")
@@ -124,8 +128,9 @@ def execute_daily_update(db, fb_api, google_ads_api):
     
     # Busca clientes ativos
     try:
-        facebook_clients = db.get_active_facebook_clients()
-        google_clients = db.get_active_google_clients()
+        active_clients = db.get_active_clients()
+        facebook_clients = active_clients['facebook']
+        google_clients = active_clients['google']
     except Exception as e:
         logger.error(f"❌ Erro ao buscar clientes ativos: {e}")
         raise
@@ -155,19 +160,22 @@ def execute_daily_update(db, fb_api, google_ads_api):
     # Processa clientes Facebook
     if facebook_clients:
         logger.info(f"🔵 Processando {len(facebook_clients)} clientes Facebook...")
+        prefetched = prefetch_facebook_reports(facebook_clients, start_date, end_date, fb_api, db)
         for i, client in enumerate(facebook_clients, 1):
             client_name = client.get('name', 'N/A')
             logger.info(f"  📊 {i:2d}/{len(facebook_clients)} - Processando: {client_name}")
             
             try:
-                client_result = process_facebook_client(client, start_date, end_date, fb_api, db)
+                client_result = process_facebook_client(client, start_date, end_date, fb_api, db,
+                                                        prefetched.get(client.get('act_fb')))
                 results['facebook']['details'].append(client_result)
                 
                 if client_result['success']:
                     results['facebook']['success'] += 1
                     new_records = client_result.get('new_records', 0)
-                    if new_records > 0:
-                        logger.info(f"    ✅ {new_records} novos registros salvos")
+                    updated_records = client_result.get('updated_records', 0)
+                    if new_records > 0 or updated_records > 0:
+                        logger.info(f"    ✅ {new_records} novos registros salvos, {updated_records} atualizados")
                     else:
                         logger.info(f"    ℹ️  Nenhum dado novo (já existia)")
                 else:
@@ -184,22 +192,27 @@ def execute_daily_update(db, fb_api, google_ads_api):
                     'message': error_msg
                 })
     
-    # Processa clientes Google
+    # Processa clientes Google: cada cliente é gravado assim que sua busca
+    # paralela termina, sem acumular os relatórios de todos em memória
     if google_clients:
         logger.info(f"🟡 Processando {len(google_clients)} clientes Google...")
-        for i, client in enumerate(google_clients, 1):
+        ready_clients = google_ads_api.iter_clients_reports(google_clients, start_date, end_date, db,
+                                                            backfill=True)
+        for i, (client, prefetched) in enumerate(ready_clients, 1):
             client_name = client.get('name', 'N/A')
             logger.info(f"  📊 {i:2d}/{len(google_clients)} - Processando: {client_name}")
             
             try:
-                client_result = process_google_client(client, start_date, end_date, google_ads_api, db)
+                client_result = process_google_client(client, start_date, end_date, google_ads_api, db,
+                                                      prefetched)
                 results['google']['details'].append(client_result)
                 
                 if client_result['success']:
                     results['google']['success'] += 1
                     new_records = client_result.get('new_records', 0)
-                    if new_records > 0:
-                        logger.info(f"    ✅ {new_records} novos registros salvos")
+                    updated_records = client_result.get('updated_records', 0)
+                    if new_records > 0 or updated_records > 0:
+                        logger.info(f"    ✅ {new_records} novos registros salvos, {updated_records} atualizados")
                     else:
                         logger.info(f"    ℹ️  Nenhum dado novo (já existia)")
                 else:
@@ -241,8 +254,55 @@ def execute_daily_update(db, fb_api, google_ads_api):
         'details': results
     }
 
-def process_facebook_client(client, start_date, end_date, fb_api, db):
-    """Processa um cliente Facebook individual"""
+def prefetch_facebook_reports(facebook_clients, start_date, end_date, fb_api, db):
+    """
+    Busca os relatórios de todas as contas Facebook com chamadas batch da Graph API
+    
+    Só os períodos curtos vão para o batch; os longos (backfill que usaria
+    relatório assíncrono ou blocos, ver FacebookAPI.fits_batch) ficam com
+    data None e são lidos em streaming por process_facebook_client.
+    
+    Returns:
+        dict: act_fb -> {'sync_range', 'data', 'error'}; contas ausentes (ou todas,
+        se o batch falhar por completo) são buscadas individualmente depois
+    """
+    prefetched = {}
+    date_ranges = {}
+    
+    try:
+        for client in facebook_clients:
+            account_id = client.get('act_fb')
+            if not account_id or account_id in prefetched:
+                continue
+            sync_range = db.plan_sync_range('facebook', account_id, start_date, end_date, backfill=True)
+            prefetched[account_id] = {'sync_range': sync_range, 'data': [], 'error': None}
+            if sync_range and fb_api.fits_batch(*sync_range):
+                date_ranges[account_id] = sync_range
+            elif sync_range:
+                prefetched[account_id]['data'] = None
+        
+        if date_ranges:
+            logger.info(f"📦 Buscando {len(date_ranges)} contas Facebook via batch...")
+            for account_id, result in fb_api.get_campaigns_reports_batch(
+                    date_ranges, skip_zero_impressions=db.sync_skip_zero_impressions).items():
+                prefetched[account_id].update(result)
+        
+        return prefetched
+        
+    except Exception as e:
+        logger.warning(f"⚠️  Falha no batch do Facebook, buscando conta a conta: {e}")
+        return {}
+
+def process_facebook_client(client, start_date, end_date, fb_api, db, prefetched=None):
+    """
+    Processa um cliente Facebook individual
+    
+    Args:
+        prefetched: Resultado de prefetch_facebook_reports para a conta (opcional);
+                    sem ele, o período é planejado e buscado na API aqui; períodos
+                    longos (data None) e contas cujo pedido no batch falhou são
+                    lidos em streaming
+    """
     
     client_name = client.get('name', 'N/A')
     account_id = client.get('act_fb')
@@ -256,10 +316,34 @@ def process_facebook_client(client, start_date, end_date, fb_api, db):
         }
     
     try:
-        # Busca dados via API
-        campaigns_data = fb_api.get_campaigns_report(account_id, start_date, end_date)
+        # Volta até o watermark para fechar lacunas e rebuscar a janela de atribuição
+        if prefetched is None:
+            sync_range = db.plan_sync_range('facebook', account_id, start_date, end_date, backfill=True)
+        else:
+            sync_range = prefetched['sync_range']
+        if not sync_range:
+            return {
+                'client_name': client_name,
+                'success': True,
+                'message': 'Período já sincronizado',
+                'new_records': 0
+            }
         
-        if not campaigns_data:
+        if prefetched is None or prefetched['error'] or prefetched['data'] is None:
+            if prefetched and prefetched['error']:
+                logger.warning(f"    ⚠️  Pedido no batch falhou ({prefetched['error']}), lendo em streaming")
+            # Lê a API em streaming (todas as páginas; assíncrono e em blocos nos
+            # períodos longos) e grava em blocos
+            campaigns_data = fb_api.iter_campaigns_report(
+                account_id, *sync_range, skip_zero_impressions=db.sync_skip_zero_impressions)
+        else:
+            campaigns_data = prefetched['data']
+        
+        # Salva novos e regrava só os registros com métricas alteradas
+        save_stats = db.save_campaign_data(campaigns_data)
+        
+        if not save_stats['total_enviados']:
+            db.advance_sync_watermark('facebook', account_id, *sync_range)
             return {
                 'client_name': client_name,
                 'success': True,
@@ -267,22 +351,19 @@ def process_facebook_client(client, start_date, end_date, fb_api, db):
                 'new_records': 0
             }
         
-        # Filtra apenas campanhas novas
-        new_campaigns = db.filter_new_campaigns(campaigns_data, account_id)
+        new_records = save_stats['novos_salvos']
+        updated_records = save_stats['atualizados']
         
-        # Salva apenas dados novos
-        new_records = 0
-        if new_campaigns:
-            save_stats = db.save_campaign_data(new_campaigns)
-            new_records = save_stats['novos_salvos']
-            
-            if save_stats['erros'] > 0:
-                return {
-                    'client_name': client_name,
-                    'success': False,
-                    'message': f'Erro ao salvar {save_stats["erros"]} registros',
-                    'new_records': new_records
-                }
+        if save_stats['erros'] > 0:
+            return {
+                'client_name': client_name,
+                'success': False,
+                'message': f'Erro ao salvar {save_stats["erros"]} registros',
+                'new_records': new_records,
+                'updated_records': updated_records
+            }
+        
+        db.advance_sync_watermark('facebook', account_id, *sync_range)
         
         # Atualiza timestamp do último relatório
         db.update_last_facebook_report(client['id'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
@@ -290,8 +371,9 @@ def process_facebook_client(client, start_date, end_date, fb_api, db):
         return {
             'client_name': client_name,
             'success': True,
-            'message': f'{new_records} novos registros processados',
-            'new_records': new_records
+            'message': f'{new_records} novos registros processados, {updated_records} atualizados',
+            'new_records': new_records,
+            'updated_records': updated_records
         }
         
     except Exception as e:
@@ -302,8 +384,15 @@ def process_facebook_client(client, start_date, end_date, fb_api, db):
             'new_records': 0
         }
 
-def process_google_client(client, start_date, end_date, google_ads_api, db):
-    """Processa um cliente Google individual"""
+def process_google_client(client, start_date, end_date, google_ads_api, db, prefetched=None):
+    """
+    Processa um cliente Google individual
+    
+    Args:
+        prefetched: Resultado de GoogleAdsAPI.iter_clients_reports para o cliente (opcional);
+                    sem ele, o período é planejado e buscado na API aqui; se a
+                    busca paralela falhou, o cliente é lido de novo em streaming
+    """
     
     client_name = client.get('name', 'N/A')
     customer_id = client.get('id_google')
@@ -317,10 +406,33 @@ def process_google_client(client, start_date, end_date, google_ads_api, db):
         }
     
     try:
-        # Busca dados via API
-        campaigns_data = google_ads_api.get_campaigns_report(customer_id, start_date, end_date)
+        # Volta até o watermark para fechar lacunas e rebuscar a janela de atribuição
+        if prefetched is None:
+            sync_range = db.plan_sync_range('google', customer_id, start_date, end_date, backfill=True)
+        else:
+            sync_range = prefetched['sync_range']
+        if not sync_range:
+            return {
+                'client_name': client_name,
+                'success': True,
+                'message': 'Período já sincronizado',
+                'new_records': 0
+            }
+        
+        if prefetched is None or prefetched['error']:
+            if prefetched:
+                logger.warning(f"    ⚠️  Busca paralela falhou ({prefetched['error']}), lendo em streaming")
+            # Lê a API em streaming (search_stream) e grava em blocos
+            campaigns_data = google_ads_api.iter_campaigns_report(
+                customer_id, *sync_range, skip_zero_impressions=db.sync_skip_zero_impressions)
+        else:
+            campaigns_data = prefetched['data']
         
-        if not campaigns_data:
+        # Salva novos e regrava só os registros com métricas alteradas
+        save_stats = db.save_google_ads_data(campaigns_data)
+        
+        if not save_stats['total_enviados']:
+            db.advance_sync_watermark('google', customer_id, *sync_range)
             return {
                 'client_name': client_name,
                 'success': True,
@@ -328,22 +440,19 @@ def process_google_client(client, start_date, end_date, google_ads_api, db):
                 'new_records': 0
             }
         
-        # Filtra apenas campanhas novas
-        new_campaigns = db.filter_new_google_ads_campaigns(campaigns_data, customer_id)
+        new_records = save_stats['novos_salvos']
+        updated_records = save_stats['atualizados']
         
-        # Salva apenas dados novos
-        new_records = 0
-        if new_campaigns:
-            save_stats = db.save_google_ads_data(new_campaigns)
-            new_records = save_stats['novos_salvos']
-            
-            if save_stats['erros'] > 0:
-                return {
-                    'client_name': client_name,
-                    'success': False,
-                    'message': f'Erro ao salvar {save_stats["erros"]} registros',
-                    'new_records': new_records
-                }
+        if save_stats['erros'] > 0:
+            return {
+                'client_name': client_name,
+                'success': False,
+                'message': f'Erro ao salvar {save_stats["erros"]} registros',
+                'new_records': new_records,
+                'updated_records': updated_records
+            }
+        
+        db.advance_sync_watermark('google', customer_id, *sync_range)
         
         # Atualiza timestamp do último relatório
         db.update_last_google_report(client['id'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
@@ -351,8 +460,9 @@ def process_google_client(client, start_date, end_date, google_ads_api, db):
         return {
             'client_name': client_name,
             'success': True,
-            'message': f'{new_records} novos registros processados',
-            'new_records': new_records
+            'message': f'{new_records} novos registros processados, {updated_records} atualizados',
+            'new_records': new_records,
+            'updated_records': updated_records
         }
         
     except Exception as e:
@@ -1,116 +1,240 @@
 import os
-from supabase import create_client, Client
+import hashlib
+from functools import partial
+from supabase import Client
 from dotenv import load_dotenv
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
+from datetime import datetime, timedelta
+from client_registry import get_client_registry
+from supabase_provider import get_supabase_client
 
 # Carrega variáveis de ambiente
 load_dotenv()
 
+# Chaves únicas usadas pelo upsert em lote (precisam existir como UNIQUE no banco):
+#   ALTER TABLE relatorio_fb_campaigns
+#       ADD CONSTRAINT relatorio_fb_campaigns_uniq UNIQUE (account_id, campaign_id, date_start);
+#   ALTER TABLE relatorio_google_ads
+#       ADD CONSTRAINT relatorio_google_ads_uniq UNIQUE (customer_id, campaign_id, dia);
+FB_CAMPAIGNS_CONFLICT = 'account_id,campaign_id,date_start'
+GOOGLE_ADS_CONFLICT = 'customer_id,campaign_id,dia'
+
+# Hash das colunas de métricas, usado para regravar só as linhas que mudaram
+# (atribuição tardia) em vez de ignorá-las como duplicadas:
+#   ALTER TABLE relatorio_fb_campaigns ADD COLUMN metrics_hash text;
+#   ALTER TABLE relatorio_google_ads ADD COLUMN metrics_hash text;
+# Linhas antigas sem hash são regravadas uma vez na primeira re-sincronização.
+FB_METRIC_FIELDS = (
+    'campaign_name', 'reach', 'impressions', 'spend', 'inline_link_clicks',
+    'link_click', 'landing_page_view', 'offsite_conversion_fb_pixel_add_to_cart',
+    'offsite_conversion_fb_pixel_initiate_checkout', 'offsite_conversion_fb_pixel_lead',
+    'onsite_conversion_messaging_conversation_started_7d', 'offsite_conversion_fb_pixel_purchase',
+    'offsite_conversion_fb_pixel_custom', 'offsite_conversion_fb_pixel_complete_registration',
+    'onsite_conversion_lead_grouped',
+)
+GOOGLE_ADS_METRIC_FIELDS = (
+    'nome_campanha', 'clicks', 'conversions', 'conversions_value', 'ctr',
+    'average_cpc', 'impressions', 'cost',
+)
+# Estado transitório marcado por _classify_rows (removido antes de gravar)
+SYNC_STATE_KEY = '_sync_state'
+
+# Rollup diário por conta: uma linha por (conta, dia) com os totais das campanhas.
+# As colunas de métricas têm o mesmo nome das tabelas de campanhas, para que o
+# WhatsAppMessageFormatter some linhas de rollup como se fossem campanhas.
+#   CREATE TABLE relatorio_fb_daily_rollup (
+#       account_id text NOT NULL, dia date NOT NULL,
+#       impressions bigint, inline_link_clicks bigint, spend numeric,
+#       landing_page_view bigint, link_click bigint,
+#       offsite_conversion_fb_pixel_lead bigint,
+#       onsite_conversion_messaging_conversation_started_7d bigint,
+#       offsite_conversion_fb_pixel_complete_registration bigint,
+#       offsite_conversion_fb_pixel_purchase bigint,
+#       offsite_conversion_fb_pixel_add_to_cart bigint,
+#       offsite_conversion_fb_pixel_initiate_checkout bigint,
+#       has_followers_campaign boolean, rows integer, updated_at timestamptz,
+#       UNIQUE (account_id, dia));
+#   CREATE TABLE relatorio_google_ads_daily_rollup (
+#       customer_id text NOT NULL, dia date NOT NULL,
+#       impressions bigint, clicks bigint, cost numeric, conversions numeric,
+#       conversions_value numeric, ctr_sum numeric, average_cpc_sum numeric,
+#       rows integer, updated_at timestamptz,
+#       UNIQUE (customer_id, dia));
+# O histórico gravado antes do rollup deve ser populado uma vez com
+# Database.rebuild_facebook_rollup / rebuild_google_ads_rollup.
+FB_ROLLUP = {
+    'table': 'relatorio_fb_daily_rollup',
+    'source': 'relatorio_fb_campaigns',
+    'owner_field': 'account_id',
+    'date_field': 'date_start',
+    # Marca o dia que tem campanha de "seguidores" (regra do WhatsAppMessageFormatter)
+    'followers_field': 'campaign_name',
+    'sums': {
+        'impressions': int,
+        'inline_link_clicks': int,
+        'spend': float,
+        'landing_page_view': int,
+        'link_click': int,
+        'offsite_conversion_fb_pixel_lead': int,
+        'onsite_conversion_messaging_conversation_started_7d': int,
+        'offsite_conversion_fb_pixel_complete_registration': int,
+        'offsite_conversion_fb_pixel_purchase': int,
+        'offsite_conversion_fb_pixel_add_to_cart': int,
+        'offsite_conversion_fb_pixel_initiate_checkout': int,
+    },
+}
+GOOGLE_ADS_ROLLUP = {
+    'table': 'relatorio_google_ads_daily_rollup',
+    'source': 'relatorio_google_ads',
+    'owner_field': 'customer_id',
+    'date_field': 'dia',
+    'sums': {
+        'impressions': int,
+        'clicks': int,
+        'cost': float,
+        'conversions': float,
+        'conversions_value': float,
+        # CTR e CPC médios são médias simples por linha: guarda soma + quantidade
+        'ctr': float,
+        'average_cpc': float,
+    },
+    'renames': {'ctr': 'ctr_sum', 'average_cpc': 'average_cpc_sum'},
+}
+
+# Watermark de sincronização: por plataforma e conta, a faixa contínua de dias já
+# ingerida (synced_from..synced_until) e o último dia buscado depois de a
+# atribuição estabilizar (settled_until). Dias até settled_until não são
+# buscados de novo na API.
+#   CREATE TABLE relatorio_sync_watermarks (
+#       platform text NOT NULL, account_id text NOT NULL,
+#       synced_from date NOT NULL, synced_until date NOT NULL,
+#       settled_until date NOT NULL, updated_at timestamptz,
+#       UNIQUE (platform, account_id));
+SYNC_WATERMARKS_TABLE = 'relatorio_sync_watermarks'
+
+# Colunas de relatorio_cadastro_clientes necessárias para a sincronização
+ACTIVE_CLIENT_COLUMNS = 'id, name, act_fb, id_facebook, id_google, roda_facebook, roda_google'
+# Filtro de clientes ativos no servidor para roda_facebook / roda_google boolean
+# (IS TRUE só é aceito em colunas boolean; cadastros antigos com a coluna em
+# inteiro ou texto caem na leitura sem filtro e na normalização local)
+ACTIVE_CLIENTS_FILTER = 'roda_facebook.is.true,roda_google.is.true'
+# Representações de "ativo" aceitas na normalização local (já em minúsculas)
+ACTIVE_FLAG_VALUES = ('true', '1')
+
 class Database:
     def __init__(self):
-        """Inicializa conexão com Supabase"""
+        """Inicializa acesso ao Supabase (o cliente é compartilhado pelo processo)"""
         self.url = os.getenv("SUPABASE_URL")
         self.key = os.getenv("SUPABASE_KEY")
-        self.supabase: Client = create_client(self.url, self.key)
+        # Quantidade de linhas enviadas por upsert no modo em lote
+        self.batch_size = int(os.getenv("SUPABASE_BATCH_SIZE", 500))
+        # Linhas acumuladas por bloco quando save_* recebe um stream
+        self.stream_chunk_size = int(os.getenv("SUPABASE_STREAM_CHUNK_SIZE", 5000))
+        # Cache do cadastro de clientes (compartilhado pelo processo)
+        self.client_registry = get_client_registry()
+        # Dias mais recentes que ainda podem mudar por atribuição (sempre rebuscados)
+        self.sync_recheck_days = int(os.getenv("SYNC_RECHECK_DAYS", 3))
+        # Limite de dias que a sincronização incremental volta para fechar lacunas
+        self.sync_max_backfill_days = int(os.getenv("SYNC_MAX_BACKFILL_DAYS", 30))
+        # Sincronizações e CSVs pedem às APIs só linhas com impressões (campanhas paradas não
+        # são gravadas nem saem no CSV, venham os dias do banco ou da API)
+        self.sync_skip_zero_impressions = os.getenv("SYNC_SKIP_ZERO_IMPRESSIONS", "true").lower() == "true"
+        # Google Ads: busca métricas só das campanhas com impressões ou alteradas no período
+        # (só tem efeito com SYNC_SKIP_ZERO_IMPRESSIONS=false; o filtro de impressões já cobre o caso)
+        self.sync_google_incremental = os.getenv("GOOGLE_ADS_INCREMENTAL_SYNC", "true").lower() == "true"
+
+    @property
+    def supabase(self) -> Client:
+        """Cliente Supabase compartilhado pelo processo (ver supabase_provider)"""
+        return get_supabase_client()
     
-    def get_active_facebook_clients(self) -> List[Dict]:
+    def invalidate_client_cache(self):
         """
-        Busca clientes ativos no Facebook
+        Invalida o cache do cadastro de clientes
+        Deve ser chamado após qualquer escrita em relatorio_cadastro_clientes
+        """
+        self.client_registry.invalidate()
+    
+    def get_active_clients(self) -> Dict[str, List[Dict]]:
+        """
+        Busca clientes ativos no Facebook e no Google em uma única consulta
+        
+        Com roda_facebook / roda_google boolean, o filtro é feito no servidor;
+        se o banco recusar o filtro (coluna em inteiro ou texto), a tabela é lida
+        sem filtro. Nos dois casos só as colunas usadas pela sincronização são
+        trazidas e as variações de "ativo" (True, 1, "true", "1"...) são
+        normalizadas localmente.
+        
+        Returns:
+            Dict[str, List[Dict]]: {'facebook': [...], 'google': [...]}
         """
+        active = {'facebook': [], 'google': []}
+        
         try:
-            # Busca todos os registros primeiro para debug
-            response = self.supabase.table('relatorio_cadastro_clientes') \
-                .select('*') \
-                .execute()
-            
-            if not response.data:
-                print("Debug: Nenhum cliente encontrado na tabela")
-                return []
-            
-            # Filtra localmente para garantir o controle
-            active_clients = []
-            print(f"Debug: Total clientes na base: {len(response.data)}")
-            
-            for client in response.data:
-                # Verifica diferentes formatos possíveis para o campo boolean
-                roda_fb = client.get('roda_facebook')
-                client_name = client.get('name', 'N/A')
-                
-                print(f"Debug: Cliente '{client_name}' - roda_facebook: {roda_fb} (tipo: {type(roda_fb)})")
-                
-                # Aceita True, true, 1, "true", "1" como valores válidos
-                if roda_fb in [True, 1, "true", "True", "1", 1.0]:
-                    active_clients.append(client)
-                    print(f"  -> Adicionado como ativo")
-                else:
-                    print(f"  -> Ignorado (inativo)")
+            try:
+                response = self.supabase.table('relatorio_cadastro_clientes') \
+                    .select(ACTIVE_CLIENT_COLUMNS) \
+                    .or_(ACTIVE_CLIENTS_FILTER) \
+                    .execute()
+            except Exception as e:
+                print(f"[WARNING] Filtro de clientes ativos recusado pelo banco ({e}); "
+                      f"lendo o cadastro sem filtro")
+                response = self.supabase.table('relatorio_cadastro_clientes') \
+                    .select(ACTIVE_CLIENT_COLUMNS) \
+                    .execute()
             
-            print(f"Debug: Clientes Facebook ativos encontrados: {len(active_clients)}")
+            for client in response.data or []:
+                if self._is_active_flag(client.get('roda_facebook')):
+                    active['facebook'].append(client)
+                if self._is_active_flag(client.get('roda_google')):
+                    active['google'].append(client)
             
-            return active_clients
+            print(f"Debug: Clientes ativos encontrados - Facebook: {len(active['facebook'])}, Google: {len(active['google'])}")
             
         except Exception as e:
-            print(f"Erro ao buscar clientes Facebook: {e}")
-            return []
+            print(f"Erro ao buscar clientes ativos: {e}")
+        
+        return active
+    
+    def get_active_facebook_clients(self) -> List[Dict]:
+        """
+        Busca clientes ativos no Facebook
+        """
+        return self.get_active_clients()['facebook']
     
     def get_active_google_clients(self) -> List[Dict]:
         """
         Busca clientes ativos no Google
         """
-        try:
-            # Busca todos os registros primeiro para debug
-            response = self.supabase.table('relatorio_cadastro_clientes') \
-                .select('*') \
-                .execute()
-            
-            if not response.data:
-                print("Debug: Nenhum cliente encontrado na tabela")
-                return []
-            
-            # Filtra localmente para garantir o controle
-            active_clients = []
-            print(f"Debug: Total clientes na base: {len(response.data)}")
-            
-            for client in response.data:
-                # Verifica diferentes formatos possíveis para o campo boolean
-                roda_google = client.get('roda_google')
-                client_name = client.get('name', 'N/A')
-                
-                print(f"Debug: Cliente '{client_name}' - roda_google: {roda_google} (tipo: {type(roda_google)})")
-                
-                # Aceita True, true, 1, "true", "1" como valores válidos
-                if roda_google in [True, 1, "true", "True", "1", 1.0]:
-                    active_clients.append(client)
-                    print(f"  -> Adicionado como ativo")
-                else:
-                    print(f"  -> Ignorado (inativo)")
-            
-            print(f"Debug: Clientes Google ativos encontrados: {len(active_clients)}")
-            
-            return active_clients
-            
-        except Exception as e:
-            print(f"Erro ao buscar clientes Google: {e}")
-            return []
-
-
+        return self.get_active_clients()['google']
     
-
-
+    @staticmethod
+    def _account_key(platform: str, account_id) -> str:
+        """
+        Normaliza o ID da conta usado nas tabelas de relatório e no watermark
+        
+        O cadastro guarda a conta Facebook como act_<id>, mas as linhas da
+        Graph API (account_id) vêm sem o prefixo; todas as leituras e gravações
+        por conta usam a forma sem prefixo.
+        """
+        account_id = str(account_id or '').strip()
+        if platform == 'facebook' and account_id.startswith('act_'):
+            return account_id[4:]
+        return account_id
+    
+    @staticmethod
+    def _is_active_flag(value) -> bool:
+        """Normaliza os formatos possíveis do campo boolean (True, 1, "true", "1"...)"""
+        if isinstance(value, str):
+            return value.strip().lower() in ACTIVE_FLAG_VALUES
+        return value is True or value == 1
 
     def get_client_by_id(self, client_id: int) -> Optional[Dict]:
         """
         Busca cliente específico por ID
         """
         try:
-            response = self.supabase.table('relatorio_cadastro_clientes') \
-                .select('*') \
-                .eq('id', client_id) \
-                .single() \
-                .execute()
-            
-            return response.data if response.data else None
+            return self.client_registry.get_by_id(client_id)
         except Exception as e:
             print(f"Erro ao buscar cliente {client_id}: {e}")
             return None
@@ -220,6 +344,7 @@ class Database:
                 .update({'ultimo_relatorio_fb': report_date}) \
                 .eq('id', client_id) \
                 .execute()
+            self.invalidate_client_cache()
         except Exception as e:
             print(f"Erro ao atualizar último relatório FB: {e}")
 
@@ -234,6 +359,7 @@ class Database:
                 .update({'ultimo_relatorio_google': report_date}) \
                 .eq('id', client_id) \
                 .execute()
+            self.invalidate_client_cache()
         except Exception as e:
             print(f"Erro ao atualizar último relatório Google: {e}")
     
@@ -253,7 +379,7 @@ class Database:
         try:
             response = self.supabase.table('relatorio_fb_campaigns') \
                 .select('id') \
-                .eq('account_id', account_id) \
+                .eq('account_id', self._account_key('facebook', account_id)) \
                 .eq('campaign_id', campaign_id) \
                 .eq('date_start', date) \
                 .execute()
@@ -265,96 +391,478 @@ class Database:
             # Em caso de erro, assume que não existem dados para evitar perda
             return False
     
-    def save_campaign_data(self, campaign_data: List[Dict]) -> Dict:
+    def save_campaign_data(self, campaign_data: Iterable[Dict], bulk: bool = True,
+                           prefiltered: bool = False) -> Dict:
         """
         Salva dados de campanhas na tabela relatorio_fb_campaigns
         Retorna estatísticas do salvamento
         
         Args:
-            campaign_data: Lista de dados de campanhas
+            campaign_data: Lista ou stream (ex.: FacebookAPI.iter_campaigns_report)
+                           de dados de campanhas; streams são gravados em blocos
+                           de stream_chunk_size linhas
+            bulk: Se True, compara os hashes de métricas com o banco em uma consulta
+                  por conta e envia em lotes só as linhas novas (INSERT) e alteradas
+                  (UPDATE via upsert); se False, usa o modo antigo (SELECT + INSERT por linha)
+            prefiltered: Indica que o lote já passou por filter_new_*; nesse caso
+                         a comparação com o banco é pulada
             
         Returns:
-            Dict: Estatísticas do salvamento (novos, ignorados, erros)
+            Dict: Estatísticas do salvamento (novos, atualizados, inalterados, ignorados, erros)
+        """
+        stats = self._new_save_stats(0)
+        touched_days = set()
+        
+        for chunk in self._iter_save_chunks(campaign_data):
+            stats['total_enviados'] += len(chunk)
+            touched_days.update((self._account_key('facebook', row.get('account_id')), row.get('date_start'))
+                                for row in chunk)
+            
+            if bulk:
+                valid_rows = []
+                for campaign in chunk:
+                    if not all([campaign.get('account_id'), campaign.get('campaign_id'), campaign.get('date_start')]):
+                        stats['erros'] += 1
+                        stats['detalhes_erros'].append(f"Dados incompletos: {campaign}")
+                        continue
+                    campaign.pop('id', None)
+                    campaign['account_id'] = self._account_key('facebook', campaign['account_id'])
+                    valid_rows.append(campaign)
+                
+                if not prefiltered:
+                    valid_rows = self._classify_rows(valid_rows, 'relatorio_fb_campaigns', 'account_id',
+                                                     'date_start', FB_METRIC_FIELDS, stats)
+                
+                self._bulk_write('relatorio_fb_campaigns', valid_rows,
+                                 ('account_id', 'campaign_id', 'date_start'),
+                                 FB_CAMPAIGNS_CONFLICT, FB_METRIC_FIELDS, stats,
+                                 fallback=self._save_campaign_row)
+            else:
+                for campaign in chunk:
+                    self._save_campaign_row(campaign, stats, check_existing=not prefiltered)
+        
+        # Mantém o rollup diário em dia com o que foi gravado
+        if stats['novos_salvos'] or stats['atualizados']:
+            self._refresh_rollup_for_rows(FB_ROLLUP, [{'account_id': owner_id, 'date_start': day}
+                                                      for owner_id, day in touched_days])
+        
+        return stats
+    
+    def _iter_save_chunks(self, rows: Iterable[Dict]) -> Iterator[List[Dict]]:
+        """
+        Divide a entrada de save_* em blocos
+        
+        Listas já estão em memória e viram um único bloco (uma comparação com o
+        banco por conta); streams são consumidos em blocos de stream_chunk_size.
+        Os blocos trazem cópias das linhas: a gravação remove o id, acrescenta
+        metrics_hash e normaliza a conta, e quem chamou ainda usa as linhas
+        originais (ex.: para montar o CSV).
+        """
+        if isinstance(rows, list):
+            if rows:
+                yield [dict(row) for row in rows]
+            return
+        
+        chunk = []
+        for row in rows or []:
+            chunk.append(dict(row))
+            if len(chunk) >= self.stream_chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def _save_campaign_row(self, campaign: Dict, stats: Dict, check_existing: bool = True):
         """
-        stats = {
-            'total_enviados': len(campaign_data),
+        Salva uma única linha em relatorio_fb_campaigns (verificação + INSERT),
+        acumulando o resultado em stats
+        """
+        try:
+            account_id = campaign.get('account_id')
+            campaign_id = campaign.get('campaign_id')
+            date_start = campaign.get('date_start')
+            
+            if not all([account_id, campaign_id, date_start]):
+                stats['erros'] += 1
+                stats['detalhes_erros'].append(f"Dados incompletos: {campaign}")
+                return
+            account_id = campaign['account_id'] = self._account_key('facebook', account_id)
+            
+            # Linha marcada como alterada por _classify_rows: regrava as métricas
+            if campaign.pop(SYNC_STATE_KEY, None) == 'alterado':
+                campaign.pop('id', None)
+                self._update_row('relatorio_fb_campaigns', campaign,
+                                 ('account_id', 'campaign_id', 'date_start'), stats)
+                return
+            
+            # Verifica se já existe (pulado quando o lote já foi filtrado)
+            if check_existing and self.check_existing_campaign_data(account_id, campaign_id, date_start):
+                stats['duplicados_ignorados'] += 1
+                print(f"Dados já existem - Ignorando: Account {account_id}, Campaign {campaign_id}, Data {date_start}")
+                return
+            
+            # Salva no banco
+            campaign.pop('id', None)
+            campaign['metrics_hash'] = self._metrics_hash(campaign, FB_METRIC_FIELDS)
+            response = self.supabase.table('relatorio_fb_campaigns') \
+                .insert(campaign) \
+                .execute()
+            
+            if response.data:
+                stats['novos_salvos'] += 1
+                print(f"Dados salvos: Account {account_id}, Campaign {campaign_id}, Data {date_start}")
+            else:
+                stats['erros'] += 1
+                stats['detalhes_erros'].append(f"Falha ao salvar: {campaign}")
+                
+        except Exception as e:
+            stats['erros'] += 1
+            error_msg = f"Erro ao processar campanha {campaign.get('campaign_id', 'N/A')}: {str(e)}"
+            stats['detalhes_erros'].append(error_msg)
+            print(error_msg)
+    
+    @staticmethod
+    def _new_save_stats(total: int) -> Dict:
+        return {
+            'total_enviados': total,
             'novos_salvos': 0,
+            'atualizados': 0,
+            'inalterados': 0,
             'duplicados_ignorados': 0,
             'erros': 0,
             'detalhes_erros': []
         }
+    
+    @staticmethod
+    def _metrics_hash(row: Dict, metric_fields: tuple) -> str:
+        """
+        Hash do conteúdo das colunas de métricas de uma linha
+        
+        Números são normalizados (int/float/str do banco geram o mesmo hash).
+        """
+        values = []
+        for field in metric_fields:
+            value = row.get(field)
+            if isinstance(value, (int, float, str)) and not isinstance(value, bool):
+                try:
+                    value = repr(round(float(value), 6))
+                except ValueError:
+                    pass
+            values.append('' if value is None else str(value))
+        return hashlib.md5('\x1f'.join(values).encode('utf-8')).hexdigest()
+    
+    def _update_row(self, table: str, row: Dict, key_fields: tuple, stats: Dict):
+        """Regrava uma linha existente (UPDATE pela chave única), acumulando em stats"""
+        try:
+            query = self.supabase.table(table).update(row)
+            for field in key_fields:
+                query = query.eq(field, row.get(field))
+            response = query.execute()
+            
+            if response.data:
+                stats['atualizados'] += 1
+            else:
+                stats['erros'] += 1
+                stats['detalhes_erros'].append(f"Falha ao atualizar: {row}")
+        except Exception as e:
+            stats['erros'] += 1
+            error_msg = f"Erro ao atualizar {table} {row.get('campaign_id', 'N/A')}: {str(e)}"
+            stats['detalhes_erros'].append(error_msg)
+            print(error_msg)
+    
+    def _bulk_write(self, table: str, rows: List[Dict], key_fields: tuple, on_conflict: str,
+                    metric_fields: tuple, stats: Dict, fallback=None):
+        """
+        Grava em lotes as linhas classificadas: novas (ou sem classificação) via
+        INSERT ... ON CONFLICT DO NOTHING e alteradas via upsert com merge
+        
+        Remove o estado transitório e garante o metrics_hash de cada linha.
+        """
+        inserts, updates = [], []
+        for row in rows:
+            state = row.pop(SYNC_STATE_KEY, None)
+            row['metrics_hash'] = row.get('metrics_hash') or self._metrics_hash(row, metric_fields)
+            (updates if state == 'alterado' else inserts).append((state, row))
+        
+        # O fallback por linha precisa saber que a linha é uma atualização
+        def row_fallback(row, row_stats, state=None):
+            if state:
+                row[SYNC_STATE_KEY] = state
+            fallback(row, row_stats)
+        
+        if inserts:
+            self._bulk_upsert(table, [row for _, row in inserts], key_fields, on_conflict, stats,
+                              fallback=fallback)
+        if updates:
+            self._bulk_upsert(table, [row for _, row in updates], key_fields, on_conflict, stats,
+                              fallback=partial(row_fallback, state='alterado') if fallback else None,
+                              update=True)
+    
+    def _bulk_upsert(self, table: str, rows: List[Dict], key_fields: tuple,
+                     on_conflict: str, stats: Dict, fallback=None, update: bool = False):
+        """
+        Envia linhas em lotes de self.batch_size como um único upsert cada,
+        atualizando stats.
+        
+        Com update=False é um INSERT ... ON CONFLICT DO NOTHING: o PostgREST
+        devolve apenas as linhas realmente inseridas, então a diferença para o
+        tamanho do lote é contada como duplicada. Com update=True as linhas
+        existentes são sobrescritas (ON CONFLICT DO UPDATE) e contadas como
+        atualizadas.
+        Se um lote falhar (ex.: constraint UNIQUE ausente), as linhas do lote
+        são reenviadas uma a uma via fallback(row, stats); o fallback de
+        save_* verifica se a linha já existe antes do INSERT, já que sem a
+        constraint o banco não impede duplicatas.
+        
+        Args:
+            table: Nome da tabela
+            rows: Linhas já validadas
+            key_fields: Campos da chave única
+            on_conflict: Colunas para ON CONFLICT
+            stats: Dict de estatísticas a ser atualizado
+            fallback: Função de salvamento por linha usada em caso de erro
+            update: Se True, sobrescreve as linhas existentes
+        """
+        # Remove duplicatas dentro do próprio lote (a última ocorrência vence)
+        unique_rows = {}
+        for row in rows:
+            unique_rows[tuple(str(row.get(field)) for field in key_fields)] = row
+        stats['duplicados_ignorados'] += len(rows) - len(unique_rows)
+        rows = list(unique_rows.values())
         
-        for campaign in campaign_data:
+        for offset in range(0, len(rows), self.batch_size):
+            chunk = rows[offset:offset + self.batch_size]
             try:
-                account_id = campaign.get('account_id')
-                campaign_id = campaign.get('campaign_id')
-                date_start = campaign.get('date_start')
-                
-                if not all([account_id, campaign_id, date_start]):
-                    stats['erros'] += 1
-                    stats['detalhes_erros'].append(f"Dados incompletos: {campaign}")
-                    continue
-                
-                # Verifica se já existe
-                if self.check_existing_campaign_data(account_id, campaign_id, date_start):
-                    stats['duplicados_ignorados'] += 1
-                    print(f"Dados já existem - Ignorando: Account {account_id}, Campaign {campaign_id}, Data {date_start}")
-                    continue
-                
-                # Adiciona dados para salvamento (SEM created_at)
-                # campaign['created_at'] = datetime.now().isoformat()  # REMOVIDO
-                
-                # Salva no banco
-                campaign.pop('id', None)
-                response = self.supabase.table('relatorio_fb_campaigns') \
-                    .insert(campaign) \
+                response = self.supabase.table(table) \
+                    .upsert(chunk, on_conflict=on_conflict, ignore_duplicates=not update) \
                     .execute()
                 
-                if response.data:
-                    stats['novos_salvos'] += 1
-                    print(f"Dados salvos: Account {account_id}, Campaign {campaign_id}, Data {date_start}")
+                written = len(response.data) if response.data else 0
+                if update:
+                    stats['atualizados'] += written
+                    print(f"Lote atualizado em {table}: {written} registros com métricas alteradas")
                 else:
-                    stats['erros'] += 1
-                    stats['detalhes_erros'].append(f"Falha ao salvar: {campaign}")
-                    
+                    stats['novos_salvos'] += written
+                    stats['duplicados_ignorados'] += len(chunk) - written
+                    print(f"Lote salvo em {table}: {written} novos, {len(chunk) - written} já existiam")
+                
             except Exception as e:
-                stats['erros'] += 1
-                error_msg = f"Erro ao processar campanha {campaign.get('campaign_id', 'N/A')}: {str(e)}"
-                stats['detalhes_erros'].append(error_msg)
-                print(error_msg)
-        
-        return stats
+                print(f"Erro no upsert em lote em {table}: {e}")
+                if fallback:
+                    print(f"Reprocessando {len(chunk)} linhas individualmente")
+                    for row in chunk:
+                        fallback(row, stats)
+                else:
+                    stats['erros'] += len(chunk)
+                    stats['detalhes_erros'].append(f"Erro no lote de {len(chunk)} linhas: {str(e)}")
     
     def filter_new_campaigns(self, campaign_data: List[Dict], account_id: str) -> List[Dict]:
         """
-        Filtra apenas campanhas que ainda não existem no banco
+        Filtra apenas campanhas novas ou com métricas alteradas em relação ao banco
+        
+        Faz uma única consulta por faixa de datas (min/max do lote) para montar
+        o mapa de chaves existentes -> metrics_hash e compara em memória.
+        As linhas devolvidas ficam marcadas para save_campaign_data(prefiltered=True).
         
         Args:
             campaign_data: Lista de dados de campanhas
             account_id: ID da conta Facebook
             
         Returns:
-            List[Dict]: Lista apenas com campanhas novas
+            List[Dict]: Lista com campanhas novas e alteradas
         """
-        if not campaign_data:
+        return self._filter_new_rows(campaign_data, 'relatorio_fb_campaigns', 'account_id',
+                                     self._account_key('facebook', account_id), 'date_start',
+                                     FB_METRIC_FIELDS)
+    
+    def _filter_new_rows(self, rows: List[Dict], table: str, owner_field: str,
+                         owner_id: str, date_field: str, metric_fields: tuple) -> List[Dict]:
+        """
+        Remove do lote as linhas cuja chave (campaign_id, data) já existe no
+        banco com as mesmas métricas
+        
+        Args:
+            rows: Linhas vindas da API
+            table: Tabela de destino
+            owner_field: Coluna da conta (account_id / customer_id)
+            owner_id: Valor da conta
+            date_field: Coluna de data (date_start / dia)
+            metric_fields: Colunas que entram no metrics_hash
+            
+        Returns:
+            List[Dict]: Linhas novas e alteradas, na mesma ordem do lote
+        """
+        valid_rows = [row for row in rows or [] if row.get('campaign_id') and row.get(date_field)]
+        if not valid_rows:
             return []
         
-        new_campaigns = []
+        stats = self._new_save_stats(len(valid_rows))
+        return self._classify_rows(valid_rows, table, owner_field, date_field, metric_fields,
+                                   stats, owner_id=owner_id)
+    
+    def _classify_rows(self, rows: List[Dict], table: str, owner_field: str, date_field: str,
+                       metric_fields: tuple, stats: Dict, owner_id: str = None) -> List[Dict]:
+        """
+        Compara as linhas com o banco pelo metrics_hash e devolve só as que
+        precisam ser gravadas
         
-        for campaign in campaign_data:
-            campaign_id = campaign.get('campaign_id')
-            date_start = campaign.get('date_start')
-            
-            if not campaign_id or not date_start:
+        Cada linha devolvida recebe metrics_hash e o estado transitório
+        SYNC_STATE_KEY ('novo' ou 'alterado'); as idênticas ao banco são
+        descartadas e contadas em stats['inalterados']. É feita uma consulta por
+        conta do lote (ou só para owner_id, quando informado).
+        
+        Returns:
+            List[Dict]: Linhas novas e alteradas, na mesma ordem do lote
+        """
+        rows_by_owner = {}
+        for row in rows:
+            key = owner_id if owner_id is not None else row.get(owner_field)
+            rows_by_owner.setdefault(key, []).append(row)
+        
+        existing_by_owner = {}
+        for key, owner_rows in rows_by_owner.items():
+            dates = [str(row[date_field]) for row in owner_rows]
+            existing_by_owner[key] = self._fetch_existing_keys(table, owner_field, key, date_field,
+                                                               min(dates), max(dates))
+        
+        to_write = []
+        for row in rows:
+            row['metrics_hash'] = self._metrics_hash(row, metric_fields)
+            existing = existing_by_owner[owner_id if owner_id is not None else row.get(owner_field)]
+            if existing is None:
+                # Em caso de erro, assume que não existem dados para evitar perda
+                row.pop(SYNC_STATE_KEY, None)
+                to_write.append(row)
                 continue
             
-            # Verifica se já existe
-            if not self.check_existing_campaign_data(account_id, campaign_id, date_start):
-                new_campaigns.append(campaign)
+            key = (str(row['campaign_id']), str(row[date_field]))
+            if key not in existing:
+                row[SYNC_STATE_KEY] = 'novo'
+                to_write.append(row)
+            elif existing[key] != row['metrics_hash']:
+                row[SYNC_STATE_KEY] = 'alterado'
+                to_write.append(row)
             else:
-                print(f"Filtrado (já existe): Campaign {campaign_id}, Data {date_start}")
+                stats['inalterados'] += 1
+        
+        changed = sum(1 for row in to_write if row.get(SYNC_STATE_KEY) == 'alterado')
+        if stats['inalterados'] or changed:
+            print(f"Comparação com {table}: {len(to_write) - changed} novos, {changed} alterados, "
+                  f"{stats['inalterados']} inalterados de {len(rows)} registros")
+        
+        return to_write
+    
+    def _fetch_existing_keys(self, table: str, owner_field: str, owner_id: str,
+                             date_field: str, start_date: str, end_date: str) -> Optional[Dict]:
+        """
+        Busca as chaves (campaign_id, data) já gravadas para uma conta no período
+        
+        Returns:
+            Optional[Dict]: Mapa chave -> metrics_hash (None para linhas antigas
+            sem hash), ou None em caso de erro
+        """
+        keys = {}
+        try:
+            for page in self._iter_keyset_pages(table, owner_field, owner_id, date_field,
+                                                start_date, end_date,
+                                                columns=f'campaign_id, {date_field}, metrics_hash'):
+                for row in page:
+                    keys[(str(row.get('campaign_id')), str(row.get(date_field)))] = row.get('metrics_hash')
+            return keys
+                
+        except Exception as e:
+            print(f"Erro ao buscar chaves existentes em {table}: {e}")
+            return None
+    
+    def _iter_keyset_pages(self, table: str, owner_field: str, owner_id: str, date_field: str,
+                           start_date: str, end_date: str, columns: str = '*',
+                           page_size: int = 1000) -> Iterator[List[Dict]]:
+        """
+        Percorre os registros de uma conta no período em páginas, usando cursor
+        keyset em (data, campaign_id) em vez de OFFSET
+        
+        Cada página é buscada só quando a anterior foi consumida, então a memória
+        fica limitada a page_size linhas qualquer que seja o período, e o limite
+        de linhas por resposta do PostgREST nunca trunca o resultado.
+        
+        Args:
+            table: Tabela consultada
+            owner_field: Coluna da conta (account_id / customer_id)
+            owner_id: Valor da conta
+            date_field: Coluna de data (date_start / dia)
+            start_date: Data início (YYYY-MM-DD)
+            end_date: Data fim (YYYY-MM-DD)
+            columns: Colunas do SELECT (devem incluir date_field e campaign_id)
+            page_size: Linhas por página
+            
+        Yields:
+            List[Dict]: Páginas de registros ordenados por (data, campaign_id)
+        """
+        cursor = None
+        while True:
+            query = self.supabase.table(table) \
+                .select(columns) \
+                .eq(owner_field, owner_id) \
+                .gte(date_field, start_date) \
+                .lte(date_field, end_date)
+            
+            if cursor:
+                last_date, last_campaign_id = cursor
+                query = query.or_(f'{date_field}.gt.{last_date},'
+                                  f'and({date_field}.eq.{last_date},campaign_id.gt.{last_campaign_id})')
+            
+            response = query \
+                .order(date_field) \
+                .order('campaign_id') \
+                .limit(page_size) \
+                .execute()
+            
+            # Só a página vazia encerra: o max-rows do PostgREST pode devolver
+            # páginas menores que page_size antes do fim
+            page = response.data or []
+            if not page:
+                return
+            yield page
+            cursor = (page[-1][date_field], page[-1]['campaign_id'])
+    
+    def _iter_period_rows(self, table: str, owner_field: str, owner_id: str, date_field: str,
+                          start_date: str, end_date: str, page_size: int,
+                          chunks: bool) -> Iterator:
+        """
+        Gera linhas (ou páginas, se chunks=True) de _iter_keyset_pages
+        
+        Um erro de leitura é registrado e propagado, para que o chamador não
+        trate um resultado truncado como completo.
+        """
+        try:
+            for page in self._iter_keyset_pages(table, owner_field, owner_id, date_field,
+                                                start_date, end_date, page_size=page_size):
+                if chunks:
+                    yield page
+                else:
+                    yield from page
+        except Exception as e:
+            print(f"Erro ao ler registros de {table} ({owner_id}): {e}")
+            raise
+    
+    def iter_existing_campaigns_for_period(self, account_id: str, start_date: str, end_date: str,
+                                           page_size: int = 1000, chunks: bool = False) -> Iterator:
+        """
+        Lê em streaming as campanhas Facebook gravadas no período
         
-        return new_campaigns
+        Args:
+            account_id: ID da conta Facebook
+            start_date: Data início (YYYY-MM-DD)
+            end_date: Data fim (YYYY-MM-DD)
+            page_size: Linhas buscadas por requisição
+            chunks: Se True, gera listas (uma por página) em vez de linhas
+            
+        Yields:
+            Dict (ou List[Dict] se chunks=True), ordenados por (date_start, campaign_id)
+        """
+        return self._iter_period_rows('relatorio_fb_campaigns', 'account_id',
+                                      self._account_key('facebook', account_id),
+                                      'date_start', start_date, end_date, page_size, chunks)
     
     def get_existing_campaigns_for_period(self, account_id: str, start_date: str, end_date: str) -> List[Dict]:
         """
@@ -368,19 +876,7 @@ class Database:
         Returns:
             List[Dict]: Lista de registros existentes
         """
-        try:
-            response = self.supabase.table('relatorio_fb_campaigns') \
-                .select('*') \
-                .eq('account_id', account_id) \
-                .gte('date_start', start_date) \
-                .lte('date_start', end_date) \
-                .execute()
-            
-            return response.data if response.data else []
-            
-        except Exception as e:
-            print(f"Erro ao buscar campanhas existentes: {e}")
-            return []
+        return list(self.iter_existing_campaigns_for_period(account_id, start_date, end_date))
     
     def get_client_link_grupo_by_name(self, client_name: str) -> Optional[str]:
         """
@@ -393,14 +889,10 @@ class Database:
             Optional[str]: Link do grupo WhatsApp ou None se não encontrado
         """
         try:
-            response = self.supabase.table('relatorio_cadastro_clientes') \
-                .select('link_grupo') \
-                .eq('name', client_name) \
-                .single() \
-                .execute()
+            client = self.client_registry.get_by_name(client_name)
             
-            if response.data and response.data.get('link_grupo'):
-                return response.data['link_grupo']
+            if client and client.get('link_grupo'):
+                return client['link_grupo']
             else:
                 print(f"Link grupo não encontrado para cliente: {client_name}")
                 return None
@@ -420,18 +912,14 @@ class Database:
             Optional[str]: Link do grupo WhatsApp ou None se não encontrado
         """
         try:
-            response = self.supabase.table('relatorio_cadastro_clientes') \
-                .select('link_grupo, name, id, tipo_conversao') \
-                .eq('id_facebook', facebook_id) \
-                .single() \
-                .execute()
+            client = self.client_registry.get_by_facebook_id(facebook_id)
             
-            print(f"[DEBUG] Facebook ID {facebook_id} - Dados encontrados: {bool(response.data)}")
+            print(f"[DEBUG] Facebook ID {facebook_id} - Dados encontrados: {bool(client)}")
             
-            if response.data:
-                link_grupo = response.data.get('link_grupo')
-                client_name = response.data.get('name', 'N/A')
-                client_id = response.data.get('id', 'N/A')
+            if client:
+                link_grupo = client.get('link_grupo')
+                client_name = client.get('name', 'N/A')
+                client_id = client.get('id', 'N/A')
                 
                 print(f"[DEBUG] Cliente: {client_name} (ID: {client_id}, FB ID: {facebook_id})")
                 print(f"[DEBUG] Link grupo: {repr(link_grupo)}")
@@ -462,15 +950,11 @@ class Database:
             Optional[str]: Tipo de conversão ('leads' ou 'compras') ou None
         """
         try:
-            response = self.supabase.table('relatorio_cadastro_clientes') \
-                .select('tipo_conversao, name') \
-                .eq('id_facebook', facebook_id) \
-                .single() \
-                .execute()
+            client = self.client_registry.get_by_facebook_id(facebook_id)
             
-            if response.data:
-                tipo_conversao = response.data.get('tipo_conversao', '').lower()
-                client_name = response.data.get('name', 'N/A')
+            if client:
+                tipo_conversao = (client.get('tipo_conversao') or '').lower()
+                client_name = client.get('name', 'N/A')
                 
                 print(f"[DEBUG] Tipo de conversão para {client_name}: {tipo_conversao}")
                 
@@ -517,96 +1001,130 @@ class Database:
             # Em caso de erro, assume que não existem dados para evitar perda
             return False
     
-    def save_google_ads_data(self, campaign_data: List[Dict]) -> Dict:
+    def save_google_ads_data(self, campaign_data: Iterable[Dict], bulk: bool = True,
+                             prefiltered: bool = False) -> Dict:
         """
         Salva dados de campanhas Google Ads na tabela relatorio_google_ads
         Retorna estatísticas do salvamento
         
         Args:
-            campaign_data: Lista de dados de campanhas Google Ads
+            campaign_data: Lista ou stream de dados de campanhas Google Ads; streams
+                           são gravados em blocos de stream_chunk_size linhas
+            bulk: Se True, compara os hashes de métricas com o banco em uma consulta
+                  por cliente e envia em lotes só as linhas novas (INSERT) e alteradas
+                  (UPDATE via upsert); se False, usa o modo antigo (SELECT + INSERT por linha)
+            prefiltered: Indica que o lote já passou por filter_new_*; nesse caso
+                         a comparação com o banco é pulada
             
         Returns:
-            Dict: Estatísticas do salvamento (novos, ignorados, erros)
+            Dict: Estatísticas do salvamento (novos, atualizados, inalterados, ignorados, erros)
         """
-        stats = {
-            'total_enviados': len(campaign_data),
-            'novos_salvos': 0,
-            'duplicados_ignorados': 0,
-            'erros': 0,
-            'detalhes_erros': []
-        }
+        stats = self._new_save_stats(0)
+        touched_days = set()
         
-        for campaign in campaign_data:
-            try:
-                customer_id = campaign.get('customer_id')
-                campaign_id = campaign.get('campaign_id')
-                date = campaign.get('dia')
-                
-                if not all([customer_id, campaign_id, date]):
-                    stats['erros'] += 1
-                    stats['detalhes_erros'].append(f"Dados incompletos: {campaign}")
-                    continue
-                
-                # Verifica se já existe
-                if self.check_existing_google_ads_data(customer_id, campaign_id, date):
-                    stats['duplicados_ignorados'] += 1
-                    print(f"Dados já existem - Ignorando: Customer {customer_id}, Campaign {campaign_id}, Data {date}")
-                    continue
-                
-                # Remove campos que não existem na tabela
-                campaign.pop('id', None)
-                campaign.pop('created_at', None)
+        for chunk in self._iter_save_chunks(campaign_data):
+            stats['total_enviados'] += len(chunk)
+            touched_days.update((row.get('customer_id'), row.get('dia')) for row in chunk)
+            
+            if bulk:
+                valid_rows = []
+                for campaign in chunk:
+                    if not all([campaign.get('customer_id'), campaign.get('campaign_id'), campaign.get('dia')]):
+                        stats['erros'] += 1
+                        stats['detalhes_erros'].append(f"Dados incompletos: {campaign}")
+                        continue
+                    # Remove campos que não existem na tabela
+                    campaign.pop('id', None)
+                    campaign.pop('created_at', None)
+                    valid_rows.append(campaign)
                 
-                # Salva no banco
-                response = self.supabase.table('relatorio_google_ads') \
-                    .insert(campaign) \
-                    .execute()
+                if not prefiltered:
+                    valid_rows = self._classify_rows(valid_rows, 'relatorio_google_ads', 'customer_id',
+                                                     'dia', GOOGLE_ADS_METRIC_FIELDS, stats)
                 
-                if response.data:
-                    stats['novos_salvos'] += 1
-                    print(f"Dados Google Ads salvos: Customer {customer_id}, Campaign {campaign_id}, Data {date}")
-                else:
-                    stats['erros'] += 1
-                    stats['detalhes_erros'].append(f"Falha ao salvar: {campaign}")
-                    
-            except Exception as e:
-                stats['erros'] += 1
-                error_msg = f"Erro ao processar campanha Google {campaign.get('customer_id', 'N/A')}: {str(e)}"
-                stats['detalhes_erros'].append(error_msg)
-                print(error_msg)
+                self._bulk_write('relatorio_google_ads', valid_rows,
+                                 ('customer_id', 'campaign_id', 'dia'),
+                                 GOOGLE_ADS_CONFLICT, GOOGLE_ADS_METRIC_FIELDS, stats,
+                                 fallback=self._save_google_ads_row)
+            else:
+                for campaign in chunk:
+                    self._save_google_ads_row(campaign, stats, check_existing=not prefiltered)
+        
+        # Mantém o rollup diário em dia com o que foi gravado
+        if stats['novos_salvos'] or stats['atualizados']:
+            self._refresh_rollup_for_rows(GOOGLE_ADS_ROLLUP, [{'customer_id': owner_id, 'dia': day}
+                                                              for owner_id, day in touched_days])
         
         return stats
     
+    def _save_google_ads_row(self, campaign: Dict, stats: Dict, check_existing: bool = True):
+        """
+        Salva uma única linha em relatorio_google_ads (verificação + INSERT),
+        acumulando o resultado em stats
+        """
+        try:
+            customer_id = campaign.get('customer_id')
+            campaign_id = campaign.get('campaign_id')
+            date = campaign.get('dia')
+            
+            if not all([customer_id, campaign_id, date]):
+                stats['erros'] += 1
+                stats['detalhes_erros'].append(f"Dados incompletos: {campaign}")
+                return
+            
+            # Remove campos que não existem na tabela
+            campaign.pop('id', None)
+            campaign.pop('created_at', None)
+            
+            # Linha marcada como alterada por _classify_rows: regrava as métricas
+            if campaign.pop(SYNC_STATE_KEY, None) == 'alterado':
+                self._update_row('relatorio_google_ads', campaign,
+                                 ('customer_id', 'campaign_id', 'dia'), stats)
+                return
+            
+            # Verifica se já existe (pulado quando o lote já foi filtrado)
+            if check_existing and self.check_existing_google_ads_data(customer_id, campaign_id, date):
+                stats['duplicados_ignorados'] += 1
+                print(f"Dados já existem - Ignorando: Customer {customer_id}, Campaign {campaign_id}, Data {date}")
+                return
+            
+            campaign['metrics_hash'] = self._metrics_hash(campaign, GOOGLE_ADS_METRIC_FIELDS)
+            
+            # Salva no banco
+            response = self.supabase.table('relatorio_google_ads') \
+                .insert(campaign) \
+                .execute()
+            
+            if response.data:
+                stats['novos_salvos'] += 1
+                print(f"Dados Google Ads salvos: Customer {customer_id}, Campaign {campaign_id}, Data {date}")
+            else:
+                stats['erros'] += 1
+                stats['detalhes_erros'].append(f"Falha ao salvar: {campaign}")
+                
+        except Exception as e:
+            stats['erros'] += 1
+            error_msg = f"Erro ao processar campanha Google {campaign.get('customer_id', 'N/A')}: {str(e)}"
+            stats['detalhes_erros'].append(error_msg)
+            print(error_msg)
+    
     def filter_new_google_ads_campaigns(self, campaign_data: List[Dict], customer_id: str) -> List[Dict]:
         """
-        Filtra apenas campanhas Google Ads que ainda não existem no banco
+        Filtra apenas campanhas Google Ads novas ou com métricas alteradas em relação ao banco
+        
+        Faz uma única consulta por faixa de datas (min/max do lote) para montar
+        o mapa de chaves existentes -> metrics_hash e compara em memória.
+        As linhas devolvidas ficam marcadas para save_google_ads_data(prefiltered=True).
         
         Args:
             campaign_data: Lista de dados de campanhas Google Ads
             customer_id: ID do cliente Google Ads
             
         Returns:
-            List[Dict]: Lista apenas com campanhas novas
+            List[Dict]: Lista com campanhas novas e alteradas
         """
-        if not campaign_data:
-            return []
-        
-        new_campaigns = []
-        
-        for campaign in campaign_data:
-            campaign_id = campaign.get('campaign_id')
-            date = campaign.get('dia')
-            
-            if not campaign_id or not date:
-                continue
-            
-            # Verifica se já existe
-            if not self.check_existing_google_ads_data(customer_id, campaign_id, date):
-                new_campaigns.append(campaign)
-            else:
-                print(f"Filtrado Google Ads (já existe): Campaign {campaign_id}, Data {date}")
-        
-        return new_campaigns
+        return self._filter_new_rows(campaign_data, 'relatorio_google_ads',
+                                     'customer_id', customer_id, 'dia', GOOGLE_ADS_METRIC_FIELDS)
     
     def get_existing_google_ads_for_period(self, customer_id: str, start_date: str, end_date: str) -> List[Dict]:
         """
@@ -620,19 +1138,48 @@ class Database:
         Returns:
             List[Dict]: Lista de registros existentes
         """
+        return list(self.iter_existing_google_ads_for_period(customer_id, start_date, end_date))
+    
+    def iter_existing_google_ads_for_period(self, customer_id: str, start_date: str, end_date: str,
+                                            page_size: int = 1000, chunks: bool = False) -> Iterator:
+        """
+        Lê em streaming as campanhas Google Ads gravadas no período
+        
+        Args:
+            customer_id: ID do cliente Google Ads
+            start_date: Data início (YYYY-MM-DD)
+            end_date: Data fim (YYYY-MM-DD)
+            page_size: Linhas buscadas por requisição
+            chunks: Se True, gera listas (uma por página) em vez de linhas
+            
+        Yields:
+            Dict (ou List[Dict] se chunks=True), ordenados por (dia, campaign_id)
+        """
+        return self._iter_period_rows('relatorio_google_ads', 'customer_id', customer_id,
+                                      'dia', start_date, end_date, page_size, chunks)
+    
+    def get_latest_google_ads_day(self, customer_id: str, start_date: str, end_date: str) -> Optional[str]:
+        """
+        Retorna o dia mais recente com dados Google Ads gravados no período
+        
+        Returns:
+            Optional[str]: Data (YYYY-MM-DD) ou None se não houver dados
+        """
         try:
             response = self.supabase.table('relatorio_google_ads') \
-                .select('*') \
+                .select('dia') \
                 .eq('customer_id', customer_id) \
                 .gte('dia', start_date) \
                 .lte('dia', end_date) \
+                .order('dia', desc=True) \
+                .limit(1) \
                 .execute()
             
-            return response.data if response.data else []
+            return str(response.data[0]['dia']) if response.data else None
             
         except Exception as e:
-            print(f"Erro ao buscar campanhas Google Ads existentes: {e}")
-            return []
+            print(f"Erro ao buscar último dia Google Ads: {e}")
+            return None
     
     def get_client_link_grupo_by_google_id(self, google_id: str) -> Optional[str]:
         """
@@ -648,18 +1195,14 @@ class Database:
             # Sanitiza o google_id
             google_id_clean = str(google_id).strip().replace('\n', '').replace('\r', '')
             
-            response = self.supabase.table('relatorio_cadastro_clientes') \
-                .select('link_grupo, name, id') \
-                .eq('id_google', google_id_clean) \
-                .single() \
-                .execute()
+            client = self.client_registry.get_by_google_id(google_id_clean)
             
-            print(f"[DEBUG] Google ID {google_id} (limpo: {google_id_clean}) - Dados encontrados: {bool(response.data)}")
+            print(f"[DEBUG] Google ID {google_id} (limpo: {google_id_clean}) - Dados encontrados: {bool(client)}")
             
-            if response.data:
-                link_grupo = response.data.get('link_grupo')
-                client_name = response.data.get('name', 'N/A')
-                client_id = response.data.get('id', 'N/A')
+            if client:
+                link_grupo = client.get('link_grupo')
+                client_name = client.get('name', 'N/A')
+                client_id = client.get('id', 'N/A')
                 
                 print(f"[DEBUG] Cliente: {client_name} (ID: {client_id}, Google ID: {google_id_clean})")
                 print(f"[DEBUG] Link grupo: {repr(link_grupo)}")
@@ -679,4 +1222,297 @@ class Database:
             traceback.print_exc()
             return None
             
-   
\ No newline at end of file
+   
+
+    # =============================================
+    # ROLLUP DIÁRIO POR CONTA
+    # =============================================
+    
+    def _refresh_rollup_for_rows(self, spec: Dict, rows: List[Dict]):
+        """
+        Recalcula o rollup dos dias tocados por um lote recém-gravado
+        
+        Agrupa as linhas por conta e recalcula, a partir da tabela de campanhas,
+        a faixa entre o menor e o maior dia do lote de cada conta. Como o
+        recálculo é idempotente, não importa se parte das linhas era duplicada.
+        """
+        days_by_owner = {}
+        for row in rows:
+            owner_id = row.get(spec['owner_field'])
+            day = row.get(spec['date_field'])
+            if owner_id and day:
+                days_by_owner.setdefault(owner_id, []).append(str(day))
+        
+        for owner_id, days in days_by_owner.items():
+            self._rebuild_rollup(spec, owner_id, min(days), max(days))
+    
+    def _rebuild_rollup(self, spec: Dict, owner_id: str, start_date: str, end_date: str) -> int:
+        """
+        Recalcula e grava o rollup de uma conta no período
+        
+        Returns:
+            int: Quantidade de dias gravados no rollup
+        """
+        date_field = spec['date_field']
+        renames = spec.get('renames', {})
+        followers_field = spec.get('followers_field')
+        columns = ', '.join(['campaign_id', date_field] + list(spec['sums'])
+                            + ([followers_field] if followers_field else []))
+        
+        try:
+            days = {}
+            for page in self._iter_keyset_pages(spec['source'], spec['owner_field'], owner_id,
+                                                date_field, start_date, end_date, columns=columns):
+                for row in page:
+                    day = str(row[date_field])
+                    totals = days.get(day)
+                    if totals is None:
+                        totals = {field: cast(0) for field, cast in spec['sums'].items()}
+                        totals['rows'] = 0
+                        totals['has_followers_campaign'] = False
+                        days[day] = totals
+                    
+                    totals['rows'] += 1
+                    for field, cast in spec['sums'].items():
+                        totals[field] += cast(row.get(field) or 0)
+                    
+                    if followers_field and 'seguidor' in (row.get(followers_field) or '').lower():
+                        totals['has_followers_campaign'] = True
+            
+            if not days:
+                return 0
+            
+            updated_at = datetime.now().isoformat()
+            rollup_rows = []
+            for day, totals in days.items():
+                rollup_row = {spec['owner_field']: owner_id, 'dia': day,
+                              'rows': totals['rows'], 'updated_at': updated_at}
+                for field in spec['sums']:
+                    rollup_row[renames.get(field, field)] = totals[field]
+                if followers_field:
+                    rollup_row['has_followers_campaign'] = totals['has_followers_campaign']
+                rollup_rows.append(rollup_row)
+            
+            self.supabase.table(spec['table']) \
+                .upsert(rollup_rows, on_conflict=f"{spec['owner_field']},dia") \
+                .execute()
+            
+            print(f"Rollup {spec['table']} atualizado: {owner_id}, {len(rollup_rows)} dias ({start_date} a {end_date})")
+            return len(rollup_rows)
+            
+        except Exception as e:
+            print(f"Erro ao atualizar rollup {spec['table']} ({owner_id}): {e}")
+            return 0
+    
+    def _get_rollup_for_period(self, spec: Dict, owner_id: str, start_date: str, end_date: str) -> List[Dict]:
+        """Busca as linhas de rollup (uma por dia) de uma conta no período"""
+        try:
+            response = self.supabase.table(spec['table']) \
+                .select('*') \
+                .eq(spec['owner_field'], owner_id) \
+                .gte('dia', start_date) \
+                .lte('dia', end_date) \
+                .order('dia') \
+                .execute()
+            
+            return response.data if response.data else []
+            
+        except Exception as e:
+            print(f"Erro ao buscar rollup {spec['table']}: {e}")
+            return []
+    
+    def get_facebook_rollup_for_period(self, account_id: str, start_date: str, end_date: str) -> List[Dict]:
+        """
+        Busca os totais diários da conta Facebook no período (no máximo uma linha por dia)
+        
+        As linhas podem ser passadas direto para WhatsAppMessageFormatter.calculate_metrics
+        """
+        return self._get_rollup_for_period(FB_ROLLUP, self._account_key('facebook', account_id),
+                                           start_date, end_date)
+    
+    def get_google_ads_rollup_for_period(self, customer_id: str, start_date: str, end_date: str) -> List[Dict]:
+        """
+        Busca os totais diários do cliente Google Ads no período (no máximo uma linha por dia)
+        
+        As linhas podem ser passadas direto para WhatsAppMessageFormatter.calculate_google_ads_metrics
+        """
+        return self._get_rollup_for_period(GOOGLE_ADS_ROLLUP, customer_id, start_date, end_date)
+    
+    def rollup_covers_period(self, platform: str, account_id: str, rollup_rows: List[Dict],
+                             start_date: str, end_date: str) -> bool:
+        """
+        Indica se as linhas de rollup bastam para os totais do período
+        
+        Dias sem entrega não têm linha de rollup, então a falta de um dia só é
+        aceita quando o watermark mostra que o período inteiro já foi
+        sincronizado; caso contrário os totais podem estar incompletos e o
+        chamador deve recorrer à API ou à tabela de campanhas.
+        
+        Args:
+            platform: 'facebook' ou 'google'
+            account_id: ID da conta
+            rollup_rows: Resultado de get_*_rollup_for_period
+            start_date: Data início (YYYY-MM-DD)
+            end_date: Data fim (YYYY-MM-DD)
+        """
+        days = {str(row.get('dia'))[:10] for row in rollup_rows or []}
+        period_days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+        if len(days) >= period_days:
+            return True
+        
+        watermark = self.get_sync_watermark(platform, account_id)
+        return bool(watermark) and str(watermark['synced_from'])[:10] <= start_date \
+            and str(watermark['synced_until'])[:10] >= end_date
+    
+    def rebuild_facebook_rollup(self, account_id: str, start_date: str, end_date: str) -> int:
+        """
+        Recalcula o rollup diário de uma conta Facebook no período (usado para popular o histórico)
+        """
+        return self._rebuild_rollup(FB_ROLLUP, self._account_key('facebook', account_id),
+                                    start_date, end_date)
+    
+    def rebuild_google_ads_rollup(self, customer_id: str, start_date: str, end_date: str) -> int:
+        """
+        Recalcula o rollup diário de um cliente Google Ads no período (usado para popular o histórico)
+        """
+        return self._rebuild_rollup(GOOGLE_ADS_ROLLUP, customer_id, start_date, end_date)
+
+    # =============================================
+    # WATERMARK DE SINCRONIZAÇÃO
+    # =============================================
+    
+    @staticmethod
+    def _shift_day(date_str: str, days: int) -> str:
+        """Soma (ou subtrai) dias de uma data YYYY-MM-DD"""
+        return (datetime.strptime(str(date_str)[:10], '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+    
+    def get_sync_watermark(self, platform: str, account_id: str) -> Optional[Dict]:
+        """
+        Busca o watermark de sincronização de uma conta
+        
+        Args:
+            platform: 'facebook' ou 'google'
+            account_id: ID da conta (act_fb / id_google)
+            
+        Returns:
+            Optional[Dict]: Linha de relatorio_sync_watermarks ou None
+        """
+        account_key = self._account_key(platform, account_id)
+        # Watermarks do Facebook gravados antes da normalização usam act_<id>
+        keys = [account_key, f'act_{account_key}'] if platform == 'facebook' else [account_key]
+        try:
+            response = self.supabase.table(SYNC_WATERMARKS_TABLE) \
+                .select('*') \
+                .eq('platform', platform) \
+                .in_('account_id', keys) \
+                .execute()
+            
+            rows = sorted(response.data or [], key=lambda row: row.get('account_id') != account_key)
+            return rows[0] if rows else None
+            
+        except Exception as e:
+            print(f"Erro ao buscar watermark {platform} ({account_id}): {e}")
+            return None
+    
+    def plan_sync_range(self, platform: str, account_id: str, start_date: str, end_date: str,
+                        backfill: bool = False) -> Optional[Tuple[str, str]]:
+        """
+        Calcula a faixa de dias que ainda precisa ser buscada na API
+        
+        Os dias já ingeridos depois de a atribuição estabilizar (até settled_until)
+        são pulados. Com backfill=True, o início volta até o dia seguinte a
+        settled_until (no máximo sync_max_backfill_days), para fechar lacunas e
+        rebuscar a janela de atribuição mesmo quando o período pedido é curto
+        (ex.: atualização diária de ontem).
+        
+        Args:
+            platform: 'facebook' ou 'google'
+            account_id: ID da conta
+            start_date: Data início pedida (YYYY-MM-DD)
+            end_date: Data fim pedida (YYYY-MM-DD)
+            backfill: Se True, estende o início até o watermark
+            
+        Returns:
+            Optional[Tuple[str, str]]: (início, fim) a buscar, ou None se o período
+            inteiro já está sincronizado
+        """
+        watermark = self.get_sync_watermark(platform, account_id)
+        if not watermark:
+            return start_date, end_date
+        
+        synced_from = str(watermark['synced_from'])[:10]
+        settled_until = str(watermark['settled_until'])[:10]
+        next_day = self._shift_day(settled_until, 1)
+        fetch_start = start_date
+        
+        if backfill and next_day < start_date:
+            fetch_start = max(next_day, self._shift_day(start_date, -self.sync_max_backfill_days))
+        elif synced_from <= start_date <= settled_until:
+            fetch_start = next_day
+        
+        if fetch_start > end_date:
+            print(f"Watermark {platform} ({account_id}): período {start_date} a {end_date} já sincronizado")
+            return None
+        
+        if fetch_start != start_date:
+            print(f"Watermark {platform} ({account_id}): buscando {fetch_start} a {end_date} "
+                  f"(pedido: {start_date} a {end_date})")
+        return fetch_start, end_date
+    
+    def advance_sync_watermark(self, platform: str, account_id: str,
+                               start_date: str, end_date: str) -> bool:
+        """
+        Registra que os dias de start_date a end_date foram ingeridos por completo
+        
+        A faixa é unida ao watermark atual quando é contínua a ele; senão passa a
+        ser o novo watermark (a faixa mais recente é a que importa para a
+        sincronização incremental). settled_until só avança sobre dias buscados
+        nesta chamada e que já estavam fora da janela de re-checagem.
+        
+        Returns:
+            bool: True se o watermark foi gravado
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        cutoff = self._shift_day(today, -self.sync_recheck_days)
+        fetched_settled = min(end_date, cutoff)
+        
+        watermark = self.get_sync_watermark(platform, account_id)
+        if watermark:
+            synced_from = str(watermark['synced_from'])[:10]
+            synced_until = str(watermark['synced_until'])[:10]
+            settled_until = str(watermark['settled_until'])[:10]
+        
+        if watermark and start_date <= self._shift_day(synced_until, 1) \
+                and end_date >= self._shift_day(synced_from, -1):
+            new_from = min(synced_from, start_date)
+            new_until = max(synced_until, end_date)
+            new_settled = settled_until
+            if start_date <= self._shift_day(settled_until, 1):
+                new_settled = max(settled_until, fetched_settled)
+        elif watermark and end_date < synced_from:
+            # Faixa antiga e desconectada: mantém o watermark atual
+            return False
+        else:
+            new_from = start_date
+            new_until = end_date
+            new_settled = fetched_settled
+        
+        # settled_until antes de synced_from indica "nenhum dia estabilizado"
+        new_settled = max(new_settled, self._shift_day(new_from, -1))
+        
+        try:
+            self.supabase.table(SYNC_WATERMARKS_TABLE).upsert({
+                'platform': platform,
+                'account_id': self._account_key(platform, account_id),
+                'synced_from': new_from,
+                'synced_until': new_until,
+                'settled_until': new_settled,
+                'updated_at': datetime.now().isoformat()
+            }, on_conflict='platform,account_id').execute()
+            
+            print(f"Watermark {platform} ({account_id}): {new_from} a {new_until}, estável até {new_settled}")
+            return True
+            
+        except Exception as e:
+            print(f"Erro ao gravar watermark {platform} ({account_id}): {e}")
+            return False
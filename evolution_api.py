@@ -4,11 +4,12 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 from whatsapp_formatter import WhatsAppMessageFormatter
+from http_session import get_http_session
 
 load_dotenv()
 
 class EvolutionAPI:
-    def __init__(self):
+    def __init__(self, http_session=None):
         """Inicializa a classe com configurações da Evolution API"""
         # Configurações corretas baseadas no webhook recebido
         self.base_url = os.getenv('EVOLUTION_BASE_URL', "https://lc-evolution-api.qy8om2.easypanel.host")
@@ -22,6 +23,9 @@ class EvolutionAPI:
             "apikey": self.token
         }
         
+        # Sessão HTTP compartilhada (keep-alive e novas tentativas em 429/5xx)
+        self.http_session = http_session or get_http_session()
+        
         # Inicializa o formatador de mensagens
         self.message_formatter = WhatsAppMessageFormatter()
     
@@ -55,7 +59,7 @@ class EvolutionAPI:
             print(f"[EvolutionAPI] Headers: {self.headers}")
             print(f"[EvolutionAPI] Payload: {json.dumps(payload, indent=2)}")
             
-            response = requests.post(
+            response = self.http_session.post(
                 self.api_url,
                 headers=self.headers,
                 json=payload,
@@ -133,7 +137,7 @@ class EvolutionAPI:
         # Teste 1: Endpoint raiz
         print(f"[TEST 1] Testando endpoint raiz: {self.base_url}")
         try:
-            response = requests.get(self.base_url, headers=self.headers, timeout=10)
+            response = self.http_session.get(self.base_url, headers=self.headers, timeout=10)
             result = {
                 "test": "root_endpoint",
                 "url": self.base_url,
@@ -156,7 +160,7 @@ class EvolutionAPI:
         instances_url = f"{self.base_url}/instance/fetchInstances"
         print(f"[TEST 2] Testando listar instâncias: {instances_url}")
         try:
-            response = requests.get(instances_url, headers=self.headers, timeout=10)
+            response = self.http_session.get(instances_url, headers=self.headers, timeout=10)
             result = {
                 "test": "fetch_instances",
                 "url": instances_url,
@@ -179,7 +183,7 @@ class EvolutionAPI:
         connect_url = f"{self.base_url}/instance/connect/{self.instance_name}"
         print(f"[TEST 3] Testando conectar instância: {connect_url}")
         try:
-            response = requests.get(connect_url, headers=self.headers, timeout=10)
+            response = self.http_session.get(connect_url, headers=self.headers, timeout=10)
             result = {
                 "test": "connect_instance",
                 "url": connect_url,
@@ -202,7 +206,7 @@ class EvolutionAPI:
         print(f"[TEST 4] Testando endpoint de envio: {self.api_url}")
         fake_payload = {"number": "5511999999999", "text": "test"}
         try:
-            response = requests.post(self.api_url, headers=self.headers, json=fake_payload, timeout=10)
+            response = self.http_session.post(self.api_url, headers=self.headers, json=fake_payload, timeout=10)
             result = {
                 "test": "send_endpoint",
                 "url": self.api_url,
@@ -279,7 +283,7 @@ _Sistema de Relatórios Facebook_"""
             
             return message
     
-    def format_google_ads_message(self, client_name, start_date, end_date, campaigns_data):
+    def format_google_ads_message(self, client_name, start_date, end_date, campaigns_data, metrics=None):
         """
         Formata mensagem personalizada para Google Ads
         
@@ -287,15 +291,16 @@ _Sistema de Relatórios Facebook_"""
             client_name (str): Nome do cliente
             start_date (str): Data de início
             end_date (str): Data de fim
-            campaigns_data (list): Dados das campanhas Google Ads
+            campaigns_data (list): Dados das campanhas Google Ads (lista ou stream)
+            metrics (dict): Métricas já calculadas (opcional, dispensa campaigns_data)
             
         Returns:
             str: Mensagem formatada
         """
-        if campaigns_data:
+        if campaigns_data or metrics:
             # Usa o formatador personalizado com dados reais do Google Ads
             return self.message_formatter.format_google_ads_message(
-                client_name, start_date, end_date, campaigns_data
+                client_name, start_date, end_date, campaigns_data, metrics
             )
         else:
             # Fallback para mensagem simples
@@ -1,31 +1,111 @@
 import os
+import json
+import time
 import requests
+import urllib3
+from urllib.parse import urlencode
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Iterator, Tuple
 from dotenv import load_dotenv
+from http_session import get_http_session
+from facebook_throttler import FacebookThrottler, get_facebook_throttler
+from report_chunks import split_date_range, iter_parallel
+from report_cache import ReportCache, cache_key, get_report_cache
 
 load_dotenv()
 
+# Tipo de ação da Graph API -> coluna do relatório (e da tabela relatorio_fb_campaigns).
+# Novos eventos podem ser incluídos sem editar o código via FACEBOOK_ACTION_COLUMNS
+# (JSON, ex.: {"offsite_conversion.fb_pixel_search": "offsite_conversion_fb_pixel_search"});
+# a coluna precisa existir na tabela para que as linhas sejam gravadas.
+FB_ACTION_COLUMNS = {
+    'link_click': 'link_click',
+    'landing_page_view': 'landing_page_view',
+    'offsite_conversion.fb_pixel_add_to_cart': 'offsite_conversion_fb_pixel_add_to_cart',
+    'offsite_conversion.fb_pixel_initiate_checkout': 'offsite_conversion_fb_pixel_initiate_checkout',
+    'offsite_conversion.fb_pixel_lead': 'offsite_conversion_fb_pixel_lead',
+    'onsite_conversion.messaging_conversation_started_7d': 'onsite_conversion_messaging_conversation_started_7d',
+    'offsite_conversion.fb_pixel_purchase': 'offsite_conversion_fb_pixel_purchase',
+    'offsite_conversion.fb_pixel_custom': 'offsite_conversion_fb_pixel_custom',
+    'offsite_conversion.fb_pixel_complete_registration': 'offsite_conversion_fb_pixel_complete_registration',
+    'onsite_conversion.lead_grouped': 'onsite_conversion_lead_grouped',
+}
+
+# Campos pedidos ao endpoint de insights (baseados no CSV fornecido)
+FB_INSIGHTS_FIELDS = [
+    'account_id',
+    'campaign_id',
+    'campaign_name',
+    'date_start',
+    'reach',
+    'impressions',
+    'spend',
+    'inline_link_clicks',
+    'actions',  # Para capturar conversões
+    'cost_per_action_type'
+]
+
+# Versão do processamento das linhas (_process_campaign_data); junto com os
+# campos e as ações capturadas, define a chave do cache de relatórios
+FB_CACHE_VERSION = 1
+
 class FacebookAPI:
-    def __init__(self):
+    def __init__(self, http_session: Optional[requests.Session] = None,
+                 throttler: Optional[FacebookThrottler] = None,
+                 cache: Optional[ReportCache] = None):
         """Inicializa API do Facebook"""
         self.app_id = os.getenv("FACEBOOK_APP_ID")
         self.app_secret = os.getenv("FACEBOOK_APP_SECRET")
         self.access_token = os.getenv("FACEBOOK_ACCESS_TOKEN")
         self.base_url = "https://graph.facebook.com/v18.0"
+        # Sessão HTTP compartilhada (keep-alive e novas tentativas em 429/5xx)
+        self.http_session = http_session or get_http_session()
+        # Sem novas tentativas de leitura: o pedido síncrono de insights que
+        # excede o tempo ou o volume vira relatório assíncrono em vez de insistir
+        self.fail_fast_session = http_session or get_http_session(retry_reads=False)
+        # Controle de ritmo pelos cabeçalhos de uso (compartilhado pelo processo)
+        self.throttler = throttler or get_facebook_throttler()
+        # Cache em disco dos dias já buscados (None se REPORT_CACHE_ENABLED=false)
+        self.cache = cache or get_report_cache()
+        # Timeout das requisições (segundos)
+        self.request_timeout = float(os.getenv("FACEBOOK_TIMEOUT", 120))
+        # Relatórios assíncronos (async=true): períodos a partir deste número de dias
+        self.async_min_days = int(os.getenv("FACEBOOK_ASYNC_MIN_DAYS", 14))
+        # Tempo máximo de espera por um relatório assíncrono e intervalo máximo entre consultas
+        self.async_timeout = float(os.getenv("FACEBOOK_ASYNC_TIMEOUT", 900))
+        self.async_max_poll_interval = float(os.getenv("FACEBOOK_ASYNC_MAX_POLL_INTERVAL", 30))
+        # Limite de pedidos por chamada batch da Graph API
+        self.batch_limit = 50
+        # Períodos longos são divididos em blocos de chunk_days dias, buscados em paralelo
+        self.chunk_days = int(os.getenv("FACEBOOK_CHUNK_DAYS", 30))
+        self.max_parallel_chunks = int(os.getenv("FACEBOOK_MAX_PARALLEL_CHUNKS", 4))
+        # Ações capturadas (tipo de ação -> coluna) e colunas zeradas de cada linha
+        self.action_columns = self._load_action_columns()
+        self._action_defaults = dict.fromkeys(self.action_columns.values(), 0)
+    
+    @staticmethod
+    def _load_action_columns() -> Dict[str, str]:
+        """FB_ACTION_COLUMNS mais as ações extras de FACEBOOK_ACTION_COLUMNS"""
+        action_columns = dict(FB_ACTION_COLUMNS)
+        extra = os.getenv("FACEBOOK_ACTION_COLUMNS")
+        if extra:
+            try:
+                action_columns.update({str(action_type): str(column) for action_type, column in json.loads(extra).items()})
+            except (ValueError, AttributeError) as e:
+                print(f"[WARNING] FACEBOOK_ACTION_COLUMNS inválido, usando padrões: {e}")
+        return action_columns
     
     def validate_date_range(self, start_date: str, end_date: str) -> bool:
         """
-        Valida se o período não excede 90 dias
+        Valida as datas do período
+        
+        Não há limite de tamanho: períodos longos são divididos em blocos
+        (chunk_days) por iter_campaigns_report.
         """
         try:
             start = datetime.strptime(start_date, '%Y-%m-%d')
             end = datetime.strptime(end_date, '%Y-%m-%d')
             
-            # Verifica se não excede 90 dias
-            if (end - start).days > 60:
-                return False
-            
             # Verifica se as datas são válidas
             if start > end or end > datetime.now():
                 return False
@@ -34,7 +114,8 @@ class FacebookAPI:
         except ValueError:
             return False
     
-    def get_campaigns_report(self, account_id: str, start_date: str, end_date: str) -> List[Dict]:
+    def get_campaigns_report(self, account_id: str, start_date: str, end_date: str,
+                             skip_zero_impressions: bool = False) -> List[Dict]:
         """
         Busca relatório de campanhas do Facebook
         
@@ -42,24 +123,388 @@ class FacebookAPI:
             account_id: ID da conta Facebook (formato: act_123456789)
             start_date: Data início (YYYY-MM-DD)
             end_date: Data fim (YYYY-MM-DD)
+            skip_zero_impressions: Se True, a API omite linhas sem impressões
+        """
+        return list(self.iter_campaigns_report(account_id, start_date, end_date,
+                                               skip_zero_impressions=skip_zero_impressions))
+    
+    def get_account_summary(self, account_id: str, start_date: str, end_date: str) -> Dict:
+        """
+        Busca o total da conta no período, já agregado pela API
+        
+        Pede level=account com time_increment=all_days: uma única linha com as
+        mesmas métricas e ações de get_campaigns_report, em vez de uma linha
+        por campanha e por dia. Usado pelo envio via WhatsApp, que só precisa
+        do total.
+        
+        Args:
+            account_id: ID da conta Facebook (formato: act_123456789)
+            start_date: Data início (YYYY-MM-DD)
+            end_date: Data fim (YYYY-MM-DD)
+            
+        Returns:
+            Dict: Linha no formato de _process_campaign_data, com
+            has_followers_campaign indicando se alguma campanha com entrega no
+            período tem "seguidor" no nome; vazio se a conta não teve entrega
         """
         
         if not self.validate_date_range(start_date, end_date):
-            raise ValueError("Período inválido. Máximo de 90 dias e datas válidas.")
-        
-        # Campos baseados no CSV fornecido
-        fields = [
-            'account_id',
-            'campaign_id', 
-            'campaign_name',
-            'date_start',
-            'reach',
-            'impressions',
-            'spend',
-            'inline_link_clicks',
-            'actions',  # Para capturar conversões
-            'cost_per_action_type'
-        ]
+            raise ValueError("Período inválido. Verifique as datas informadas.")
+        
+        url = f"{self.base_url}/{account_id}/insights"
+        params = self._build_insights_params(start_date, end_date, 1, level='account', time_increment='all_days')
+        
+        # Só o nome de uma campanha de seguidores com entrega no período (mesma regra do formatador)
+        followers_params = {
+            'fields': 'campaign_name',
+            'time_range': params['time_range'],
+            'time_increment': 'all_days',
+            'level': 'campaign',
+            'filtering': json.dumps([{'field': 'campaign.name', 'operator': 'CONTAIN', 'value': 'seguidor'}]),
+            'access_token': self.access_token,
+            'limit': 1
+        }
+        
+        try:
+            response = self._request('GET', url, account_id, params=params)
+            response.raise_for_status()
+            rows = response.json().get('data', [])
+            if not rows:
+                print(f"Facebook API: conta {account_id} sem entrega no período")
+                return {}
+            
+            response = self._request('GET', url, account_id, params=followers_params)
+            response.raise_for_status()
+            has_followers_campaign = bool(response.json().get('data'))
+            
+        except requests.exceptions.RequestException as e:
+            print(f"Erro na API do Facebook: {e}")
+            raise Exception(f"Erro ao buscar dados do Facebook: {str(e)}")
+        
+        summary = self._process_campaign_data(rows[0])
+        summary['has_followers_campaign'] = has_followers_campaign
+        print(f"Facebook API: resumo da conta {account_id} ({start_date} a {end_date})")
+        return summary
+    
+    def iter_campaigns_report(self, account_id: str, start_date: str, end_date: str,
+                              page_size: int = 1000, chunks: bool = False,
+                              use_async: Optional[bool] = None,
+                              skip_zero_impressions: bool = False) -> Iterator:
+        """
+        Lê em streaming o relatório de campanhas do Facebook
+        
+        Segue paging.next sob demanda: cada página só é pedida à API quando a
+        anterior foi consumida, então contas grandes não são truncadas na
+        primeira página e a memória fica limitada a uma página.
+        
+        Períodos longos (a partir de async_min_days) usam um relatório
+        assíncrono (async=true), que não sofre timeout no servidor. Um pedido
+        síncrono que falhe por excesso de dados também é refeito como assíncrono.
+        
+        Períodos maiores que chunk_days são divididos em blocos buscados em
+        paralelo (até max_parallel_chunks ao mesmo tempo); as linhas saem na
+        ordem cronológica dos blocos, e o modo assíncrono é decidido por bloco.
+        Nesse caso cada bloco é lido por inteiro antes de ser gerado, então a
+        memória fica limitada a max_parallel_chunks blocos.
+        
+        Com o cache de relatórios ligado, os dias já em cache (ver
+        report_cache) não são pedidos à API; os trechos buscados são guardados
+        bloco a bloco (chunk_days), assim que cada bloco termina.
+        
+        Args:
+            account_id: ID da conta Facebook (formato: act_123456789)
+            start_date: Data início (YYYY-MM-DD)
+            end_date: Data fim (YYYY-MM-DD)
+            page_size: Linhas pedidas por página
+            chunks: Se True, gera listas (uma por página) em vez de linhas
+            use_async: Força (True) ou desliga (False) o modo assíncrono;
+                       None decide pelo tamanho do período (de cada bloco)
+            skip_zero_impressions: Se True, filtra na API (filtering) as linhas
+                                   campanha x dia sem impressões (campanhas paradas)
+            
+        Yields:
+            Dict (ou List[Dict] se chunks=True) no formato do CSV
+        """
+        
+        if not self.validate_date_range(start_date, end_date):
+            raise ValueError("Período inválido. Verifique as datas informadas.")
+        
+        if self.cache:
+            return self._iter_cached_report(account_id, start_date, end_date, page_size, chunks, use_async,
+                                            skip_zero_impressions)
+        return self._iter_report_range(account_id, start_date, end_date, page_size, chunks, use_async,
+                                       skip_zero_impressions)
+    
+    def _iter_cached_report(self, account_id: str, start_date: str, end_date: str, page_size: int,
+                            chunks: bool, use_async: Optional[bool], skip_zero_impressions: bool) -> Iterator:
+        """Gera os dias em cache e busca na API (guardando no cache) só os que faltam"""
+        # Linhas filtradas e completas ficam em entradas separadas do cache
+        platform_key = cache_key('facebook:active' if skip_zero_impressions else 'facebook',
+                                 FB_INSIGHTS_FIELDS, sorted(self.action_columns.items()), FB_CACHE_VERSION)
+        
+        def store_chunk(chunk_start, chunk_end, rows):
+            self.cache.store(platform_key, account_id, chunk_start, chunk_end, rows, 'date_start')
+        
+        cached_days = fetched_days = 0
+        for segment_start, segment_end, rows in self.cache.plan(platform_key, account_id, start_date, end_date):
+            days = (datetime.strptime(segment_end, '%Y-%m-%d') - datetime.strptime(segment_start, '%Y-%m-%d')).days + 1
+            if rows is not None:
+                cached_days += days
+                if rows:
+                    if chunks:
+                        yield rows
+                    else:
+                        yield from rows
+                continue
+            
+            for page in self._iter_report_range(account_id, segment_start, segment_end, page_size, True,
+                                                use_async, skip_zero_impressions, on_chunk=store_chunk):
+                if chunks:
+                    yield page
+                else:
+                    yield from page
+            fetched_days += days
+        
+        print(f"[CACHE] Facebook {account_id}: {cached_days} dias do cache, {fetched_days} da API")
+    
+    def _iter_report_range(self, account_id: str, start_date: str, end_date: str, page_size: int,
+                           chunks: bool, use_async: Optional[bool], skip_zero_impressions: bool,
+                           on_chunk: Optional[Callable] = None) -> Iterator:
+        """
+        Busca o período na API, dividido em blocos paralelos se for longo
+        
+        on_chunk(início, fim, linhas) é chamado ao final de cada bloco (usado
+        para guardar no cache sem acumular o trecho inteiro)
+        """
+        date_chunks = split_date_range(start_date, end_date, self.chunk_days)
+        if len(date_chunks) == 1:
+            pages = self._iter_insights_pages(account_id, start_date, end_date, page_size,
+                                              chunks or on_chunk is not None,
+                                              self._use_async(start_date, end_date, use_async),
+                                              skip_zero_impressions)
+            if on_chunk is None:
+                return pages
+            return self._iter_notify_chunk(pages, start_date, end_date, chunks, on_chunk)
+        
+        return self._iter_chunked_report(account_id, date_chunks, page_size, chunks, use_async,
+                                         skip_zero_impressions, on_chunk)
+    
+    @staticmethod
+    def _iter_notify_chunk(pages: Iterator, start_date: str, end_date: str, chunks: bool,
+                           on_chunk: Callable) -> Iterator:
+        """
+        Repassa as páginas de um bloco e chama on_chunk com as linhas ao final
+        
+        on_chunk recebe cópias: quem consome o stream (ex.: save_campaign_data)
+        pode alterar as linhas antes de o bloco terminar.
+        """
+        rows = []
+        for page in pages:
+            rows.extend(dict(row) for row in page)
+            if chunks:
+                yield page
+            else:
+                yield from page
+        on_chunk(start_date, end_date, rows)
+    
+    def _use_async(self, start_date: str, end_date: str, use_async: Optional[bool]) -> bool:
+        """Decide o modo assíncrono pelo tamanho do período quando não foi forçado"""
+        if use_async is not None:
+            return use_async
+        days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+        return days >= self.async_min_days
+    
+    def _iter_chunked_report(self, account_id: str, date_chunks: List[Tuple[str, str]], page_size: int,
+                             chunks: bool, use_async: Optional[bool], skip_zero_impressions: bool,
+                             on_chunk: Optional[Callable] = None) -> Iterator:
+        """Busca os blocos do período em paralelo e gera as linhas na ordem dos blocos"""
+        print(f"[DEBUG] Facebook {account_id}: período dividido em {len(date_chunks)} blocos "
+              f"de até {self.chunk_days} dias ({self.max_parallel_chunks} em paralelo)")
+        
+        def fetch_chunk(date_chunk):
+            chunk_start, chunk_end = date_chunk
+            return list(self._iter_insights_pages(account_id, chunk_start, chunk_end, page_size, True,
+                                                  self._use_async(chunk_start, chunk_end, use_async),
+                                                  skip_zero_impressions))
+        
+        for date_chunk, pages in zip(date_chunks, iter_parallel(fetch_chunk, date_chunks,
+                                                                self.max_parallel_chunks)):
+            # Cópia para o cache antes de entregar as linhas (o consumidor pode alterá-las)
+            cached = [dict(row) for page in pages for row in page] if on_chunk else None
+            for page in pages:
+                if chunks:
+                    yield page
+                else:
+                    yield from page
+            if on_chunk:
+                on_chunk(*date_chunk, cached)
+    
+    def _iter_insights_pages(self, account_id: str, start_date: str, end_date: str, page_size: int,
+                             chunks: bool, use_async: bool, skip_zero_impressions: bool = False) -> Iterator:
+        """Gerador de iter_campaigns_report (separado para que a validação do período seja imediata)"""
+        params = self._build_insights_params(start_date, end_date, page_size,
+                                             skip_zero_impressions=skip_zero_impressions)
+        
+        try:
+            if use_async:
+                url, page_params = self._run_async_report(account_id, params, page_size)
+            else:
+                url, page_params = f"{self.base_url}/{account_id}/insights", params
+            
+            pages = 0
+            while url:
+                try:
+                    # A primeira página síncrona não é repetida: se falhar por volume,
+                    # o relatório assíncrono abaixo é mais rápido que insistir
+                    response = self._request('GET', url, account_id, params=page_params,
+                                             retry_reads=use_async or pages > 0)
+                    response.raise_for_status()
+                except requests.exceptions.RequestException as e:
+                    # Pedido síncrono grande demais: refaz como relatório assíncrono
+                    if not use_async and pages == 0 and self._is_too_much_data_error(e):
+                        print(f"Facebook API: pedido síncrono falhou para {account_id} ({e}); "
+                              f"usando relatório assíncrono")
+                        use_async = True
+                        url, page_params = self._run_async_report(account_id, params, page_size)
+                        continue
+                    raise
+                
+                data = response.json()
+                campaigns = [self._process_campaign_data(item) for item in data.get('data', [])]
+                pages += 1
+                
+                if campaigns:
+                    if chunks:
+                        yield campaigns
+                    else:
+                        yield from campaigns
+                
+                # A URL de paging.next já traz todos os parâmetros (inclusive o cursor)
+                url = data.get('paging', {}).get('next')
+                page_params = None
+            
+            if pages > 1:
+                print(f"Facebook API: {pages} páginas lidas para a conta {account_id}")
+            
+        except requests.exceptions.RequestException as e:
+            print(f"Erro na API do Facebook: {e}")
+            raise Exception(f"Erro ao buscar dados do Facebook: {str(e)}")
+    
+    def _request(self, method: str, url: str, account_id: Optional[str] = None,
+                 retry_reads: bool = True, **kwargs) -> requests.Response:
+        """
+        Faz uma chamada à Graph API respeitando o throttler
+        
+        Espera se a conta/app estiver perto do limite, registra os cabeçalhos
+        de uso da resposta e, em erro de limite (códigos 4, 17, 613, 800xx...),
+        pausa a conta antes de levantar o erro normalmente via raise_for_status.
+        Com retry_reads=False usa a sessão que não repete timeouts nem 429/5xx.
+        """
+        self.throttler.wait(account_id)
+        session = self.http_session if retry_reads else self.fail_fast_session
+        response = session.request(method, url, timeout=self.request_timeout, **kwargs)
+        self.throttler.record(account_id, response.headers)
+        
+        if response.status_code >= 400:
+            try:
+                self.throttler.record_throttle_error(account_id, response.json().get('error'))
+            except ValueError:
+                pass
+        return response
+    
+    @staticmethod
+    def _is_too_much_data_error(error: requests.exceptions.RequestException) -> bool:
+        """
+        Indica se o erro do pedido síncrono é de volume (timeout ou o erro
+        "Please reduce the amount of data" da Graph API, código 1)
+        """
+        if isinstance(error, requests.exceptions.Timeout):
+            return True
+        # Timeout de leitura depois de esgotar as novas tentativas da sessão:
+        # ConnectionError(MaxRetryError(reason=ReadTimeoutError))
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        if isinstance(reason, urllib3.exceptions.TimeoutError):
+            return True
+        response = getattr(error, 'response', None)
+        if response is None:
+            return False
+        try:
+            fb_error = response.json().get('error', {})
+        except ValueError:
+            return False
+        return fb_error.get('code') == 1 or 'reduce the amount of data' in str(fb_error.get('message', ''))
+    
+    def _run_async_report(self, account_id: str, params: Dict, page_size: int):
+        """
+        Cria um relatório assíncrono de insights, espera terminar e devolve
+        (url, params) da primeira página do resultado
+        """
+        url = f"{self.base_url}/{account_id}/insights"
+        response = self._request('POST', url, account_id, data=params)
+        response.raise_for_status()
+        report_run_id = response.json().get('report_run_id')
+        if not report_run_id:
+            raise Exception(f"Facebook API não devolveu report_run_id para {account_id}: {response.text}")
+        
+        print(f"Facebook API: relatório assíncrono {report_run_id} criado para {account_id}")
+        self._wait_async_report(report_run_id, account_id)
+        
+        return f"{self.base_url}/{report_run_id}/insights", {
+            'access_token': self.access_token,
+            'limit': page_size
+        }
+    
+    def _wait_async_report(self, report_run_id: str, account_id: str = None):
+        """
+        Consulta async_status com backoff exponencial até o relatório terminar
+        
+        O relatório só é considerado pronto com async_status 'Job Completed' e
+        async_percent_completion 100, como recomenda a documentação da Graph API.
+        
+        Raises:
+            Exception: se o relatório falhar ou exceder async_timeout
+        """
+        started = time.monotonic()
+        interval = 1.0
+        
+        while True:
+            response = self._request('GET', f"{self.base_url}/{report_run_id}", account_id, params={
+                'fields': 'async_status,async_percent_completion',
+                'access_token': self.access_token
+            })
+            response.raise_for_status()
+            
+            job = response.json()
+            status = job.get('async_status')
+            if status == 'Job Completed' and int(job.get('async_percent_completion') or 0) >= 100:
+                print(f"Facebook API: relatório {report_run_id} concluído em "
+                      f"{time.monotonic() - started:.0f}s")
+                return
+            if status in ('Job Failed', 'Job Skipped'):
+                raise Exception(f"Relatório assíncrono {report_run_id} terminou com status '{status}'")
+            
+            elapsed = time.monotonic() - started
+            if elapsed >= self.async_timeout:
+                raise Exception(f"Relatório assíncrono {report_run_id} não terminou em "
+                                f"{self.async_timeout:.0f}s ({job.get('async_percent_completion', 0)}%)")
+            
+            time.sleep(min(interval, self.async_timeout - elapsed))
+            interval = min(interval * 2, self.async_max_poll_interval)
+    
+    def _build_insights_params(self, start_date: str, end_date: str, page_size: int,
+                               level: str = 'campaign', time_increment=1,
+                               skip_zero_impressions: bool = False) -> Dict:
+        """
+        Monta os parâmetros do pedido de insights
+        
+        O padrão é por campanha e por dia; get_account_summary usa
+        level='account' e time_increment='all_days' (uma linha para o período).
+        Com skip_zero_impressions, o filtro impressions > 0 é aplicado na API.
+        """
+        
+        fields = list(FB_INSIGHTS_FIELDS)
+        if level != 'campaign':
+            fields = [field for field in fields if not field.startswith('campaign_')]
         
         # Ações específicas que queremos capturar
         action_breakdowns = [
@@ -78,30 +523,114 @@ class FacebookAPI:
         params = {
             'fields': ','.join(fields),
             'time_range': f'{{"since":"{start_date}","until":"{end_date}"}}',
-            'time_increment': 1,  # Daily breakdown
+            'time_increment': time_increment,  # 1 = Daily breakdown
             'access_token': self.access_token,
-            'level': 'campaign',
-            'limit': 1000
+            'level': level,
+            'limit': page_size
         }
+        if skip_zero_impressions:
+            params['filtering'] = json.dumps([{'field': 'impressions', 'operator': 'GREATER_THAN', 'value': 0}])
+        return params
+    
+    def fits_batch(self, start_date: str, end_date: str) -> bool:
+        """
+        Indica se o período cabe em um pedido síncrono do batch
         
-        try:
-            url = f"{self.base_url}/{account_id}/insights"
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            campaigns = []
+        Períodos que usariam relatório assíncrono ou blocos paralelos (ver
+        iter_campaigns_report) devem ser lidos em streaming, não pelo batch.
+        """
+        days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+        return days <= self.chunk_days and not self._use_async(start_date, end_date, None)
+    
+    def get_campaigns_reports_batch(self, date_ranges: Dict[str, Tuple[str, str]],
+                                    page_size: int = 1000,
+                                    skip_zero_impressions: bool = False) -> Dict[str, Dict]:
+        """
+        Busca o relatório de campanhas de várias contas com chamadas batch da Graph API
+        
+        Junta até batch_limit (50) pedidos de insights por requisição HTTP e
+        separa as respostas por conta. Se o resultado de uma conta tiver mais
+        de uma página, as páginas seguintes são lidas via paging.next.
+        
+        Args:
+            date_ranges: Mapa account_id -> (data início, data fim)
+            page_size: Linhas pedidas por página
+            skip_zero_impressions: Se True, a API omite linhas sem impressões
             
-            if 'data' in data:
-                for item in data['data']:
-                    campaign = self._process_campaign_data(item)
-                    campaigns.append(campaign)
+        Returns:
+            Dict[str, Dict]: account_id -> {'data': List[Dict], 'error': Optional[str]};
+            um erro em uma conta não afeta as demais
+        """
+        results = {}
+        pending = []
+        for account_id, (start_date, end_date) in date_ranges.items():
+            if not self.validate_date_range(start_date, end_date):
+                results[account_id] = {'data': [], 'error': "Período inválido. Verifique as datas informadas."}
+                continue
+            pending.append((account_id, self._build_insights_params(start_date, end_date, page_size,
+                                                                    skip_zero_impressions=skip_zero_impressions)))
+        
+        for offset in range(0, len(pending), self.batch_limit):
+            group = pending[offset:offset + self.batch_limit]
+            batch = []
+            for account_id, params in group:
+                query = {key: value for key, value in params.items() if key != 'access_token'}
+                batch.append({'method': 'GET', 'relative_url': f"{account_id}/insights?{urlencode(query)}"})
             
-            return campaigns
+            try:
+                response = self._request('POST', self.base_url, None, data={
+                    'access_token': self.access_token,
+                    'batch': json.dumps(batch)
+                })
+                response.raise_for_status()
+                responses = response.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Erro na chamada batch da API do Facebook: {e}")
+                for account_id, _ in group:
+                    results[account_id] = {'data': [], 'error': f"Erro ao buscar dados do Facebook: {str(e)}"}
+                continue
             
+            print(f"Facebook API: batch com {len(group)} contas")
+            for (account_id, _), item in zip(group, responses):
+                results[account_id] = self._read_batch_item(account_id, item)
+        
+        return results
+    
+    def _read_batch_item(self, account_id: str, item: Optional[Dict]) -> Dict:
+        """Converte a resposta de um pedido do batch em {'data': [...], 'error': ...}"""
+        if item is None:
+            # A Graph API devolve null para pedidos que não terminaram a tempo
+            return {'data': [], 'error': "Pedido não concluído no batch (timeout)"}
+        
+        try:
+            body = json.loads(item.get('body') or '{}')
+        except ValueError:
+            body = {}
+        
+        # Cada item do batch traz seus próprios cabeçalhos de uso
+        self.throttler.record(account_id, {header.get('name'): header.get('value')
+                                           for header in item.get('headers') or []})
+        
+        if item.get('code') != 200:
+            self.throttler.record_throttle_error(account_id, body.get('error'))
+            message = body.get('error', {}).get('message') or f"HTTP {item.get('code')}"
+            print(f"Erro na API do Facebook (batch) para {account_id}: {message}")
+            return {'data': [], 'error': f"Erro ao buscar dados do Facebook: {message}"}
+        
+        campaigns = [self._process_campaign_data(row) for row in body.get('data', [])]
+        next_url = body.get('paging', {}).get('next')
+        try:
+            while next_url:
+                response = self._request('GET', next_url, account_id)
+                response.raise_for_status()
+                page = response.json()
+                campaigns.extend(self._process_campaign_data(row) for row in page.get('data', []))
+                next_url = page.get('paging', {}).get('next')
         except requests.exceptions.RequestException as e:
-            print(f"Erro na API do Facebook: {e}")
-            raise Exception(f"Erro ao buscar dados do Facebook: {str(e)}")
+            print(f"Erro na API do Facebook para {account_id}: {e}")
+            return {'data': [], 'error': f"Erro ao buscar dados do Facebook: {str(e)}"}
+        
+        return {'data': campaigns, 'error': None}
     
     def _process_campaign_data(self, raw_data: Dict) -> Dict:
         """
@@ -116,46 +645,16 @@ class FacebookAPI:
             'impressions': int(raw_data.get('impressions', 0)),
             'spend': float(raw_data.get('spend', 0)),
             'inline_link_clicks': int(raw_data.get('inline_link_clicks', 0)),
-            'link_click': 0,
-            'landing_page_view': 0,
-            'offsite_conversion_fb_pixel_add_to_cart': 0,
-            'offsite_conversion_fb_pixel_initiate_checkout': 0,
-            'offsite_conversion_fb_pixel_lead': 0,
-            'onsite_conversion_messaging_conversation_started_7d': 0,
-            'offsite_conversion_fb_pixel_purchase': 0,
-            'offsite_conversion_fb_pixel_custom': 0,
-            'offsite_conversion_fb_pixel_complete_registration': 0,
-            'onsite_conversion_lead_grouped': 0,
-            'id': raw_data.get('campaign_id', '')
         }
+        # Colunas de ações zeradas, preenchidas abaixo em uma passada pelas ações
+        campaign.update(self._action_defaults)
+        campaign['id'] = raw_data.get('campaign_id', '')
         
-        # Processa ações (conversões)
-        if 'actions' in raw_data:
-            for action in raw_data['actions']:
-                action_type = action.get('action_type', '')
-                value = int(float(action.get('value', 0)))
-                
-                # Mapeia ações para campos do CSV
-                if action_type == 'link_click':
-                    campaign['link_click'] = value
-                elif action_type == 'landing_page_view':
-                    campaign['landing_page_view'] = value
-                elif action_type == 'offsite_conversion.fb_pixel_add_to_cart':
-                    campaign['offsite_conversion_fb_pixel_add_to_cart'] = value
-                elif action_type == 'offsite_conversion.fb_pixel_initiate_checkout':
-                    campaign['offsite_conversion_fb_pixel_initiate_checkout'] = value
-                elif action_type == 'offsite_conversion.fb_pixel_lead':
-                    campaign['offsite_conversion_fb_pixel_lead'] = value
-                elif action_type == 'onsite_conversion.messaging_conversation_started_7d':
-                    campaign['onsite_conversion_messaging_conversation_started_7d'] = value
-                elif action_type == 'offsite_conversion.fb_pixel_purchase':
-                    campaign['offsite_conversion_fb_pixel_purchase'] = value
-                elif action_type == 'offsite_conversion.fb_pixel_custom':
-                    campaign['offsite_conversion_fb_pixel_custom'] = value
-                elif action_type == 'offsite_conversion.fb_pixel_complete_registration':
-                    campaign['offsite_conversion_fb_pixel_complete_registration'] = value
-                elif action_type == 'onsite_conversion.lead_grouped':
-                    campaign['onsite_conversion_lead_grouped'] = value
+        action_columns = self.action_columns
+        for action in raw_data.get('actions') or ():
+            column = action_columns.get(action.get('action_type'))
+            if column is not None:
+                campaign[column] = int(float(action.get('value', 0)))
         
         return campaign
     
@@ -167,7 +666,7 @@ class FacebookAPI:
             url = f"{self.base_url}/me"
             params = {'access_token': self.access_token}
             
-            response = requests.get(url, params=params)
+            response = self.http_session.get(url, params=params)
             return response.status_code == 200
         except:
             return False
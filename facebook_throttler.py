@@ -0,0 +1,228 @@
+"""
+Controle de ritmo das chamadas à Graph API do Facebook
+
+Lê os cabeçalhos de uso devolvidos pela API (X-Business-Use-Case-Usage,
+X-Ad-Account-Usage, X-App-Usage e X-FB-Ads-Insights-Throttle) e, antes de cada
+nova chamada, desacelera ou pausa as requisições da conta/app que estão perto
+do limite, em vez de insistir até receber os erros de throttling (códigos
+4, 17, 32, 613, 80000-80014).
+
+Configuração por variáveis de ambiente:
+
+    FACEBOOK_USAGE_SLOW_PCT    uso (%) a partir do qual as chamadas são espaçadas (padrão: 75)
+    FACEBOOK_USAGE_PAUSE_PCT   uso (%) a partir do qual a conta é pausada (padrão: 95)
+    FACEBOOK_MAX_DELAY         espera máxima entre chamadas ao desacelerar, em segundos (padrão: 10)
+    FACEBOOK_PAUSE_SECONDS     pausa padrão ao atingir o limite, em segundos (padrão: 60)
+    FACEBOOK_USAGE_TTL         validade da última leitura de uso, em segundos (padrão: 300)
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Códigos de erro da Graph API que indicam limite de uso atingido
+THROTTLE_ERROR_CODES = {4, 17, 32, 613} | set(range(80000, 80015))
+
+# Chave usada para o uso do app como um todo (não ligado a uma conta)
+APP_KEY = '__app__'
+
+class FacebookThrottler:
+    def __init__(self):
+        self.slow_pct = float(os.getenv('FACEBOOK_USAGE_SLOW_PCT', 75))
+        self.pause_pct = float(os.getenv('FACEBOOK_USAGE_PAUSE_PCT', 95))
+        self.max_delay = float(os.getenv('FACEBOOK_MAX_DELAY', 10))
+        self.pause_seconds = float(os.getenv('FACEBOOK_PAUSE_SECONDS', 60))
+        self.usage_ttl = float(os.getenv('FACEBOOK_USAGE_TTL', 300))
+        self._lock = threading.Lock()
+        # chave -> {'pct': float, 'regain_at': float (monotonic), 'updated_at': float, 'details': dict}
+        self._usage = {}
+
+    @staticmethod
+    def _account_key(account_id) -> str:
+        """Normaliza o ID da conta (com ou sem prefixo act_)"""
+        account_id = str(account_id or '').strip()
+        return account_id[4:] if account_id.startswith('act_') else account_id
+
+    @staticmethod
+    def _parse_header(headers, name: str):
+        value = headers.get(name) if headers else None
+        if not value:
+            return None
+        try:
+            return json.loads(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _store(self, key: str, pct: float, regain_seconds: float, details: Dict):
+        now = time.monotonic()
+        entry = self._usage.setdefault(key, {'pct': 0.0, 'regain_at': 0.0, 'updated_at': now, 'details': {}})
+        entry['pct'] = pct
+        entry['updated_at'] = now
+        entry['details'] = details
+        if regain_seconds > 0:
+            entry['regain_at'] = max(entry['regain_at'], now + regain_seconds)
+
+    def record(self, account_id, headers):
+        """
+        Atualiza o uso a partir dos cabeçalhos de uma resposta da Graph API
+
+        Args:
+            account_id: Conta da requisição (act_123 ou 123); None para chamadas sem conta
+            headers: Cabeçalhos da resposta (dict-like, sem diferenciar maiúsculas)
+        """
+        account_usage = self._parse_header(headers, 'X-Ad-Account-Usage')
+        insights_usage = self._parse_header(headers, 'X-FB-Ads-Insights-Throttle')
+        business_usage = self._parse_header(headers, 'X-Business-Use-Case-Usage')
+        app_usage = self._parse_header(headers, 'X-App-Usage')
+
+        with self._lock:
+            if account_id:
+                pcts = [0.0]
+                regain = 0.0
+                details = {}
+                if account_usage:
+                    details['ad_account'] = account_usage
+                    account_pct = float(account_usage.get('acc_id_util_pct') or 0)
+                    pcts.append(account_pct)
+                    # reset_time_duration (segundos até zerar o uso) só importa perto do limite
+                    if account_pct >= self.pause_pct:
+                        regain = max(regain, float(account_usage.get('reset_time_duration') or 0))
+                if insights_usage:
+                    details['insights'] = insights_usage
+                    pcts.append(float(insights_usage.get('acc_id_util_pct') or 0))
+                if business_usage:
+                    details['business_use_case'] = business_usage
+                    for entries in business_usage.values():
+                        for entry in entries or []:
+                            pcts.extend(float(entry.get(field) or 0)
+                                        for field in ('call_count', 'total_cputime', 'total_time'))
+                            # estimated_time_to_regain_access vem em minutos
+                            regain = max(regain, float(entry.get('estimated_time_to_regain_access') or 0) * 60)
+                if details:
+                    self._store(self._account_key(account_id), max(pcts), regain, details)
+
+            app_pcts = []
+            if app_usage:
+                app_pcts.extend(float(app_usage.get(field) or 0)
+                                for field in ('call_count', 'total_cputime', 'total_time'))
+            if insights_usage:
+                app_pcts.append(float(insights_usage.get('app_id_util_pct') or 0))
+            if app_pcts:
+                self._store(APP_KEY, max(app_pcts), 0, {'app': app_usage, 'insights': insights_usage})
+
+    def record_throttle_error(self, account_id, error: Optional[Dict]) -> bool:
+        """
+        Registra um erro de limite de uso devolvido pela API, pausando a conta
+
+        Args:
+            account_id: Conta da requisição
+            error: Objeto 'error' do corpo da resposta
+
+        Returns:
+            bool: True se o erro era de throttling
+        """
+        if not error or error.get('code') not in THROTTLE_ERROR_CODES:
+            return False
+
+        # Códigos 4/17 de app e conta: sem conta, pausa o app inteiro
+        key = self._account_key(account_id) if account_id and error.get('code') != 4 else APP_KEY
+        with self._lock:
+            # Depois da pausa as chamadas seguem espaçadas até chegar um novo cabeçalho de uso
+            self._store(key, self.slow_pct, self.pause_seconds, {'error': error})
+        print(f"[WARNING] Limite de uso do Facebook atingido ({key}): código {error.get('code')} - "
+              f"pausando {self.pause_seconds:.0f}s")
+        return True
+
+    def _entry_pct(self, key: str, now: float) -> float:
+        entry = self._usage.get(key)
+        if not entry or now - entry['updated_at'] > self.usage_ttl:
+            return 0.0
+        return entry['pct']
+
+    def usage_pct(self, account_id=None) -> float:
+        """Uso atual (%) da conta, considerando também o uso do app"""
+        now = time.monotonic()
+        with self._lock:
+            pct = self._entry_pct(APP_KEY, now)
+            if account_id:
+                pct = max(pct, self._entry_pct(self._account_key(account_id), now))
+            return pct
+
+    def get_usage(self) -> Dict[str, Dict]:
+        """
+        Retrato do uso conhecido por conta (e do app, em '__app__')
+
+        Returns:
+            Dict[str, Dict]: chave -> {'pct', 'paused_seconds', 'age_seconds', 'details'}
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    'pct': entry['pct'],
+                    'paused_seconds': max(0.0, entry['regain_at'] - now),
+                    'age_seconds': now - entry['updated_at'],
+                    'details': entry['details'],
+                }
+                for key, entry in self._usage.items()
+            }
+
+    def order_accounts(self, items: Iterable, key: Optional[Callable] = None) -> List:
+        """
+        Ordena as contas da menos para a mais usada (contas pausadas por último)
+
+        Args:
+            items: IDs de conta, ou objetos dos quais key extrai o ID (ex.: clientes)
+            key: Função que devolve o ID da conta de cada item
+        """
+        now = time.monotonic()
+        with self._lock:
+            def sort_key(item):
+                account_key = self._account_key(key(item) if key else item)
+                entry = self._usage.get(account_key) or {}
+                return (entry.get('regain_at', 0.0) > now, self._entry_pct(account_key, now))
+            return sorted(items, key=sort_key)
+
+    def delay_for(self, account_id=None) -> float:
+        """Quantos segundos esperar antes da próxima chamada da conta"""
+        now = time.monotonic()
+        with self._lock:
+            keys = [APP_KEY] + ([self._account_key(account_id)] if account_id else [])
+            regain_at = max((self._usage[key]['regain_at'] for key in keys if key in self._usage), default=0.0)
+            if regain_at > now:
+                return regain_at - now
+
+            pct = max(self._entry_pct(key, now) for key in keys)
+        if pct >= self.pause_pct:
+            return self.pause_seconds
+        if pct >= self.slow_pct:
+            return self.max_delay * (pct - self.slow_pct) / max(self.pause_pct - self.slow_pct, 1)
+        return 0.0
+
+    def wait(self, account_id=None):
+        """Espera o tempo necessário antes de chamar a API para a conta"""
+        delay = self.delay_for(account_id)
+        if delay > 0:
+            print(f"[DEBUG] Uso da API do Facebook alto ({self.usage_pct(account_id):.0f}%) - "
+                  f"aguardando {delay:.1f}s ({account_id or 'app'})")
+            time.sleep(delay)
+
+
+_throttler = None
+_throttler_lock = threading.Lock()
+
+def get_facebook_throttler() -> FacebookThrottler:
+    """
+    Retorna o throttler compartilhado pelo processo
+
+    Os limites da Graph API são por app e por conta, então todas as instâncias
+    de FacebookAPI precisam enxergar o mesmo uso.
+    """
+    global _throttler
+    if _throttler is None:
+        with _throttler_lock:
+            if _throttler is None:
+                _throttler = FacebookThrottler()
+    return _throttler
@@ -1,16 +1,58 @@
 import os
 import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from dotenv import load_dotenv
 from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
+from report_chunks import split_date_range, iter_parallel
+from report_cache import cache_key, get_report_cache
+from google_ads_client_pool import GoogleAdsClientPool
 
 load_dotenv()
 
+# Colunas das linhas processadas (_process_campaign_data) e versão do
+# processamento; definem a chave do cache de relatórios
+GOOGLE_ADS_REPORT_FIELDS = (
+    'campaign_id', 'nome_campanha', 'dia', 'clicks', 'conversions', 'conversions_value',
+    'ctr', 'average_cpc', 'impressions', 'cost', 'customer_id',
+)
+GOOGLE_ADS_CACHE_VERSION = 1
+
+# Máximo de linhas aceito pelo change_status em uma consulta
+CHANGE_STATUS_LIMIT = 10000
+
+# Ritmo das consultas, compartilhado por todas as instâncias do processo
+# (a cota de requisições é do developer token, não do cliente)
+_request_slot_lock = threading.Lock()
+_next_request_at = 0.0
+
+def _wait_request_slot(max_qps: float):
+    """Espaça as consultas para no máximo max_qps por segundo no processo"""
+    global _next_request_at
+    if max_qps <= 0:
+        return
+    with _request_slot_lock:
+        now = time.monotonic()
+        wait = _next_request_at - now
+        _next_request_at = max(now, _next_request_at) + 1.0 / max_qps
+    if wait > 0:
+        time.sleep(wait)
+
 class GoogleAdsAPI:
-    def __init__(self):
-        """Inicializa API do Google Ads"""
+    def __init__(self, client: Optional[GoogleAdsClient] = None,
+                 client_pool: Optional[GoogleAdsClientPool] = None):
+        """
+        Inicializa API do Google Ads
+        
+        Args:
+            client: Cliente já criado (ex.: do pool por usuário); se omitido,
+                    usa as credenciais do .env
+            client_pool: Pool de clientes por usuário usado por for_user
+        """
         # Configurações da API do Google Ads
         self.developer_token = os.getenv("GOOGLE_ADS_DEVELOPER_TOKEN")
         self.client_id = os.getenv("GOOGLE_ADS_CLIENT_ID")
@@ -18,8 +60,28 @@ class GoogleAdsAPI:
         self.refresh_token = os.getenv("GOOGLE_ADS_REFRESH_TOKEN")
         self.login_customer_id = os.getenv("GOOGLE_ADS_LOGIN_CUSTOMER_ID")
         
+        # Períodos longos são divididos em blocos de chunk_days dias, buscados em paralelo
+        self.chunk_days = int(os.getenv("GOOGLE_ADS_CHUNK_DAYS", 30))
+        self.max_parallel_chunks = int(os.getenv("GOOGLE_ADS_MAX_PARALLEL_CHUNKS", 4))
+        # Cache em disco dos dias já buscados (None se REPORT_CACHE_ENABLED=false)
+        self.cache = get_report_cache()
+        # Vários clientes consultados em paralelo (get_campaigns_reports_batch)
+        self.max_parallel_customers = int(os.getenv("GOOGLE_ADS_MAX_PARALLEL_CUSTOMERS", 8))
+        # Limite de consultas por segundo e novas tentativas em erro de cota (RESOURCE_EXHAUSTED)
+        self.max_qps = float(os.getenv("GOOGLE_ADS_MAX_QPS", 10))
+        self.quota_retries = int(os.getenv("GOOGLE_ADS_QUOTA_RETRIES", 3))
+        self.quota_max_wait = float(os.getenv("GOOGLE_ADS_QUOTA_MAX_WAIT", 60))
+        # Lê as linhas dos relatórios direto do protobuf, sem os wrappers proto-plus
+        self.raw_protobuf = os.getenv("GOOGLE_ADS_RAW_PROTOBUF", "false").lower() == "true"
+        
+        self.client_pool = client_pool
+        
         # Inicializa cliente do Google Ads (pode ser None se token expirado)
-        self.client = self._initialize_client()
+        self.client = client if client is not None else self._initialize_client()
+        # GoogleAdsService (e seu canal gRPC) reutilizado por todas as consultas
+        self._ga_service = None
+        self._ga_service_pid = None
+        self._ga_service_lock = threading.Lock()
     
     def _initialize_client(self) -> Optional[GoogleAdsClient]:
         """
@@ -56,18 +118,52 @@ class GoogleAdsAPI:
         if not self.client:
             raise Exception("Cliente Google Ads não está disponível. Token expirado ou credenciais inválidas.")
     
+    def for_user(self, user_id: Optional[str], login_customer_id: Optional[str] = None) -> 'GoogleAdsAPI':
+        """
+        Instância que consulta com as credenciais OAuth do usuário
+        
+        A instância (e seu GoogleAdsService) fica guardada no pool junto com o
+        GoogleAdsClient do usuário, então requisições seguidas reutilizam o
+        mesmo canal gRPC. Sem login_customer_id, usa o do .env
+        (GOOGLE_ADS_LOGIN_CUSTOMER_ID), para que contas acessadas via MCC
+        continuem funcionando. Sem pool, sem usuário ou sem token salvo,
+        devolve esta instância (credenciais do .env).
+        """
+        if self.client_pool is None or not user_id:
+            return self
+        login_customer_id = login_customer_id or (self.login_customer_id or '').strip() or None
+        user_api = self.client_pool.get_bound(
+            user_id, login_customer_id,
+            lambda client: GoogleAdsAPI(client=client, client_pool=self.client_pool))
+        return user_api if user_api is not None else self
+    
+    def _get_ga_service(self):
+        """
+        GoogleAdsService do processo atual, criado na primeira consulta
+        
+        get_service abre um canal gRPC novo a cada chamada; o stub é seguro
+        para uso entre threads, então todas as consultas (inclusive em paralelo)
+        compartilham o mesmo canal.
+        """
+        pid = os.getpid()
+        if self._ga_service is None or self._ga_service_pid != pid:
+            with self._ga_service_lock:
+                if self._ga_service is None or self._ga_service_pid != pid:
+                    self._ga_service = self.client.get_service("GoogleAdsService")
+                    self._ga_service_pid = pid
+        return self._ga_service
+    
     def validate_date_range(self, start_date: str, end_date: str) -> bool:
         """
-        Valida se o período não excede 90 dias
+        Valida as datas do período
+        
+        Não há limite de tamanho: períodos longos são divididos em blocos
+        (chunk_days) por get_campaigns_report.
         """
         try:
             start = datetime.strptime(start_date, '%Y-%m-%d')
             end = datetime.strptime(end_date, '%Y-%m-%d')
             
-            # Verifica se não excede 90 dias
-            if (end - start).days > 90:
-                return False
-            
             # Verifica se as datas são válidas
             if start > end or end > datetime.now():
                 return False
@@ -76,21 +172,228 @@ class GoogleAdsAPI:
         except ValueError:
             return False
     
-    def get_campaigns_report(self, customer_id: str, start_date: str, end_date: str) -> List[Dict]:
+    def get_campaigns_report(self, customer_id: str, start_date: str, end_date: str,
+                             skip_zero_impressions: bool = False, incremental: bool = False) -> List[Dict]:
         """
         Busca relatório de campanhas do Google Ads (API v18)
         
+        Períodos maiores que chunk_days são divididos em blocos consultados em
+        paralelo (até max_parallel_chunks ao mesmo tempo); o resultado mantém a
+        ordem por data decrescente de uma consulta única.
+        
+        Com o cache de relatórios ligado, só os dias que não estão em cache
+        (ver report_cache) são consultados na API. No modo incremental, a
+        consulta de campanhas ativas é feita por trecho a buscar, e o trecho só
+        é guardado no cache se equivale à consulta completa.
+        
+        Args:
+            customer_id: ID do cliente Google Ads (formato: 1234567890)
+            start_date: Data início (YYYY-MM-DD)
+            end_date: Data fim (YYYY-MM-DD)
+            skip_zero_impressions: Se True, a query só traz linhas com impressões
+                                   (metrics.impressions > 0), omitindo campanhas paradas
+            incremental: Se True (e skip_zero_impressions False), consulta antes as
+                         campanhas ativas ou alteradas no período
+                         (get_active_campaign_ids) e só busca as métricas delas
+        """
+        
+        customer_id = self._prepare_report(customer_id, start_date, end_date)
+        
+        if not self.cache:
+            campaigns, _ = self._fetch_report_range(customer_id, start_date, end_date,
+                                                    skip_zero_impressions, incremental)
+        else:
+            platform_key = self._cache_key(skip_zero_impressions)
+            campaigns = []
+            cached_days = fetched_days = 0
+            for segment_start, segment_end, rows in self.cache.plan(platform_key, customer_id, start_date, end_date):
+                days = (datetime.strptime(segment_end, '%Y-%m-%d') - datetime.strptime(segment_start, '%Y-%m-%d')).days + 1
+                if rows is None:
+                    rows, complete = self._fetch_report_range(customer_id, segment_start, segment_end,
+                                                              skip_zero_impressions, incremental)
+                    if complete:
+                        self.cache.store(platform_key, customer_id, segment_start, segment_end, rows, 'dia')
+                    fetched_days += days
+                else:
+                    cached_days += days
+                campaigns.extend(rows)
+            # Mesma ordem da query (data decrescente)
+            campaigns.sort(key=lambda row: row['dia'], reverse=True)
+            print(f"[CACHE] Google Ads {customer_id}: {cached_days} dias do cache, {fetched_days} da API")
+        
+        print(f"Google Ads API: {len(campaigns)} registros encontrados para o cliente {customer_id}")
+        return campaigns
+    
+    def get_campaigns_reports_batch(self, date_ranges: Dict[str, Tuple[str, str]],
+                                    skip_zero_impressions: bool = False,
+                                    incremental: bool = False) -> Dict[str, Dict]:
+        """
+        Busca o relatório de campanhas de vários clientes em paralelo
+        
+        Até max_parallel_customers consultas ficam em andamento ao mesmo tempo,
+        todas sobre o mesmo GoogleAdsClient e o mesmo canal gRPC; o ritmo total
+        respeita max_qps e erros de cota são tentados de novo (ver
+        _iter_campaigns_chunk).
+        
+        Args:
+            date_ranges: Mapa customer_id -> (data início, data fim)
+            skip_zero_impressions: Se True, omite linhas sem impressões
+            incremental: Se True, só busca métricas das campanhas ativas ou
+                         alteradas no período (ver get_campaigns_report)
+            
+        Returns:
+            Dict[str, Dict]: customer_id -> {'data': List[Dict], 'error': Optional[str]};
+            um erro em um cliente não afeta os demais
+        """
+        return dict(self.iter_campaigns_reports_batch(date_ranges, skip_zero_impressions, incremental))
+    
+    def iter_campaigns_reports_batch(self, date_ranges: Dict[str, Tuple[str, str]],
+                                     skip_zero_impressions: bool = False,
+                                     incremental: bool = False) -> Iterator[Tuple[str, Dict]]:
+        """
+        Como get_campaigns_reports_batch, mas gera cada cliente assim que termina
+        
+        Um novo cliente só é disparado quando outro termina, então no máximo
+        max_parallel_customers relatórios ficam em memória enquanto o chamador
+        grava o anterior.
+        
+        Yields:
+            Tuple[str, Dict]: (customer_id, {'data': List[Dict], 'error': Optional[str]}),
+            na ordem em que os clientes terminam
+        """
+        if not date_ranges:
+            return
+        
+        def fetch(item):
+            customer_id, (start_date, end_date) = item
+            try:
+                data = self.get_campaigns_report(customer_id, start_date, end_date,
+                                                 skip_zero_impressions, incremental)
+                return customer_id, {'data': data, 'error': None}
+            except Exception as e:
+                print(f"Erro na API Google Ads para {customer_id}: {e}")
+                return customer_id, {'data': [], 'error': str(e)}
+        
+        items = list(date_ranges.items())
+        workers = max(1, min(self.max_parallel_customers, len(items)))
+        print(f"[DEBUG] Google Ads: buscando {len(items)} clientes ({workers} em paralelo)")
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='google-ads')
+        pending = set()
+        try:
+            next_index = 0
+            while next_index < len(items) and len(pending) < workers:
+                pending.add(executor.submit(fetch, items[next_index]))
+                next_index += 1
+            
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Repõe antes de entregar: a busca segue enquanto o chamador grava
+                    if next_index < len(items):
+                        pending.add(executor.submit(fetch, items[next_index]))
+                        next_index += 1
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+    
+    def iter_clients_reports(self, clients: List[Dict], start_date: str, end_date: str, db,
+                             backfill: bool = False) -> Iterator[Tuple[Dict, Optional[Dict]]]:
+        """
+        Planeja e busca em paralelo os relatórios dos clientes do cadastro,
+        gerando cada cliente assim que sua busca termina
+        
+        Usado pela atualização diária e pela atualização em massa. Clientes com o
+        período já sincronizado saem primeiro (nada a buscar); os demais saem na
+        ordem em que terminam (ver iter_campaigns_reports_batch).
+        
+        Args:
+            clients: Linhas do cadastro (id_google); clientes com o mesmo
+                     id_google compartilham uma única busca
+            db: Database usado para planejar o período (plan_sync_range) e ler
+                as opções de sincronização
+            backfill: Repassado a plan_sync_range
+            
+        Yields:
+            Tuple[Dict, Optional[Dict]]: (cliente, {'sync_range', 'data', 'error'});
+            clientes sem resultado (ou todos, se a busca paralela falhar por
+            completo) saem por último com None, para serem buscados individualmente
+        """
+        clients_by_customer = {}
+        for client in clients:
+            clients_by_customer.setdefault(client.get('id_google'), []).append(client)
+        
+        def results():
+            date_ranges = {}
+            for customer_id in list(clients_by_customer):
+                if not customer_id:
+                    continue
+                sync_range = db.plan_sync_range('google', customer_id, start_date, end_date,
+                                                backfill=backfill)
+                if sync_range:
+                    date_ranges[customer_id] = sync_range
+                else:
+                    yield customer_id, {'sync_range': None, 'data': [], 'error': None}
+            
+            for customer_id, result in self.iter_campaigns_reports_batch(
+                    date_ranges, skip_zero_impressions=db.sync_skip_zero_impressions,
+                    incremental=db.sync_google_incremental):
+                yield customer_id, {'sync_range': date_ranges[customer_id], **result}
+        
+        try:
+            for customer_id, prefetched in results():
+                for client in clients_by_customer.pop(customer_id, []):
+                    yield client, prefetched
+        except Exception as e:
+            print(f"⚠️  Falha na busca paralela do Google, buscando cliente a cliente: {e}")
+        
+        # Sem resultado da busca paralela: buscados individualmente
+        for customer_clients in list(clients_by_customer.values()):
+            for client in customer_clients:
+                yield client, None
+    
+    def iter_campaigns_report(self, customer_id: str, start_date: str, end_date: str,
+                              chunks: bool = False, skip_zero_impressions: bool = False) -> Iterator:
+        """
+        Lê em streaming o relatório de campanhas do Google Ads (search_stream)
+        
+        Cada lote devolvido pelo search_stream é processado e gerado assim que
+        chega, sem esperar o restante do período: a primeira linha sai logo e a
+        memória fica limitada a um lote. Os blocos de chunk_days dias são lidos
+        um após o outro, do mais recente para o mais antigo (mesma ordem por
+        data decrescente de get_campaigns_report).
+        
+        Com o cache de relatórios ligado, os dias em cache não são consultados;
+        os trechos buscados são guardados bloco a bloco (chunk_days).
+        
         Args:
             customer_id: ID do cliente Google Ads (formato: 1234567890)
             start_date: Data início (YYYY-MM-DD)
             end_date: Data fim (YYYY-MM-DD)
+            chunks: Se True, gera listas (uma por lote) em vez de linhas
+            skip_zero_impressions: Se True, omite linhas sem impressões
+            
+        Yields:
+            Dict (ou List[Dict] se chunks=True) no formato do CSV
         """
+        customer_id = self._prepare_report(customer_id, start_date, end_date)
+        return self._iter_report(customer_id, start_date, end_date, chunks, skip_zero_impressions)
+    
+    @staticmethod
+    def _cache_key(skip_zero_impressions: bool) -> str:
+        """Chave do cache de relatórios (linhas filtradas e completas ficam separadas)"""
+        return cache_key('google_ads:active' if skip_zero_impressions else 'google_ads',
+                         GOOGLE_ADS_REPORT_FIELDS, GOOGLE_ADS_CACHE_VERSION)
+    
+    def _prepare_report(self, customer_id: str, start_date: str, end_date: str) -> str:
+        """Valida cliente, período e customer_id; devolve o customer_id sanitizado"""
         
         # Verificar se cliente está inicializado
         self._check_client_available()
         
         if not self.validate_date_range(start_date, end_date):
-            raise ValueError("Período inválido. Máximo de 90 dias e datas válidas.")
+            raise ValueError("Período inválido. Verifique as datas informadas.")
         
         # Sanitiza o customer_id (remove espaços, quebras de linha, etc.)
         customer_id = str(customer_id).strip().replace('\n', '').replace('\r', '')
@@ -99,8 +402,189 @@ class GoogleAdsAPI:
         if not customer_id.isdigit() or len(customer_id) < 9:
             raise ValueError(f"Customer ID inválido: '{customer_id}'. Deve conter apenas números e ter pelo menos 9 dígitos.")
         
+        return customer_id
+    
+    def _iter_report(self, customer_id: str, start_date: str, end_date: str,
+                     chunks: bool, skip_zero_impressions: bool) -> Iterator:
+        """Gerador de iter_campaigns_report (separado para que a validação seja imediata)"""
+        platform_key = self._cache_key(skip_zero_impressions)
+        if self.cache:
+            segments = self.cache.plan(platform_key, customer_id, start_date, end_date)
+        else:
+            segments = [(start_date, end_date, None)]
+        
+        conditions = self._report_conditions(skip_zero_impressions)
+        total = 0
+        for segment_start, segment_end, rows in reversed(segments):
+            if rows is not None:
+                rows = sorted(rows, key=lambda row: row['dia'], reverse=True)
+                total += len(rows)
+                if rows:
+                    if chunks:
+                        yield rows
+                    else:
+                        yield from rows
+                continue
+            
+            # Cada bloco vai para o cache assim que termina (memória limitada a um bloco);
+            # guarda cópias, porque quem consome o stream pode alterar as linhas
+            for chunk_start, chunk_end in reversed(split_date_range(segment_start, segment_end, self.chunk_days)):
+                fetched = [] if self.cache else None
+                for batch in self._iter_campaigns_chunk(customer_id, chunk_start, chunk_end, conditions):
+                    total += len(batch)
+                    if fetched is not None:
+                        fetched.extend(dict(row) for row in batch)
+                    if chunks:
+                        yield batch
+                    else:
+                        yield from batch
+                if fetched is not None:
+                    self.cache.store(platform_key, customer_id, chunk_start, chunk_end, fetched, 'dia')
+        
+        print(f"Google Ads API: {total} registros lidos em streaming para o cliente {customer_id}")
+    
+    def get_active_campaign_ids(self, customer_id: str, start_date: str, end_date: str) -> Optional[Set[int]]:
+        """
+        Campanhas que tiveram impressões ou foram alteradas no período
+        
+        Duas consultas pequenas, sem segmentar por data: as campanhas com
+        impressões no período (uma linha por campanha) e as alteradas segundo
+        change_status (a própria campanha ou seus grupos, anúncios e critérios).
+        
+        Returns:
+            Optional[Set[int]]: IDs das campanhas; None quando não dá para
+            saber (período fora dos 90 dias guardados pelo change_status, limite
+            de linhas atingido ou erro), caso em que todas devem ser consultadas
+        """
+        # change_status só guarda os últimos 90 dias
+        oldest_change_day = (datetime.now() - timedelta(days=89)).strftime('%Y-%m-%d')
+        if start_date < oldest_change_day:
+            return None
+        
+        active_query = f"""
+            SELECT campaign.id
+            FROM campaign
+            WHERE segments.date BETWEEN '{start_date}' AND '{end_date}'
+                AND metrics.impressions > 0
+        """
+        changes_query = f"""
+            SELECT change_status.campaign
+            FROM change_status
+            WHERE change_status.last_change_date_time BETWEEN '{start_date} 00:00:00' AND '{end_date} 23:59:59'
+            LIMIT {CHANGE_STATUS_LIMIT}
+        """
+        try:
+            ga_service = self._get_ga_service()
+            campaign_ids = set()
+            for query in (active_query, changes_query):
+                search_request = self.client.get_type("SearchGoogleAdsStreamRequest")
+                search_request.customer_id = customer_id
+                search_request.query = query
+                
+                _wait_request_slot(self.max_qps)
+                changes = 0
+                for response in ga_service.search_stream(request=search_request):
+                    for row in response.results:
+                        if query is active_query:
+                            campaign_ids.add(row.campaign.id)
+                        else:
+                            changes += 1
+                            # customers/{customer_id}/campaigns/{campaign_id}
+                            if row.change_status.campaign:
+                                campaign_ids.add(int(row.change_status.campaign.rsplit('/', 1)[-1]))
+                if changes >= CHANGE_STATUS_LIMIT:
+                    print(f"[DEBUG] Google Ads {customer_id}: mais de {CHANGE_STATUS_LIMIT} alterações no período, "
+                          f"consultando todas as campanhas")
+                    return None
+        except Exception as e:
+            print(f"[WARNING] Erro ao consultar campanhas ativas do Google Ads {customer_id}: {e}")
+            return None
+        
+        print(f"[DEBUG] Google Ads {customer_id}: {len(campaign_ids)} campanhas ativas ou alteradas "
+              f"de {start_date} a {end_date}")
+        return campaign_ids
+    
+    @staticmethod
+    def _report_conditions(skip_zero_impressions: bool = False,
+                           campaign_ids: Optional[Iterable[int]] = None) -> str:
+        """Condições extras do WHERE da query de relatório"""
+        conditions = []
+        # Filtro de campanhas sem entrega aplicado na própria query
+        if skip_zero_impressions:
+            conditions.append("AND metrics.impressions > 0")
+        if campaign_ids is not None:
+            conditions.append(f"AND campaign.id IN ({', '.join(str(int(i)) for i in sorted(campaign_ids))})")
+        return ' '.join(conditions)
+    
+    def _fetch_report_range(self, customer_id: str, start_date: str, end_date: str,
+                            skip_zero_impressions: bool, incremental: bool) -> Tuple[List[Dict], bool]:
+        """
+        Consulta o período na API; no modo incremental, só as campanhas ativas ou alteradas
+        
+        Com skip_zero_impressions o filtro metrics.impressions > 0 já exclui as
+        campanhas paradas, então o modo incremental não economizaria linhas e
+        as consultas prévias são puladas.
+        
+        Returns:
+            Tuple[List[Dict], bool]: (linhas, completo); completo é False quando
+            linhas zeradas de campanhas paradas podem ter ficado de fora (o
+            resultado não equivale à consulta completa e não vai para o cache)
+        """
+        campaign_ids = None
+        if incremental and not skip_zero_impressions:
+            campaign_ids = self.get_active_campaign_ids(customer_id, start_date, end_date)
+        complete = campaign_ids is None
+        if campaign_ids is not None and not campaign_ids:
+            print(f"[DEBUG] Google Ads {customer_id}: nenhuma campanha ativa ou alterada, métricas não consultadas")
+            return [], complete
+        
+        conditions = self._report_conditions(skip_zero_impressions, campaign_ids)
+        return self._fetch_campaigns_range(customer_id, start_date, end_date, conditions), complete
+    
+    def _fetch_campaigns_range(self, customer_id: str, start_date: str, end_date: str,
+                               conditions: str = '') -> List[Dict]:
+        """Consulta o período na API, dividido em blocos paralelos se for longo"""
+        # Blocos do mais recente para o mais antigo (a query ordena por data decrescente)
+        date_chunks = split_date_range(start_date, end_date, self.chunk_days)[::-1]
+        if len(date_chunks) > 1:
+            print(f"[DEBUG] Google Ads {customer_id}: período dividido em {len(date_chunks)} blocos "
+                  f"de até {self.chunk_days} dias ({self.max_parallel_chunks} em paralelo)")
+        
+        campaigns = []
+        for chunk_campaigns in iter_parallel(
+                lambda date_chunk: self._fetch_campaigns_chunk(customer_id, *date_chunk, conditions),
+                date_chunks, self.max_parallel_chunks):
+            campaigns.extend(chunk_campaigns)
+        return campaigns
+    
+    def _fetch_campaigns_chunk(self, customer_id: str, start_date: str, end_date: str,
+                               conditions: str = '') -> List[Dict]:
+        """
+        Consulta um bloco do período (uma query GAQL)
+        """
+        campaigns = []
+        for batch in self._iter_campaigns_chunk(customer_id, start_date, end_date, conditions):
+            for campaign_data in batch:
+                campaigns.append(campaign_data)
+                
+                # Debug apenas para as primeiras campanhas
+                if len(campaigns) <= 3:
+                    print(f"[DEBUG] Campanha {len(campaigns)}: {campaign_data['nome_campanha']} - {campaign_data['dia']} - Clicks: {campaign_data['clicks']}")
+        
+        if len(campaigns) > 3:
+            print(f"[DEBUG] ... e mais {len(campaigns) - 3} campanhas")
+        
+        return campaigns
+    
+    def _iter_campaigns_chunk(self, customer_id: str, start_date: str, end_date: str,
+                              conditions: str = '') -> Iterator[List[Dict]]:
+        """
+        Executa a query GAQL de um bloco via search_stream, gerando um lote processado por vez
+        
+        conditions: condições extras do WHERE (ver _report_conditions)
+        """
         try:
-            ga_service = self.client.get_service("GoogleAdsService")
+            ga_service = self._get_ga_service()
             
             # Query GAQL baseada nas colunas do CSV fornecido (v18)
             query = f"""
@@ -118,34 +602,42 @@ class GoogleAdsAPI:
                     metrics.cost_micros
                 FROM campaign 
                 WHERE segments.date BETWEEN '{start_date}' AND '{end_date}'
+                    {conditions}
                 ORDER BY segments.date DESC
             """
             
             print(f"[DEBUG] Executando query para customer {customer_id}: {start_date} a {end_date}")
             
-            search_request = self.client.get_type("SearchGoogleAdsRequest")
+            search_request = self.client.get_type("SearchGoogleAdsStreamRequest")
             search_request.customer_id = customer_id
             search_request.query = query
             
-            # Executa a query
-            results = ga_service.search(request=search_request)
-            
-            campaigns = []
-            campaign_count = 0
-            for row in results:
-                campaign_data = self._process_campaign_data(row, customer_id)
-                campaigns.append(campaign_data)
-                campaign_count += 1
-                
-                # Debug apenas para as primeiras campanhas
-                if campaign_count <= 3:
-                    print(f"[DEBUG] Campanha {campaign_count}: {campaign_data['nome_campanha']} - {campaign_data['dia']} - Clicks: {campaign_data['clicks']}")
-            
-            print(f"Google Ads API: {len(campaigns)} registros encontrados para o cliente {customer_id}")
-            if campaign_count > 3:
-                print(f"[DEBUG] ... e mais {campaign_count - 3} campanhas")
-            
-            return campaigns
+            # Executa a query; cada resposta do stream traz um lote de linhas.
+            # Erro de cota antes do primeiro lote: espera e tenta de novo
+            attempt = 0
+            while True:
+                _wait_request_slot(self.max_qps)
+                yielded = False
+                try:
+                    for response in ga_service.search_stream(request=search_request):
+                        if self.raw_protobuf:
+                            # Mensagem protobuf por baixo do wrapper (sem cópia)
+                            batch = [self._process_campaign_row_pb(row, customer_id)
+                                     for row in type(response).pb(response).results]
+                        else:
+                            batch = [self._process_campaign_data(row, customer_id) for row in response.results]
+                        if batch:
+                            yielded = True
+                            yield batch
+                    break
+                except GoogleAdsException as ex:
+                    delay = self._quota_retry_delay(ex, attempt)
+                    if yielded or delay is None or attempt >= self.quota_retries:
+                        raise
+                    attempt += 1
+                    print(f"[WARNING] Cota do Google Ads atingida para {customer_id}; "
+                          f"nova tentativa {attempt}/{self.quota_retries} em {delay:.0f}s")
+                    time.sleep(delay)
             
         except GoogleAdsException as ex:
             print(f"Google Ads API Exception: {ex}")
@@ -160,6 +652,27 @@ class GoogleAdsAPI:
             print(f"Erro geral na API Google Ads: {e}")
             raise Exception(f"Erro ao buscar dados do Google Ads: {str(e)}")
     
+    def _quota_retry_delay(self, ex: GoogleAdsException, attempt: int) -> Optional[float]:
+        """
+        Segundos a esperar antes de repetir uma consulta que falhou por cota
+        
+        Returns:
+            Optional[float]: None se o erro não é de cota ou se a espera pedida
+            pela API passa de quota_max_wait (ex.: cota diária esgotada)
+        """
+        for error in ex.failure.errors:
+            if not getattr(error.error_code, 'quota_error', 0):
+                continue
+            retry_delay = getattr(getattr(error.details, 'quota_error_details', None), 'retry_delay', None)
+            if hasattr(retry_delay, 'total_seconds'):
+                delay = retry_delay.total_seconds()
+            else:
+                delay = float(getattr(retry_delay, 'seconds', 0) or 0)
+            # Sem indicação da API: backoff exponencial
+            delay = delay or 2.0 ** (attempt + 1)
+            return delay if delay <= self.quota_max_wait else None
+        return None
+    
     def _process_campaign_data(self, row, customer_id: str) -> Dict:
         """
         Processa dados brutos da API para formato do CSV
@@ -193,6 +706,31 @@ class GoogleAdsAPI:
             'customer_id': customer_id
         }
     
+    @staticmethod
+    def _process_campaign_row_pb(row, customer_id: str) -> Dict:
+        """
+        Mesmo resultado de _process_campaign_data, lendo um GoogleAdsRow protobuf puro
+        
+        Os campos já vêm como int/float/str nativos (segments.date é 'YYYY-MM-DD'),
+        então não há conversões por campo além de micros -> valor.
+        """
+        campaign = row.campaign
+        metrics = row.metrics
+        
+        return {
+            'campaign_id': campaign.id,
+            'nome_campanha': campaign.name,
+            'dia': row.segments.date,
+            'clicks': metrics.clicks,
+            'conversions': int(metrics.conversions),
+            'conversions_value': metrics.conversions_value,
+            'ctr': metrics.ctr,
+            'average_cpc': metrics.average_cpc / 1_000_000,
+            'impressions': metrics.impressions,
+            'cost': metrics.cost_micros / 1_000_000,
+            'customer_id': customer_id
+        }
+    
     def test_connection(self, customer_id: str = None) -> bool:
         """
         Testa conexão com a API do Google Ads (v18)
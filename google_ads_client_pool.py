@@ -0,0 +1,157 @@
+"""
+Pool de GoogleAdsClient por usuário (tokens OAuth salvos por GoogleAdsOAuth)
+
+Montar um GoogleAdsClient leva centenas de milissegundos; em vez de criar um
+por requisição, o pool guarda um cliente por (usuário, login_customer_id),
+criado na primeira vez a partir de auth_manager.get_google_token. O cliente
+usa o refresh token do usuário, então a biblioteca renova o access token
+sozinha quando ele expira. Junto com o cliente, a entrada guarda o objeto
+montado sobre ele (get_bound, ex.: o GoogleAdsAPI do usuário com seu
+GoogleAdsService), para que cada requisição não abra um canal gRPC novo.
+
+A cada GOOGLE_ADS_CLIENT_POOL_TTL segundos o token salvo é consultado de novo:
+se o usuário reautorizou (refresh token diferente) o cliente é recriado, e se
+revogou o acesso o cliente é descartado. Acima de GOOGLE_ADS_CLIENT_POOL_SIZE
+clientes, o usado há mais tempo é removido (LRU).
+
+Configuração por variáveis de ambiente:
+
+    GOOGLE_ADS_CLIENT_POOL_SIZE   clientes mantidos (padrão: 16)
+    GOOGLE_ADS_CLIENT_POOL_TTL    segundos até conferir de novo o token salvo (padrão: 600)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+from google.ads.googleads.client import GoogleAdsClient
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+class GoogleAdsClientPool:
+    def __init__(self, auth_manager, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Args:
+            auth_manager: AuthManager usado para ler os tokens do usuário
+            max_size: Clientes mantidos (padrão: GOOGLE_ADS_CLIENT_POOL_SIZE ou 16)
+            ttl: Segundos até conferir o token salvo (padrão: GOOGLE_ADS_CLIENT_POOL_TTL ou 600)
+        """
+        self.auth_manager = auth_manager
+        self.max_size = max_size or int(os.getenv('GOOGLE_ADS_CLIENT_POOL_SIZE', 16))
+        self.ttl = ttl if ttl is not None else float(os.getenv('GOOGLE_ADS_CLIENT_POOL_TTL', 600))
+        self.developer_token = os.getenv('GOOGLE_ADS_DEVELOPER_TOKEN')
+        self.client_id = os.getenv('GOOGLE_ADS_CLIENT_ID')
+        self.client_secret = os.getenv('GOOGLE_ADS_CLIENT_SECRET')
+        self._lock = threading.Lock()
+        # (user_id, login_customer_id) -> {'client', 'refresh_token', 'checked_at', 'bound'}
+        self._entries = OrderedDict()
+
+    def _build_client(self, refresh_token: str, login_customer_id: Optional[str]) -> GoogleAdsClient:
+        google_ads_config = {
+            "developer_token": self.developer_token,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "refresh_token": refresh_token,
+            "use_proto_plus": True,
+            "version": "v18"
+        }
+        if login_customer_id:
+            google_ads_config["login_customer_id"] = str(login_customer_id).replace('-', '').strip()
+        return GoogleAdsClient.load_from_dict(google_ads_config)
+
+    def get_client(self, user_id: str, login_customer_id: Optional[str] = None) -> Optional[GoogleAdsClient]:
+        """
+        Retorna o cliente do usuário, criando-o se necessário
+
+        Returns:
+            Optional[GoogleAdsClient]: None se o usuário não tem refresh token
+            salvo (nunca autorizou ou revogou o acesso) ou se o cliente não pôde
+            ser criado
+        """
+        if not user_id:
+            return None
+
+        key = self._key(user_id, login_customer_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry['checked_at'] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry['client']
+
+        # Lê o token fora do lock (consulta ao banco)
+        tokens = self.auth_manager.get_google_token(user_id)
+        refresh_token = (tokens or {}).get('refresh_token')
+        if not refresh_token:
+            self.invalidate(user_id)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['refresh_token'] == refresh_token:
+                entry['checked_at'] = now
+                self._entries.move_to_end(key)
+                return entry['client']
+
+        try:
+            client = self._build_client(refresh_token, login_customer_id)
+        except Exception as e:
+            print(f"[WARNING] Erro ao criar cliente Google Ads do usuário {user_id}: {e}")
+            return None
+
+        with self._lock:
+            self._entries[key] = {'client': client, 'refresh_token': refresh_token, 'checked_at': now,
+                                  'bound': None}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        print(f"[DEBUG] Cliente Google Ads criado para o usuário {user_id}"
+              f"{f' (login_customer_id {login_customer_id})' if login_customer_id else ''}")
+        return client
+
+    def get_bound(self, user_id: str, login_customer_id: Optional[str], factory: Callable):
+        """
+        Objeto montado sobre o cliente do usuário (factory(client)), guardado na entrada do pool
+
+        É recriado junto com o cliente (token renovado) e descartado com ele
+        (LRU ou invalidate).
+
+        Returns:
+            None se não há cliente para o usuário (ver get_client)
+        """
+        client = self.get_client(user_id, login_customer_id)
+        if client is None:
+            return None
+
+        key = self._key(user_id, login_customer_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['client'] is client and entry['bound'] is not None:
+                return entry['bound']
+
+        bound = factory(client)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['client'] is client:
+                if entry['bound'] is None:
+                    entry['bound'] = bound
+                bound = entry['bound']
+        return bound
+
+    @staticmethod
+    def _key(user_id: str, login_customer_id: Optional[str]) -> tuple:
+        return str(user_id), str(login_customer_id or '').replace('-', '').strip()
+
+    def invalidate(self, user_id: str):
+        """Descarta os clientes do usuário (ex.: após revogar ou reautorizar o acesso)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == str(user_id)]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
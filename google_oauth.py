@@ -9,12 +9,15 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from dotenv import load_dotenv
+from http_session import get_http_session
 
 load_dotenv()
 
 class GoogleAdsOAuth:
-    def __init__(self, auth_manager):
+    def __init__(self, auth_manager, http_session: Optional[requests.Session] = None):
         self.auth_manager = auth_manager
+        # Sessão HTTP compartilhada (keep-alive e novas tentativas em 429/5xx)
+        self.http_session = http_session or get_http_session()
         
         # Configurações OAuth do Google Ads
         self.client_id = os.getenv('GOOGLE_ADS_CLIENT_ID')
@@ -81,7 +84,7 @@ class GoogleAdsOAuth:
                 'redirect_uri': self.redirect_uri
             }
             
-            response = requests.post(self.token_url, data=token_data)
+            response = self.http_session.post(self.token_url, data=token_data)
             
             if response.status_code != 200:
                 return {'success': False, 'message': f'Erro ao obter tokens: {response.text}'}
@@ -143,7 +146,7 @@ class GoogleAdsOAuth:
             }
             test_url = 'https://googleads.googleapis.com/v18/customers:listAccessibleCustomers'
             
-            response = requests.get(test_url, headers=test_headers, timeout=10)
+            response = self.http_session.get(test_url, headers=test_headers, timeout=10)
             
             print(f"[DEBUG] Google Ads API test status: {response.status_code}")
             
@@ -200,7 +203,7 @@ class GoogleAdsOAuth:
                 'grant_type': 'refresh_token'
             }
             
-            response = requests.post(self.token_url, data=refresh_data)
+            response = self.http_session.post(self.token_url, data=refresh_data)
             
             if response.status_code == 200:
                 new_tokens = response.json()
@@ -282,7 +285,7 @@ class GoogleAdsOAuth:
             # Revogar token no Google
             if tokens.get('access_token'):
                 revoke_url = f"https://oauth2.googleapis.com/revoke?token={tokens['access_token']}"
-                requests.post(revoke_url)
+                self.http_session.post(revoke_url)
             
             # Limpar tokens do banco
             success = self.auth_manager.store_google_token(
@@ -316,7 +319,7 @@ class GoogleAdsOAuth:
             # URL da API para listar contas (usando Customer service)
             url = 'https://googleads.googleapis.com/v18/customers:listAccessibleCustomers'
             
-            response = requests.get(url, headers=headers)
+            response = self.http_session.get(url, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -0,0 +1,118 @@
+"""
+Sessão HTTP compartilhada pelos clientes de API (Facebook, Evolution, Google OAuth)
+
+Em vez de requests.get/post avulsos (um handshake TCP+TLS por chamada), todas
+as classes usam a mesma requests.Session, com pool de conexões keep-alive por
+host e novas tentativas com backoff em 429/5xx. Configuração por variáveis de
+ambiente:
+
+    HTTP_POOL_SIZE           conexões mantidas por host (padrão: 10)
+    HTTP_POOL_SIZES          tamanhos por host em JSON, ex.: {"graph.facebook.com": 20}
+    HTTP_MAX_RETRIES         novas tentativas em 429/5xx e falhas de conexão (padrão: 3)
+    HTTP_RETRY_BACKOFF       fator do backoff exponencial em segundos (padrão: 0.5)
+
+Somente métodos idempotentes (GET/HEAD/OPTIONS) são repetidos após uma
+resposta 429/5xx: um POST (envio de WhatsApp, troca de token, criação de
+relatório) nunca é reenviado automaticamente.
+
+get_http_session(retry_reads=False) devolve uma segunda sessão que não repete
+timeouts de leitura nem respostas 429/5xx (só falhas de conexão): usada quando
+quem chama tem uma alternativa melhor que insistir, como o pedido síncrono de
+insights do Facebook, que vira relatório assíncrono.
+
+A sessão é recriada no processo filho após um fork, como o cliente Supabase.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+# Hosts com mais tráfego (ex.: batch e paginação do Facebook) começam com pool maior
+DEFAULT_HOST_POOL_SIZES = {
+    'graph.facebook.com': 20,
+}
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_sessions: Dict[bool, requests.Session] = {}
+_session_pid: Optional[int] = None
+_lock = threading.Lock()
+
+def _build_retry(retry_reads: bool = True) -> Retry:
+    return Retry(
+        total=int(os.getenv('HTTP_MAX_RETRIES', 3)),
+        # read=False levanta o ReadTimeoutError original (requests.Timeout) na hora;
+        # status=0 devolve a primeira resposta 429/5xx sem repetir
+        read=None if retry_reads else False,
+        status=None if retry_reads else 0,
+        backoff_factor=float(os.getenv('HTTP_RETRY_BACKOFF', 0.5)),
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+        respect_retry_after_header=True,
+        # Devolve a última resposta em vez de levantar; quem chama usa raise_for_status()
+        raise_on_status=False,
+    )
+
+def _host_pool_sizes() -> Dict[str, int]:
+    sizes = dict(DEFAULT_HOST_POOL_SIZES)
+    try:
+        sizes.update({host: int(size) for host, size in json.loads(os.getenv('HTTP_POOL_SIZES', '{}')).items()})
+    except (ValueError, AttributeError) as e:
+        print(f"[WARNING] HTTP_POOL_SIZES inválido, usando padrões: {e}")
+    return sizes
+
+def _create_session(retry_reads: bool = True) -> requests.Session:
+    session = requests.Session()
+    default_size = int(os.getenv('HTTP_POOL_SIZE', 10))
+
+    default_adapter = HTTPAdapter(pool_connections=default_size, pool_maxsize=default_size,
+                                  max_retries=_build_retry(retry_reads))
+    session.mount('https://', default_adapter)
+    session.mount('http://', default_adapter)
+
+    # Adaptador próprio (pool separado) para cada host configurado
+    for host, size in _host_pool_sizes().items():
+        session.mount(f'https://{host}/', HTTPAdapter(pool_connections=1, pool_maxsize=size,
+                                                      max_retries=_build_retry(retry_reads)))
+
+    kind = '' if retry_reads else ' sem repetição de leitura'
+    print(f"[DEBUG] Sessão HTTP compartilhada{kind} criada (pid {os.getpid()})")
+    return session
+
+def get_http_session(retry_reads: bool = True) -> requests.Session:
+    """
+    Retorna a sessão HTTP do processo atual, criando-a na primeira chamada
+
+    Com retry_reads=False, timeouts de leitura e respostas 429/5xx chegam a
+    quem chama na primeira ocorrência.
+    """
+    global _session_pid
+    pid = os.getpid()
+    session = _sessions.get(retry_reads) if _session_pid == pid else None
+    if session is None:
+        with _lock:
+            if _session_pid != pid:
+                _sessions.clear()
+                _session_pid = pid
+            session = _sessions.get(retry_reads)
+            if session is None:
+                session = _sessions[retry_reads] = _create_session(retry_reads)
+    return session
+
+def _reset_after_fork():
+    """Descarta a sessão herdada do processo pai (sockets não podem ser compartilhados)"""
+    global _sessions, _session_pid, _lock
+    _sessions = {}
+    _session_pid = None
+    _lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
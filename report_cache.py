@@ -0,0 +1,235 @@
+"""
+Cache em disco das linhas de relatório por conta e por dia
+
+Dias mais antigos que a janela de atribuição não mudam mais, então não há
+motivo para pedi-los de novo às APIs do Facebook e do Google Ads a cada
+relatório, envio de WhatsApp ou atualização em massa. As linhas já
+processadas (formato do CSV) são guardadas em SQLite, compactadas, uma
+entrada por (plataforma, conta, dia).
+
+Política de validade:
+    - um dia buscado quando já tinha mais de REPORT_CACHE_IMMUTABLE_DAYS dias
+      é definitivo e nunca é buscado de novo;
+    - os dias recentes valem por REPORT_CACHE_RECENT_TTL segundos e depois
+      são buscados de novo na API.
+
+Configuração por variáveis de ambiente:
+
+    REPORT_CACHE_ENABLED          liga o cache quando "true" (padrão: true)
+    REPORT_CACHE_DIR              diretório do arquivo SQLite (padrão: cache/ do projeto)
+    REPORT_CACHE_IMMUTABLE_DAYS   idade (dias) a partir da qual um dia não muda (padrão: 28)
+    REPORT_CACHE_RECENT_TTL       validade dos dias recentes em segundos (padrão: 900)
+
+As entradas são separadas por versão do formato das linhas (cache_key):
+quando as colunas processadas mudam (ex.: FACEBOOK_ACTION_COLUMNS), a chave
+muda e os dias são buscados de novo; ReportCache.clear remove as entradas
+antigas.
+
+O arquivo é aberto de novo no processo filho após um fork.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+class ReportCache:
+    def __init__(self, path: Optional[str] = None):
+        cache_dir = os.getenv('REPORT_CACHE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+        self.path = path or os.path.join(cache_dir, 'report_cache.sqlite3')
+        self.immutable_days = int(os.getenv('REPORT_CACHE_IMMUTABLE_DAYS', 28))
+        self.recent_ttl = float(os.getenv('REPORT_CACHE_RECENT_TTL', 900))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._stats = {'hits': 0, 'misses': 0, 'bytes_read': 0, 'bytes_written': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexão do processo atual (chamado com o lock adquirido)"""
+        pid = os.getpid()
+        if self._conn is None or self._conn_pid != pid:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS report_days (
+                    platform   TEXT NOT NULL,
+                    account_id TEXT NOT NULL,
+                    day        TEXT NOT NULL,
+                    rows       BLOB NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    final      INTEGER NOT NULL,
+                    PRIMARY KEY (platform, account_id, day)
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = pid
+        return self._conn
+
+    @staticmethod
+    def _days(start_date: str, end_date: str) -> List[str]:
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end - start).days + 1)]
+
+    def _is_final(self, day: str, fetched_at: float) -> bool:
+        """O dia já tinha passado da janela de atribuição quando foi buscado"""
+        fetched_day = datetime.fromtimestamp(fetched_at).date()
+        return datetime.strptime(day, '%Y-%m-%d').date() <= fetched_day - timedelta(days=self.immutable_days)
+
+    def plan(self, platform: str, account_id: str, start_date: str,
+             end_date: str) -> List[Tuple[str, str, Optional[List[Dict]]]]:
+        """
+        Divide o período em trechos já em cache e trechos a buscar na API
+
+        Returns:
+            List[Tuple[str, str, Optional[List[Dict]]]]: (início, fim, linhas) em
+            ordem cronológica; linhas é None quando o trecho precisa ser buscado
+        """
+        days = self._days(start_date, end_date)
+        now = time.time()
+        with self._lock:
+            try:
+                cursor = self._connection().execute(
+                    'SELECT day, rows, fetched_at, final FROM report_days '
+                    'WHERE platform = ? AND account_id = ? AND day BETWEEN ? AND ?',
+                    (platform, str(account_id), start_date, end_date))
+                entries = {day: (rows, fetched_at, final) for day, rows, fetched_at, final in cursor}
+            except sqlite3.Error as e:
+                print(f"[WARNING] Erro ao ler cache de relatórios: {e}")
+                entries = {}
+
+            segments = []
+            for day in days:
+                entry = entries.get(day)
+                rows = None
+                if entry and (entry[2] or now - entry[1] <= self.recent_ttl):
+                    try:
+                        rows = json.loads(zlib.decompress(entry[0]))
+                        self._stats['bytes_read'] += len(entry[0])
+                    except (zlib.error, ValueError):
+                        rows = None
+                self._stats['hits' if rows is not None else 'misses'] += 1
+
+                cached = rows is not None
+                if segments and (segments[-1][2] is not None) == cached:
+                    segments[-1][1] = day
+                    if cached:
+                        segments[-1][2].extend(rows)
+                else:
+                    segments.append([day, day, rows])
+
+        return [tuple(segment) for segment in segments]
+
+    def store(self, platform: str, account_id: str, start_date: str, end_date: str,
+              rows: Iterable[Dict], day_field: str):
+        """
+        Guarda as linhas buscadas para o período, uma entrada por dia
+
+        Dias do período sem nenhuma linha também são guardados (vazios), para
+        não serem buscados de novo.
+        """
+        by_day = {day: [] for day in self._days(start_date, end_date)}
+        for row in rows:
+            day = str(row.get(day_field))[:10]
+            if day in by_day:
+                by_day[day].append(row)
+
+        now = time.time()
+        records = []
+        for day, day_rows in by_day.items():
+            blob = zlib.compress(json.dumps(day_rows, default=str).encode('utf-8'))
+            records.append((platform, str(account_id), day, blob, now, int(self._is_final(day, now))))
+
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.executemany('INSERT OR REPLACE INTO report_days VALUES (?, ?, ?, ?, ?, ?)', records)
+                conn.commit()
+                self._stats['bytes_written'] += sum(len(record[3]) for record in records)
+            except sqlite3.Error as e:
+                print(f"[WARNING] Erro ao gravar cache de relatórios: {e}")
+
+    def clear(self, platform: Optional[str] = None) -> int:
+        """
+        Remove as entradas de uma plataforma (todas as versões) ou do cache inteiro
+        
+        Returns:
+            int: Quantidade de dias removidos
+        """
+        with self._lock:
+            try:
+                conn = self._connection()
+                if platform:
+                    cursor = conn.execute("DELETE FROM report_days WHERE platform = ? OR platform LIKE ?",
+                                          (platform, f'{platform}:%'))
+                else:
+                    cursor = conn.execute('DELETE FROM report_days')
+                conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                print(f"[WARNING] Erro ao limpar cache de relatórios: {e}")
+                return 0
+    
+    def get_stats(self) -> Dict:
+        """
+        Contadores do processo: dias encontrados (hits) e buscados na API
+        (misses), bytes lidos/gravados e tamanho do arquivo
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['file_bytes'] = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return stats
+
+
+def cache_key(platform: str, *schema) -> str:
+    """
+    Chave de plataforma usada em plan/store, versionada pelo formato das linhas
+    
+    schema descreve o que define as linhas guardadas (colunas, mapeamentos,
+    versão do processamento); qualquer mudança gera outra chave.
+    """
+    digest = hashlib.sha1(json.dumps(schema, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f'{platform}:{digest[:12]}'
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_report_cache() -> Optional[ReportCache]:
+    """
+    Retorna o cache compartilhado pelo processo, ou None se desligado
+    (REPORT_CACHE_ENABLED=false)
+    """
+    global _cache
+    if os.getenv('REPORT_CACHE_ENABLED', 'true').lower() != 'true':
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReportCache()
+    return _cache
+
+def _reset_after_fork():
+    """Descarta o cache herdado do processo pai (a conexão SQLite não pode ser compartilhada)"""
+    global _cache, _cache_lock
+    _cache = None
+    _cache_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,63 @@
+"""
+Divisão de períodos longos em blocos buscados em paralelo
+
+Usado por FacebookAPI e GoogleAdsAPI: o período pedido é quebrado em blocos
+de N dias (limite interno de cada API), os blocos são buscados em paralelo
+com um número máximo de requisições simultâneas e os resultados são
+devolvidos na ordem dos blocos, à medida que ficam prontos.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+def split_date_range(start_date: str, end_date: str, chunk_days: int) -> List[Tuple[str, str]]:
+    """
+    Divide o período em blocos contíguos de no máximo chunk_days dias
+
+    Returns:
+        List[Tuple[str, str]]: (início, fim) de cada bloco, em ordem cronológica
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    chunk_days = max(1, int(chunk_days))
+
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+        chunks.append((start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+def iter_parallel(fetch: Callable, items: Iterable, max_workers: int) -> Iterator:
+    """
+    Executa fetch(item) em paralelo e gera os resultados na ordem dos itens
+
+    No máximo max_workers chamadas ficam em andamento (e em memória) ao mesmo
+    tempo; uma nova só é disparada quando o resultado mais antigo é consumido.
+    Se uma chamada falhar, as pendentes são canceladas e o erro é propagado.
+    """
+    items = list(items)
+    if len(items) <= 1 or max_workers <= 1:
+        for item in items:
+            yield fetch(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-chunk')
+    try:
+        pending = []
+        next_index = 0
+        while next_index < len(items) and len(pending) < max_workers:
+            pending.append(executor.submit(fetch, items[next_index]))
+            next_index += 1
+
+        while pending:
+            result = pending.pop(0).result()
+            if next_index < len(items):
+                pending.append(executor.submit(fetch, items[next_index]))
+                next_index += 1
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
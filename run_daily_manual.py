@@ -71,8 +71,9 @@ def execute_dry_run(target_date):
         google_ads_api = GoogleAdsAPI()
         
         # Busca clientes
-        facebook_clients = db.get_active_facebook_clients()
-        google_clients = db.get_active_google_clients()
+        active_clients = db.get_active_clients()
+        facebook_clients = active_clients['facebook']
+        google_clients = active_clients['google']
         
         total_clients = len(facebook_clients) + len(google_clients)
         print(f"👥 {total_clients} clientes encontrados")
@@ -0,0 +1,90 @@
+"""
+Cliente Supabase compartilhado pelo processo
+
+Database, AuthManager, ClientDiscovery e AsyncDatabase usam o mesmo cliente
+(e portanto o mesmo pool de conexões HTTP com keep-alive), em vez de cada
+instância abrir o seu. O pool e os timeouts são configuráveis por variáveis
+de ambiente:
+
+    SUPABASE_POOL_SIZE            conexões simultâneas (padrão: 20)
+    SUPABASE_POOL_KEEPALIVE       conexões ociosas mantidas abertas (padrão: 10)
+    SUPABASE_KEEPALIVE_EXPIRY     segundos até fechar uma conexão ociosa (padrão: 30)
+    SUPABASE_CONNECT_TIMEOUT      timeout de conexão em segundos (padrão: 5)
+    SUPABASE_TIMEOUT              timeout de leitura/escrita em segundos (padrão: 30)
+    SUPABASE_HTTP2                usa HTTP/2 quando "true" (padrão: true)
+
+O cliente é recriado no processo filho após um fork (ex.: workers do
+gunicorn com --preload), para que dois processos nunca compartilhem o mesmo
+socket.
+
+Observação: o httpx.Client injetado tem sua base_url ajustada pelo
+PostgREST; o projeto só usa .table() (PostgREST) e auth, que monta URLs
+absolutas, por isso um único cliente HTTP atende a todos.
+"""
+
+import os
+import threading
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from supabase import create_client, Client, ClientOptions
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+_client: Optional[Client] = None
+_client_pid: Optional[int] = None
+_lock = threading.Lock()
+
+def _build_http_client() -> httpx.Client:
+    """Cria o cliente HTTP com o pool e os timeouts configurados"""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv('SUPABASE_POOL_SIZE', 20)),
+        max_keepalive_connections=int(os.getenv('SUPABASE_POOL_KEEPALIVE', 10)),
+        keepalive_expiry=float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', 30)),
+    )
+    timeout = httpx.Timeout(
+        float(os.getenv('SUPABASE_TIMEOUT', 30)),
+        connect=float(os.getenv('SUPABASE_CONNECT_TIMEOUT', 5)),
+    )
+    return httpx.Client(
+        limits=limits,
+        timeout=timeout,
+        http2=os.getenv('SUPABASE_HTTP2', 'true').lower() == 'true',
+        follow_redirects=True,
+    )
+
+def _create_supabase_client() -> Client:
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    http_client = _build_http_client()
+    options = ClientOptions(
+        httpx_client=http_client,
+        postgrest_client_timeout=http_client.timeout,
+    )
+    print(f"[DEBUG] Criando cliente Supabase compartilhado (pid {os.getpid()})")
+    return create_client(url, key, options)
+
+def get_supabase_client() -> Client:
+    """
+    Retorna o cliente Supabase do processo atual, criando-o na primeira chamada
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = _create_supabase_client()
+                _client_pid = pid
+    return _client
+
+def _reset_after_fork():
+    """Descarta o cliente herdado do processo pai (sockets não podem ser compartilhados)"""
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,219 @@
+"""
+Cliente Supabase em memória para os testes
+
+Cobre só o subconjunto do query builder usado por database.py: select, eq,
+gte, lte, gt, in_, or_ (termos col.op.valor, col.is.true e and(...)), order,
+limit, range, insert, upsert (on_conflict) e update.
+
+Colunas com tipo declarado em column_types ('boolean' ou 'integer') validam
+os literais dos filtros como o Postgres: um literal inválido para o tipo, ou
+IS TRUE fora de uma coluna boolean, levanta FakeAPIError na execução.
+"""
+
+from typing import Dict, List
+
+BOOLEAN_LITERALS = {'t': True, 'true': True, 'y': True, 'yes': True, 'on': True, '1': True,
+                    'f': False, 'false': False, 'n': False, 'no': False, 'off': False, '0': False}
+
+
+class FakeAPIError(Exception):
+    """Erro devolvido pelo PostgREST (como postgrest.exceptions.APIError)"""
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+def _split_terms(expr: str) -> List[str]:
+    terms, depth, current = [], 0, ''
+    for char in expr:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            terms.append(current)
+            current = ''
+        else:
+            current += char
+    terms.append(current)
+    return terms
+
+
+class FakeQuery:
+    def __init__(self, client: 'FakeSupabase', table: str):
+        self.client = client
+        self.table = table
+        self.operation = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.ordering = []
+        self.row_limit = None
+        self.row_range = None
+        self.error = None
+
+    # Filtros ---------------------------------------------------------------
+
+    def _literal(self, column: str, value):
+        """Converte o literal do filtro para o tipo declarado da coluna"""
+        column_type = self.client.column_types.get(self.table, {}).get(column)
+        text = str(value)
+        if column_type == 'boolean':
+            if text.lower() not in BOOLEAN_LITERALS:
+                self.error = FakeAPIError(f'invalid input syntax for type boolean: "{text}"')
+                return None
+            return BOOLEAN_LITERALS[text.lower()]
+        if column_type == 'integer':
+            try:
+                return int(text)
+            except ValueError:
+                self.error = FakeAPIError(f'invalid input syntax for type integer: "{text}"')
+                return None
+        return text
+
+    def _value(self, row: Dict, column: str):
+        value = row.get(column)
+        if value is None or column in self.client.column_types.get(self.table, {}):
+            return value
+        return str(value)
+
+    def _condition(self, column: str, op: str, value):
+        compare = {
+            'eq': lambda a, b: a == b, 'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b,
+            'lt': lambda a, b: a < b, 'lte': lambda a, b: a <= b,
+        }
+        if op == 'is':
+            if self.client.column_types.get(self.table, {}).get(column) not in (None, 'boolean'):
+                self.error = FakeAPIError(f'argument of IS {str(value).upper()} must be type boolean')
+            expected = {'true': True, 'false': False, 'null': None}[str(value)]
+            return lambda row: row.get(column) is expected
+        if op == 'in':
+            values = [self._literal(column, v) for v in value]
+            return lambda row: self._value(row, column) in values
+        literal = self._literal(column, value)
+        return lambda row: row.get(column) is not None and compare[op](self._value(row, column), literal)
+
+    def _term(self, term: str):
+        if term.startswith('and('):
+            conditions = [self._term(sub) for sub in _split_terms(term[4:-1])]
+            return lambda row: all(condition(row) for condition in conditions)
+        column, op, value = term.split('.', 2)
+        if op == 'in':
+            value = value.strip('()').split(',')
+        return self._condition(column, op, value)
+
+    def select(self, columns: str = '*', **kwargs):
+        self.operation = 'select'
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(self._condition(column, 'eq', value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(self._condition(column, 'gt', value))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(self._condition(column, 'gte', value))
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(self._condition(column, 'lte', value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(self._condition(column, 'in', values))
+        return self
+
+    def or_(self, expr: str):
+        conditions = [self._term(term) for term in _split_terms(expr)]
+        self.filters.append(lambda row: any(condition(row) for condition in conditions))
+        return self
+
+    def order(self, column, desc: bool = False):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self.row_limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        self.row_range = (start, end)
+        return self
+
+    # Escrita ---------------------------------------------------------------
+
+    def insert(self, payload, **kwargs):
+        self.operation = 'insert'
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = None, **kwargs):
+        self.operation = 'upsert'
+        self.payload = payload
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, payload):
+        self.operation = 'update'
+        self.payload = payload
+        return self
+
+    def execute(self) -> FakeResponse:
+        if self.error:
+            raise self.error
+        self.client.executed.append((self.operation, self.table))
+        rows = self.client.tables.setdefault(self.table, [])
+        if self.operation in ('insert', 'upsert'):
+            return FakeResponse(self._write(rows))
+
+        selected = [row for row in rows if all(condition(row) for condition in self.filters)]
+        if self.operation == 'update':
+            for row in selected:
+                row.update(self.payload)
+            return FakeResponse([dict(row) for row in selected])
+
+        for column, desc in reversed(self.ordering):
+            selected.sort(key=lambda row: str(row.get(column)), reverse=desc)
+        if self.row_range:
+            selected = selected[self.row_range[0]:self.row_range[1] + 1]
+        if self.row_limit is not None:
+            selected = selected[:self.row_limit]
+        if self.columns != '*':
+            columns = [column.strip() for column in self.columns.split(',')]
+            return FakeResponse([{column: row.get(column) for column in columns} for row in selected])
+        return FakeResponse([dict(row) for row in selected])
+
+    def _write(self, rows: List[Dict]) -> List[Dict]:
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        keys = self.on_conflict.split(',') if self.on_conflict else None
+        written = []
+        for new_row in payload:
+            existing = [row for row in rows
+                        if keys and all(str(row.get(key)) == str(new_row.get(key)) for key in keys)]
+            if existing:
+                existing[0].update(new_row)
+                written.append(dict(existing[0]))
+                continue
+            row = dict(new_row)
+            row.setdefault('id', len(rows) + 1)
+            rows.append(row)
+            written.append(dict(row))
+        return written
+
+
+class FakeSupabase:
+    def __init__(self, tables: Dict[str, List[Dict]] = None,
+                 column_types: Dict[str, Dict[str, str]] = None):
+        self.tables = tables or {}
+        self.column_types = column_types or {}
+        self.executed = []
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
@@ -0,0 +1,96 @@
+"""
+Testes do Database contra um cliente Supabase em memória
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from tests.fake_supabase import FakeSupabase  # noqa: E402
+
+
+class DatabaseTestCase(unittest.TestCase):
+    def initial_tables(self):
+        """Conteúdo inicial das tabelas do cliente falso"""
+        return {}
+
+    def setUp(self):
+        self.supabase = FakeSupabase(self.initial_tables())
+        patcher = mock.patch.object(database, 'get_supabase_client', return_value=self.supabase)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = database.Database()
+
+
+class SaveRowsTest(DatabaseTestCase):
+    def test_save_does_not_modify_caller_rows(self):
+        rows = [{'id': '10', 'account_id': 'act_123', 'campaign_id': '10', 'campaign_name': 'c',
+                 'date_start': '2024-01-01', 'impressions': 5, 'spend': 1.0}]
+        original = [dict(row) for row in rows]
+
+        stats = self.db.save_campaign_data(rows)
+
+        self.assertEqual(stats['novos_salvos'], 1)
+        self.assertEqual(rows, original)
+        saved = self.supabase.tables['relatorio_fb_campaigns'][0]
+        self.assertEqual(saved['account_id'], '123')
+        self.assertIn('metrics_hash', saved)
+
+    def test_save_google_does_not_modify_caller_rows(self):
+        rows = [{'id': '7', 'customer_id': '555', 'campaign_id': '7', 'campaign_name': 'g',
+                 'dia': '2024-01-01', 'impressions': 5, 'created_at': 'x'}]
+        original = [dict(row) for row in rows]
+
+        stats = self.db.save_google_ads_data(rows)
+
+        self.assertEqual(stats['novos_salvos'], 1)
+        self.assertEqual(rows, original)
+
+
+class ActiveClientsTest(DatabaseTestCase):
+    """roda_facebook / roda_google boolean (esquema atual) e os formatos antigos"""
+    column_type = 'boolean'
+    flags = {True: True, False: False}
+
+    def initial_tables(self):
+        yes, no = self.flags[True], self.flags[False]
+        return {'relatorio_cadastro_clientes': [
+            {'id': 1, 'name': 'ambos', 'act_fb': 'act_1', 'id_google': '11', 'roda_facebook': yes, 'roda_google': yes},
+            {'id': 2, 'name': 'facebook', 'act_fb': 'act_2', 'id_google': None, 'roda_facebook': yes, 'roda_google': no},
+            {'id': 3, 'name': 'google', 'act_fb': None, 'id_google': '33', 'roda_facebook': no, 'roda_google': yes},
+            {'id': 4, 'name': 'parado', 'act_fb': 'act_4', 'id_google': '44', 'roda_facebook': no, 'roda_google': None},
+        ]}
+
+    def setUp(self):
+        super().setUp()
+        self.supabase.column_types = {'relatorio_cadastro_clientes': {
+            'roda_facebook': self.column_type, 'roda_google': self.column_type}}
+
+    def test_active_clients(self):
+        active = self.db.get_active_clients()
+        self.assertEqual([client['name'] for client in active['facebook']], ['ambos', 'facebook'])
+        self.assertEqual([client['name'] for client in active['google']], ['ambos', 'google'])
+
+    def test_boolean_column_is_filtered_on_the_server(self):
+        if self.column_type != 'boolean':
+            self.skipTest('só para a coluna boolean')
+        self.db.get_active_clients()
+        self.assertEqual(self.supabase.executed, [('select', 'relatorio_cadastro_clientes')])
+
+
+class ActiveClientsIntegerColumnTest(ActiveClientsTest):
+    column_type = 'integer'
+    flags = {True: 1, False: 0}
+
+
+class ActiveClientsTextColumnTest(ActiveClientsTest):
+    column_type = 'text'
+    flags = {True: 'True', False: 'false'}
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Testes do FacebookAPI contra um servidor HTTP local, passando pela sessão
+compartilhada (http_session) com as novas tentativas reais do urllib3
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['REPORT_CACHE_ENABLED'] = 'false'
+os.environ['FACEBOOK_TIMEOUT'] = '0.5'
+os.environ['HTTP_RETRY_BACKOFF'] = '0'
+
+from facebook_api import FacebookAPI  # noqa: E402
+
+ROW = {'account_id': '1', 'campaign_id': '10', 'campaign_name': 'c', 'date_start': '2024-01-01',
+       'impressions': '5', 'spend': '1.5'}
+
+
+class GraphHandler(BaseHTTPRequestHandler):
+    """Simula a Graph API: insights síncrono lento ou com erro de volume, relatório assíncrono rápido"""
+    sync_mode = 'slow'
+    hits = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except BrokenPipeError:
+            # O cliente desistiu por timeout, como esperado no pedido lento
+            pass
+
+    def _count(self, key):
+        GraphHandler.hits[key] = GraphHandler.hits.get(key, 0) + 1
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/v/act_1/insights':
+            self._count('sync')
+            if GraphHandler.sync_mode == 'slow':
+                time.sleep(1)
+                self._send(200, {'data': [ROW]})
+            else:
+                self._send(500, {'error': {'code': 1, 'message': 'Please reduce the amount of data'}})
+        elif path == '/v/r1':
+            self._send(200, {'async_status': 'Job Completed', 'async_percent_completion': 100})
+        elif path == '/v/r1/insights':
+            self._count('async')
+            self._send(200, {'data': [ROW]})
+        else:
+            self._send(404, {})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self._count('create')
+        self._send(200, {'report_run_id': 'r1'})
+
+
+class SyncToAsyncFallbackTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), GraphHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        GraphHandler.hits = {}
+        self.api = FacebookAPI()
+        self.api.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v"
+
+    def _fetch(self):
+        return list(self.api._iter_insights_pages('act_1', '2024-01-01', '2024-01-01', 100,
+                                                  chunks=False, use_async=False))
+
+    def test_timeout_switches_to_async_without_retrying(self):
+        GraphHandler.sync_mode = 'slow'
+        rows = self._fetch()
+        self.assertEqual([row['campaign_id'] for row in rows], ['10'])
+        self.assertEqual(GraphHandler.hits.get('sync'), 1)
+        self.assertEqual(GraphHandler.hits.get('create'), 1)
+
+    def test_reduce_data_error_switches_to_async_without_retrying(self):
+        GraphHandler.sync_mode = 'error'
+        rows = self._fetch()
+        self.assertEqual([row['campaign_id'] for row in rows], ['10'])
+        self.assertEqual(GraphHandler.hits.get('sync'), 1)
+        self.assertEqual(GraphHandler.hits.get('async'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Testes do cache de relatórios do Facebook quando o stream é gravado no banco
+em mais de um bloco (save_campaign_data altera as linhas que recebe)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from facebook_api import FacebookAPI  # noqa: E402
+from report_cache import ReportCache  # noqa: E402
+from tests.fake_supabase import FakeSupabase  # noqa: E402
+
+
+class StreamedSaveCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.api = FacebookAPI(cache=ReportCache(os.path.join(self.cache_dir, 'cache.sqlite3')))
+        self.api_calls = []
+
+        def fake_pages(account_id, start_date, end_date, page_size, chunks, use_async,
+                       skip_zero_impressions=False):
+            # Uma página por dia, com linhas novas a cada chamada (como a API)
+            self.api_calls.append((start_date, end_date))
+            day = datetime.strptime(start_date, '%Y-%m-%d')
+            while day <= datetime.strptime(end_date, '%Y-%m-%d'):
+                yield [self.api._process_campaign_data({
+                    'account_id': '123', 'campaign_id': campaign_id,
+                    'date_start': day.strftime('%Y-%m-%d'), 'impressions': '10', 'spend': '1.0'})
+                    for campaign_id in ('1', '2')]
+                day += timedelta(days=1)
+
+        self.api._iter_insights_pages = fake_pages
+
+        self.supabase = FakeSupabase()
+        patcher = mock.patch.object(database, 'get_supabase_client', return_value=self.supabase)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = database.Database()
+        # Blocos de gravação menores que o stream: as linhas são alteradas antes de o bloco da API terminar
+        self.db.stream_chunk_size = 3
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _assert_cached_rows_untouched(self):
+        calls = len(self.api_calls)
+        cached = list(self.api.iter_campaigns_report('act_123', '2024-01-01', '2024-01-04'))
+        self.assertEqual(len(self.api_calls), calls, 'o período deveria vir inteiro do cache')
+        self.assertEqual(len(cached), 8)
+        for row in cached:
+            self.assertEqual(row['id'], row['campaign_id'])
+            self.assertNotIn('metrics_hash', row)
+
+    def test_single_chunk_stream(self):
+        stats = self.db.save_campaign_data(self.api.iter_campaigns_report('act_123', '2024-01-01', '2024-01-04'))
+        self.assertEqual(stats['novos_salvos'], 8)
+        self._assert_cached_rows_untouched()
+
+    def test_parallel_chunks_stream(self):
+        self.api.chunk_days = 2
+        stats = self.db.save_campaign_data(self.api.iter_campaigns_report('act_123', '2024-01-01', '2024-01-04'))
+        self.assertEqual(stats['novos_salvos'], 8)
+        self._assert_cached_rows_untouched()
+
+
+if __name__ == '__main__':
+    unittest.main()
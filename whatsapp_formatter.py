@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Optional
 
 class WhatsAppMessageFormatter:
     """
@@ -34,11 +34,16 @@ class WhatsAppMessageFormatter:
         """
         return f"{value:,}".replace(',', '.')
     
-    def calculate_metrics(self, campaigns_data: List[Dict], conversion_type: str) -> Dict:
+    def calculate_metrics(self, campaigns_data: Iterable[Dict], conversion_type: str) -> Dict:
         """
         Calcula métricas baseadas no tipo de conversão
+        
+        Percorre os dados uma única vez, então aceita tanto listas quanto
+        streams (geradores) de linhas. Também aceita linhas de rollup diário
+        (com 'rows' e 'has_followers_campaign' já agregados).
         """
         metrics = {
+            'rows': 0,
             'impressions': 0,
             'clicks': 0,
             'spend': 0.0,
@@ -65,47 +70,50 @@ class WhatsAppMessageFormatter:
                 'leads_received': 0
             })
         
-        # Verifica se há campanhas de seguidores
         for campaign in campaigns_data:
-            campaign_name = campaign.get('campaign_name', '').lower()
-            if 'seguidores' in campaign_name or 'seguidor' in campaign_name:
+            # Linhas de rollup representam várias campanhas
+            metrics['rows'] += int(campaign.get('rows') or 1)
+            
+            # Verifica se há campanhas de seguidores
+            campaign_name = (campaign.get('campaign_name') or '').lower()
+            if 'seguidores' in campaign_name or 'seguidor' in campaign_name or campaign.get('has_followers_campaign'):
                 metrics['has_followers_campaign'] = True
-                break
-        
-        # Soma os valores de todas as campanhas
-        for campaign in campaigns_data:
+            
             try:
                 metrics['impressions'] += int(campaign.get('impressions', 0) or 0)
                 metrics['clicks'] += int(campaign.get('inline_link_clicks', 0) or 0)
                 metrics['spend'] += float(campaign.get('spend', 0) or 0)
                 metrics['landing_page_views'] += int(campaign.get('landing_page_view', 0) or 0)
                 
-                # Para campanhas de seguidores, usa link_click
-                if metrics['has_followers_campaign']:
-                    metrics['link_clicks'] += int(campaign.get('link_click', 0) or 0)
+                # Soma link_click de todas as campanhas; só é usado se houver campanha de seguidores
+                metrics['link_clicks'] += int(campaign.get('link_click', 0) or 0)
                 
                 if conversion_type == 'leads':
                     metrics['leads'] += int(campaign.get('offsite_conversion_fb_pixel_lead', 0) or 0)
                     metrics['messaging_conversations'] += int(campaign.get('onsite_conversion_messaging_conversation_started_7d', 0) or 0)
                     metrics['registrations'] += int(campaign.get('offsite_conversion_fb_pixel_complete_registration', 0) or 0)
-                    
-                    # Total de conversões para leads
-                    metrics['total_conversions'] = (metrics['leads'] + 
-                                                   metrics['messaging_conversations'] + 
-                                                   metrics['registrations'])
                 else:  # compras
                     metrics['purchases'] += int(campaign.get('offsite_conversion_fb_pixel_purchase', 0) or 0)
                     metrics['add_to_cart'] += int(campaign.get('offsite_conversion_fb_pixel_add_to_cart', 0) or 0)
                     metrics['initiate_checkout'] += int(campaign.get('offsite_conversion_fb_pixel_initiate_checkout', 0) or 0)
                     metrics['leads_received'] += int(campaign.get('offsite_conversion_fb_pixel_lead', 0) or 0)
                     
-                    # Total de conversões para compras (só as compras efetivas)
-                    metrics['total_conversions'] = metrics['purchases']
-                    
             except (ValueError, TypeError) as e:
                 print(f"[WARNING] Erro ao processar dados da campanha {campaign.get('campaign_name', 'N/A')}: {e}")
                 continue
         
+        if not metrics['has_followers_campaign']:
+            metrics['link_clicks'] = 0
+        
+        if conversion_type == 'leads':
+            # Total de conversões para leads
+            metrics['total_conversions'] = (metrics['leads'] + 
+                                           metrics['messaging_conversations'] + 
+                                           metrics['registrations'])
+        else:
+            # Total de conversões para compras (só as compras efetivas)
+            metrics['total_conversions'] = metrics['purchases']
+        
         # Calcula CPC
         if metrics['clicks'] > 0:
             metrics['cpc'] = metrics['spend'] / metrics['clicks']
@@ -117,11 +125,12 @@ class WhatsAppMessageFormatter:
         return metrics
     
     def format_leads_message(self, client_name: str, start_date: str, end_date: str, 
-                           campaigns_data: List[Dict]) -> str:
+                           campaigns_data: Iterable[Dict], metrics: Optional[Dict] = None) -> str:
         """
         Formata mensagem para campanhas de leads
         """
-        metrics = self.calculate_metrics(campaigns_data, 'leads')
+        if metrics is None:
+            metrics = self.calculate_metrics(campaigns_data, 'leads')
         
         start_date_br = self.format_date_br(start_date)
         end_date_br = self.format_date_br(end_date)
@@ -162,11 +171,12 @@ class WhatsAppMessageFormatter:
         return message
     
     def format_compras_message(self, client_name: str, start_date: str, end_date: str, 
-                             campaigns_data: List[Dict]) -> str:
+                             campaigns_data: Iterable[Dict], metrics: Optional[Dict] = None) -> str:
         """
         Formata mensagem para campanhas de compras
         """
-        metrics = self.calculate_metrics(campaigns_data, 'compras')
+        if metrics is None:
+            metrics = self.calculate_metrics(campaigns_data, 'compras')
         
         start_date_br = self.format_date_br(start_date)
         end_date_br = self.format_date_br(end_date)
@@ -192,7 +202,7 @@ class WhatsAppMessageFormatter:
         return message
     
     def format_report_message(self, client_name: str, platform: str, start_date: str, 
-                            end_date: str, campaigns_data: List[Dict], 
+                            end_date: str, campaigns_data: Iterable[Dict], 
                             conversion_type: str = 'leads') -> str:
         """
         Formata mensagem baseada no tipo de conversão
@@ -202,13 +212,16 @@ class WhatsAppMessageFormatter:
             platform: Plataforma (facebook/google)
             start_date: Data de início
             end_date: Data de fim
-            campaigns_data: Dados das campanhas
+            campaigns_data: Dados das campanhas (lista ou stream)
             conversion_type: 'leads' ou 'compras'
             
         Returns:
             str: Mensagem formatada
         """
-        if not campaigns_data:
+        metrics_type = 'compras' if conversion_type == 'compras' else 'leads'
+        metrics = self.calculate_metrics(campaigns_data or [], metrics_type)
+        
+        if not metrics['rows']:
             return f"""📊 *{client_name}*
 🎯 *{platform.title()} Ads*
 📅 *Período:* {self.format_date_br(start_date)} a {self.format_date_br(end_date)}
@@ -218,15 +231,20 @@ class WhatsAppMessageFormatter:
         print(f"[DEBUG] Formatando mensagem para {client_name} - Tipo: {conversion_type}")
         
         if conversion_type == 'compras':
-            return self.format_compras_message(client_name, start_date, end_date, campaigns_data)
+            return self.format_compras_message(client_name, start_date, end_date, campaigns_data, metrics)
         else:
-            return self.format_leads_message(client_name, start_date, end_date, campaigns_data)
+            return self.format_leads_message(client_name, start_date, end_date, campaigns_data, metrics)
     
-    def calculate_google_ads_metrics(self, campaigns_data: List[Dict]) -> Dict:
+    def calculate_google_ads_metrics(self, campaigns_data: Iterable[Dict]) -> Dict:
         """
         Calcula métricas para campanhas do Google Ads
+        
+        Percorre os dados uma única vez, então aceita tanto listas quanto
+        streams (geradores) de linhas. Também aceita linhas de rollup diário,
+        que trazem 'rows' e as somas de CTR/CPC em 'ctr_sum'/'average_cpc_sum'.
         """
         metrics = {
+            'rows': 0,
             'impressions': 0,
             'clicks': 0,
             'cost': 0.0,
@@ -237,12 +255,17 @@ class WhatsAppMessageFormatter:
             'cost_per_conversion': 0.0
         }
         
-        total_campaigns = len(campaigns_data)
+        total_campaigns = 0
         total_ctr = 0.0
         total_cpc = 0.0
         
         for campaign in campaigns_data:
             try:
+                # Linhas de rollup representam várias campanhas
+                row_count = int(campaign.get('rows') or 1)
+                metrics['rows'] += row_count
+                total_campaigns += row_count
+                
                 metrics['impressions'] += int(campaign.get('impressions', 0) or 0)
                 metrics['clicks'] += int(campaign.get('clicks', 0) or 0)
                 metrics['cost'] += float(campaign.get('cost', 0) or 0)
@@ -250,8 +273,8 @@ class WhatsAppMessageFormatter:
                 metrics['conversions_value'] += float(campaign.get('conversions_value', 0) or 0)
                 
                 # Soma CTR e CPC para cálculo da média
-                total_ctr += float(campaign.get('ctr', 0) or 0)
-                total_cpc += float(campaign.get('average_cpc', 0) or 0)
+                total_ctr += float(campaign.get('ctr_sum', campaign.get('ctr', 0)) or 0)
+                total_cpc += float(campaign.get('average_cpc_sum', campaign.get('average_cpc', 0)) or 0)
                 
             except (ValueError, TypeError) as e:
                 print(f"[WARNING] Erro ao processar dados da campanha Google Ads {campaign.get('nome_campanha', 'N/A')}: {e}")
@@ -269,19 +292,24 @@ class WhatsAppMessageFormatter:
         return metrics
     
     def format_google_ads_message(self, client_name: str, start_date: str, end_date: str, 
-                                campaigns_data: List[Dict]) -> str:
+                                campaigns_data: Optional[Iterable[Dict]],
+                                metrics: Optional[Dict] = None) -> str:
         """
         Formata mensagem para campanhas do Google Ads
+        
+        Se metrics já tiver sido calculado (ex.: a partir de um stream já
+        consumido), campaigns_data é ignorado
         """
-        if not campaigns_data:
+        if metrics is None:
+            metrics = self.calculate_google_ads_metrics(campaigns_data or [])
+        
+        if not metrics['rows']:
             return f"""📊 *{client_name}*
 🎯 *Google Ads*
 📅 *Período:* {self.format_date_br(start_date)} a {self.format_date_br(end_date)}
 
 ❌ *Nenhum dado encontrado para este período*"""
         
-        metrics = self.calculate_google_ads_metrics(campaigns_data)
-        
         start_date_br = self.format_date_br(start_date)
         end_date_br = self.format_date_br(end_date)
         